@@ -0,0 +1,80 @@
+import asyncio
+from fastapi import APIRouter, Header, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from app.models.alertas import AlertasResponse, TransicionStatus
+from app.services.alertas_service import canal
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+
+def _filtrar(transicion: TransicionStatus, tienda: Optional[str], solo_empeoran: bool) -> bool:
+    if tienda and transicion.tienda.lower() != tienda.lower():
+        return False
+    return not solo_empeoran or transicion.direccion == "empeora"
+
+def _evento(transicion: TransicionStatus) -> str:
+    return f"id: {transicion.id}\nevent: transicion\ndata: {transicion.model_dump_json()}\n\n"
+
+@router.get("/alertas", response_model=AlertasResponse)
+async def listar_alertas(
+    desde_id: int = Query(0, ge=0, description="Solo transiciones posteriores a la de este ID"),
+    limite: int = Query(100, ge=1, le=1000),
+    tienda: Optional[str] = Query(None),
+    solo_empeoran: bool = Query(False)
+):
+    """
+    Transiciones de status recientes
+
+    Alternativa al stream para clientes que consultan periódicamente:
+    guardar ultimo_id y mandarlo como desde_id en la siguiente consulta
+    """
+    transiciones = [
+        t for t in canal.recientes(desde_id)
+        if _filtrar(t, tienda, solo_empeoran)
+    ][-limite:]
+    return AlertasResponse(ultimo_id=canal.ultimo_id, transiciones=transiciones)
+
+@router.get("/alertas/stream")
+async def stream_alertas(
+    request: Request,
+    tienda: Optional[str] = Query(None),
+    solo_empeoran: bool = Query(False),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Stream (Server-Sent Events) de transiciones de status
+
+    Cada evento `transicion` trae un TransicionStatus en JSON. Al reconectar,
+    el navegador manda Last-Event-ID y se reenvían las que se perdieron
+    """
+    cola = canal.suscribir()
+
+    async def eventos():
+        try:
+            if last_event_id and last_event_id.isdigit():
+                for transicion in canal.recientes(int(last_event_id)):
+                    if _filtrar(transicion, tienda, solo_empeoran):
+                        yield _evento(transicion)
+
+            while True:
+                try:
+                    transicion = await asyncio.wait_for(cola.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if _filtrar(transicion, tienda, solo_empeoran):
+                    yield _evento(transicion)
+        finally:
+            canal.desuscribir(cola)
+
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
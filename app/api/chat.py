@@ -1,13 +1,16 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
 from app.models.chat import ChatRequest, ChatResponse, ChatError
 from app.services.chat_service import process_chat_message
+from app.utils import traffic_capture
+from app.utils.admission import CargaRechazada
+from app.utils.rate_limit import LimiteExcedido, clave_cliente
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_request: Request):
     """
     Endpoint del chatbot RAG
     
@@ -16,14 +19,23 @@ async def chat(request: ChatRequest):
     """
     try:
         logger.info(f"Procesando mensaje: {request.message[:50]}...")
+        traffic_capture.anotar(message=request.message, session_id=request.session_id)
         
         # Procesar mensaje con el servicio de chat
-        response = await process_chat_message(request.message, request.session_id)
+        response = await process_chat_message(
+            request.message,
+            request.session_id,
+            cliente=clave_cliente(http_request)
+        )
         
         logger.info(f"Respuesta generada con intent: {response['intent']}")
         
         return ChatResponse(**response)
     
+    except (CargaRechazada, LimiteExcedido):
+        # Los responde el handler global (429/503 con Retry-After)
+        raise
+    
     except ValueError as e:
         # Errores de validación o datos no encontrados
         logger.warning(f"Error de validación: {str(e)}")
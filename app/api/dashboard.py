@@ -1,29 +1,77 @@
-from fastapi import APIRouter, HTTPException, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
 from typing import Optional, List
 from app.models.dashboard import (
     DashboardSummary, 
     TiendaResumen, 
     TiendaDetalle,
-    HistoricoResponse
+    HistoricoResponse,
+    DashboardBundle,
+    ResurtidoResponse,
+    VariacionesResponse,
+    MovimientosResponse,
+    SaludResponse,
+    PronosticoResponse,
+    CatalogoResponse,
+    ConsultaRequest,
+    ConsultaResponse
 )
 from app.services.db_service import (
     get_dashboard_summary,
     get_all_tiendas_resumen,
     get_tienda_detalle,
     get_historico,
-    
-    
+    get_dashboard_bundle
 )
-from app.config import DEFAULT_YEAR, DEFAULT_MONTH
+from app.services.resurtido_service import get_prioridad_resurtido
+from app.services.variacion_service import get_variaciones, get_mayores_movimientos
+from app.services.salud_service import get_salud
+from app.services.pronostico_service import get_pronostico
+from app.services.consulta_service import get_consulta
+from app.services.catalogo_service import get_catalogo, resolver_anio, resolver_periodo
+from app.services.cambios_service import etag
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+def _no_modificado(request: Request, response: Response, valor: Optional[str]) -> Optional[Response]:
+    """
+    Poner el ETag de la vista; si el cliente ya tiene esa versión
+    (If-None-Match) devolver el 304 para no calcularla de nuevo
+    """
+    if valor is None:
+        return None
+    response.headers["ETag"] = valor
+    etiquetas = [e.strip() for e in request.headers.get("if-none-match", "").split(",")]
+    if valor in etiquetas or "*" in etiquetas:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": valor})
+    return None
+
+@router.get("/catalogo", response_model=CatalogoResponse)
+async def catalogo(request: Request, response: Response):
+    """
+    Obtener tiendas, unidades de negocio y periodos con datos
+    
+    Sirve para poblar filtros; se actualiza con cada carga de datos
+    """
+    try:
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        return await get_catalogo()
+    except Exception as e:
+        logger.error(f"Error en catálogo: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error obteniendo catálogo"
+        )
+
 @router.get("/summary", response_model=DashboardSummary)
 async def dashboard_summary(
-    year: int = Query(DEFAULT_YEAR, ge=2023, le=2025, description="Año"),
-    month: int = Query(DEFAULT_MONTH, ge=1, le=12, description="Mes")
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes")
 ):
     """
     Obtener resumen general del dashboard
@@ -31,6 +79,10 @@ async def dashboard_summary(
     Retorna métricas agregadas de todas las tiendas para el periodo especificado
     """
     try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag(year, month))
+        if no_modificado is not None:
+            return no_modificado
         logger.info(f"Obteniendo resumen: {month}/{year}")
         summary = await get_dashboard_summary(year, month)
         return summary
@@ -38,7 +90,7 @@ async def dashboard_summary(
         logger.warning(f"Datos no encontrados: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No hay datos disponibles para {month}/{year}"
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error en summary: {str(e)}", exc_info=True)
@@ -49,8 +101,10 @@ async def dashboard_summary(
 
 @router.get("/tiendas", response_model=List[TiendaResumen])
 async def list_tiendas(
-    year: int = Query(DEFAULT_YEAR, ge=2023, le=2025),
-    month: int = Query(DEFAULT_MONTH, ge=1, le=12)
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes")
 ):
     """
     Listar todas las tiendas con sus métricas
@@ -58,13 +112,17 @@ async def list_tiendas(
     Retorna datos resumidos de cada tienda para el periodo especificado
     """
     try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag(year, month))
+        if no_modificado is not None:
+            return no_modificado
         logger.info(f"Listando tiendas: {month}/{year}")
         tiendas = await get_all_tiendas_resumen(year, month)
         return tiendas
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"No hay datos disponibles para {month}/{year}"
+            detail=str(e)
         )
     except Exception as e:
         logger.error(f"Error listando tiendas: {str(e)}", exc_info=True)
@@ -75,9 +133,11 @@ async def list_tiendas(
 
 @router.get("/tiendas/{tienda_nombre}", response_model=TiendaDetalle)
 async def get_tienda(
+    request: Request,
+    response: Response,
     tienda_nombre: str,
-    year: int = Query(DEFAULT_YEAR, ge=2023, le=2025),
-    month: int = Query(DEFAULT_MONTH, ge=1, le=12)
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes")
 ):
     """
     Obtener datos detallados de una tienda específica
@@ -85,6 +145,10 @@ async def get_tienda(
     Retorna inventario, ventas y cobertura por unidad de negocio
     """
     try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag(year, month))
+        if no_modificado is not None:
+            return no_modificado
         logger.info(f"Obteniendo detalle de {tienda_nombre}: {month}/{year}")
         detalle = await get_tienda_detalle(tienda_nombre, year, month)
         return detalle
@@ -102,7 +166,9 @@ async def get_tienda(
 
 @router.get("/historico", response_model=HistoricoResponse)
 async def get_historical_data(
-    year: int = Query(2024, ge=2023, le=2025),
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último año con datos)"),
     tienda: Optional[str] = Query(None, description="Nombre de tienda (opcional para agregado)")
 ):
     """
@@ -112,6 +178,10 @@ async def get_historical_data(
     Si no, retorna datos agregados de todas las tiendas.
     """
     try:
+        year = await resolver_anio(year)
+        no_modificado = _no_modificado(request, response, await etag(year))
+        if no_modificado is not None:
+            return no_modificado
         logger.info(f"Obteniendo histórico: tienda={tienda}, year={year}")
         historico = await get_historico(year, tienda)
         return historico
@@ -125,4 +195,234 @@ async def get_historical_data(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error obteniendo datos históricos"
-        )
\ No newline at end of file
+        )
+
+@router.get("/bundle", response_model=DashboardBundle)
+async def dashboard_bundle(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes")
+):
+    """
+    Obtener summary, tiendas e histórico del año en una sola llamada
+    
+    Calcula el agregado por tienda una sola vez y deriva el resumen de él
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag(year))
+        if no_modificado is not None:
+            return no_modificado
+        logger.info(f"Obteniendo bundle: {month}/{year}")
+        bundle = await get_dashboard_bundle(year, month)
+        return bundle
+    except ValueError as e:
+        logger.warning(f"Datos no encontrados: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en bundle: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error obteniendo bundle del dashboard"
+        )
+
+@router.get("/resurtido", response_model=ResurtidoResponse)
+async def prioridad_resurtido(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes"),
+    k: int = Query(10, ge=1, le=1000, description="Número de posiciones"),
+    unidad: Optional[str] = Query(
+        None,
+        description="Sin valor: nivel tienda. '*': tienda × unidad. Nombre: solo esa unidad"
+    )
+):
+    """
+    Obtener las k tiendas (o tienda × unidad) más urgentes de resurtir
+    
+    Prioridad = ventas / cobertura; las que venden sin inventario van primero
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        logger.info(f"Prioridad de resurtido: {month}/{year}, k={k}, unidad={unidad}")
+        return await get_prioridad_resurtido(year, month, k, unidad)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en resurtido: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculando prioridad de resurtido"
+        )
+
+@router.get("/variaciones", response_model=VariacionesResponse)
+async def variaciones(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes"),
+    por_unidad: bool = Query(False, description="Una fila por tienda × unidad de negocio")
+):
+    """
+    Obtener variaciones MoM y YoY de inventario, ventas y cobertura
+    
+    Regresa todas las tiendas en una sola llamada; los deltas son None cuando
+    no hay periodo de referencia o no se pueden calcular
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        logger.info(f"Variaciones: {month}/{year}, por_unidad={por_unidad}")
+        return await get_variaciones(year, month, por_unidad)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en variaciones: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculando variaciones"
+        )
+
+@router.get("/variaciones/movimientos", response_model=MovimientosResponse)
+async def mayores_movimientos(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes"),
+    metrica: str = Query("ventas", pattern="^(inventario|ventas|cobertura)$"),
+    comparacion: str = Query("mom", pattern="^(mom|yoy)$"),
+    direccion: str = Query("abs", pattern="^(abs|sube|baja)$", description="abs, sube o baja"),
+    k: int = Query(10, ge=1, le=1000, description="Número de posiciones"),
+    por_unidad: bool = Query(False, description="Rankear tienda × unidad de negocio")
+):
+    """
+    Obtener las k mayores variaciones porcentuales de una métrica
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        logger.info(f"Movimientos: {month}/{year}, {metrica} {comparacion} {direccion}, k={k}")
+        return await get_mayores_movimientos(year, month, metrica, comparacion, k, direccion, por_unidad)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en movimientos: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculando movimientos"
+        )
+
+@router.get("/salud", response_model=SaludResponse)
+async def salud_cadena(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes")
+):
+    """
+    Obtener la salud general de la cadena
+    
+    Conteos por status, tiendas excelentes y score 1-5; se mantienen al
+    recargar los datos, así que la lectura no recorre las tiendas
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        return await get_salud(year, month)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en salud: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error obteniendo salud de la cadena"
+        )
+
+@router.get("/pronostico", response_model=PronosticoResponse)
+async def pronostico_desabasto(
+    request: Request,
+    response: Response,
+    year: Optional[int] = Query(None, ge=2000, le=2100, description="Año base (default: último periodo con datos)"),
+    month: Optional[int] = Query(None, ge=1, le=12, description="Mes base"),
+    k: int = Query(20, ge=1, le=1000, description="Número de posiciones"),
+    por_unidad: bool = Query(False, description="Nivel tienda × unidad de negocio"),
+    metodo: str = Query("combinado", pattern="^(ses|estacional|combinado)$"),
+    solo_criticos: bool = Query(False, description="Solo las que caerían en CRÍTICO el mes siguiente")
+):
+    """
+    Pronosticar qué tiendas se quedan sin inventario más pronto
+    
+    Pronostica las ventas del mes siguiente (suavizamiento exponencial y/o
+    naive estacional) y ordena por días hasta desabasto
+    """
+    try:
+        year, month = await resolver_periodo(year, month)
+        no_modificado = _no_modificado(request, response, await etag())
+        if no_modificado is not None:
+            return no_modificado
+        logger.info(f"Pronóstico: base {month}/{year}, metodo={metodo}, k={k}")
+        return await get_pronostico(year, month, k, por_unidad, metodo, solo_criticos)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en pronóstico: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error calculando pronóstico"
+        )
+
+@router.post("/query", response_model=ConsultaResponse)
+async def consulta_adhoc(request: ConsultaRequest):
+    """
+    Corte ad-hoc de inventario y ventas
+    
+    Agrupa por cualquier combinación de tienda, unidad, año y mes, con
+    filtros, condiciones sobre medidas, orden y paginación resueltos en la
+    base de datos
+    """
+    try:
+        logger.info(
+            f"Consulta: dimensiones={request.dimensiones}, medidas={request.medidas}, "
+            f"limite={request.limite}, offset={request.offset}"
+        )
+        return await get_consulta(request)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Error en consulta: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Error ejecutando consulta"
+        )
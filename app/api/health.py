@@ -1,10 +1,38 @@
+import asyncio
 from fastapi import APIRouter, status
 from datetime import datetime
+from typing import Callable, Dict, Tuple
+from app.config import settings
 from app.services.db_service import test_db_connection
 from app.services.watsonx_service import test_watsonx_connection
+from app.utils import admission, cancelacion
 
 router = APIRouter()
 
+_pruebas_en_curso: Dict[str, asyncio.Task] = {}
+
+async def _probar_compartido(nombre: str, prueba: Callable[[], bool]) -> bool:
+    """
+    Una sola prueba de cada dependencia a la vez, en el pool de health: los
+    probes que llegan mientras corre esperan su resultado en lugar de lanzar
+    otra
+    """
+    tarea = _pruebas_en_curso.get(nombre)
+    if tarea is None or tarea.done():
+        # La comparten varios requests: no la cancela el plazo del que la lanzó
+        with cancelacion.desacoplado():
+            tarea = asyncio.ensure_future(admission.HEALTH.ejecutar(prueba))
+        _pruebas_en_curso[nombre] = tarea
+    return await asyncio.shield(tarea)
+
+async def _probar_dependencias() -> Tuple[bool, bool]:
+    # Fuente de datos y watsonx.ai en paralelo
+    db_status, watsonx_status = await asyncio.gather(
+        _probar_compartido("db", test_db_connection),
+        _probar_compartido("watsonx", test_watsonx_connection)
+    )
+    return db_status, watsonx_status
+
 @router.get("/health", status_code=status.HTTP_200_OK)
 async def health_check():
     """
@@ -12,11 +40,7 @@ async def health_check():
     Verifica la salud de la aplicación y sus dependencias
     """
     
-    # Test Db2 connection
-    db_status = test_db_connection()
-    
-    # Test watsonx.ai connection
-    watsonx_status = test_watsonx_connection()
+    db_status, watsonx_status = await _probar_dependencias()
     
     # Determinar status general
     overall_status = "healthy" if (db_status and watsonx_status) else "degraded"
@@ -25,6 +49,7 @@ async def health_check():
     return {
         "status": overall_status,
         "db_connected": db_status,
+        "data_backend": settings.DATA_BACKEND,
         "watsonx_connected": watsonx_status,
         "timestamp": datetime.now().isoformat()
     }
@@ -32,9 +57,9 @@ async def health_check():
 @router.get("/health/db", status_code=status.HTTP_200_OK)
 async def health_check_db():
     """Check específico de la base de datos"""
-    connected = test_db_connection()
+    connected = await _probar_compartido("db", test_db_connection)
     return {
-        "service": "db2",
+        "service": settings.DATA_BACKEND,
         "connected": connected,
         "timestamp": datetime.now().isoformat()
     }
@@ -42,7 +67,7 @@ async def health_check_db():
 @router.get("/health/watsonx", status_code=status.HTTP_200_OK)
 async def health_check_watsonx():
     """Check específico de watsonx.ai"""
-    connected = test_watsonx_connection()
+    connected = await _probar_compartido("watsonx", test_watsonx_connection)
     return {
         "service": "watsonx",
         "connected": connected,
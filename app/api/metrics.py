@@ -0,0 +1,40 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.utils.telemetry import REGISTRO
+from app.repositories.base import perfilador
+from app.utils.llm_accounting import contabilidad_llm
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas en formato de exposición de Prometheus
+    
+    Incluye histogramas de latencia por etapa (stage, endpoint, intent)
+    y de duración total por endpoint
+    """
+    return PlainTextResponse(
+        REGISTRO.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@router.get("/metrics/sql")
+async def metrics_sql():
+    """
+    Perfil de sentencias SQL
+    
+    Ejecuciones, filas y percentiles de latencia por statement id,
+    más las sentencias lentas recientes (con su plan si está habilitado)
+    """
+    return perfilador.resumen()
+
+@router.get("/metrics/llm")
+async def metrics_llm():
+    """
+    Reporte de llamadas a watsonx.ai por intent y modelo
+    
+    p50/p95/p99 de latencia, cola y primer token (ms), tokens de
+    entrada/salida, tokens por segundo y motivos de paro
+    """
+    return contabilidad_llm.reporte()
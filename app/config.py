@@ -9,12 +9,16 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     APP_ENV: str = "development"
     
-    # IBM Db2
-    DB2_DATABASE: str
-    DB2_HOSTNAME: str
-    DB2_PORT: str
-    DB2_UID: str
-    DB2_PWD: str
+    # Fuente de datos: "db2", "sqlite" (réplica local) o "parquet" (snapshot)
+    DATA_BACKEND: str = "db2"
+    DATA_LOCAL_PATH: str = "data/calzando.sqlite"  # Archivo SQLite o directorio Parquet
+    
+    # IBM Db2 (requerido con DATA_BACKEND=db2)
+    DB2_DATABASE: str = ""
+    DB2_HOSTNAME: str = ""
+    DB2_PORT: str = ""
+    DB2_UID: str = ""
+    DB2_PWD: str = ""
     DB2_SCHEMA: str = "PTJ13762"
     
     # IBM watsonx.ai
@@ -24,13 +28,113 @@ class Settings(BaseSettings):
     WATSONX_MODEL_ID: str = "ibm/granite-3-2b-instruct"
     # WATSONX_MODEL_ID: str = "meta-llama/llama-3-1-8b"
     # WATSONX_MODEL_ID: str = "ibm/granite-3-2-8b-instruct"
+    WATSONX_MAX_CONCURRENCY: int = 4  # Generaciones simultáneas del contenedor (se reparten entre workers)
+    WATSONX_STREAM: bool = False  # Streaming para medir tiempo al primer token
+    
+    # Workers del contenedor; gunicorn.conf.py lo fija para que los límites del
+    # contenedor (WATSONX_MAX_CONCURRENCY, rate limit en memoria) se repartan entre ellos
+    WEB_CONCURRENCY: int = 1
+    
+    # Control de admisión por clase de carga (concurrencia, cola y plazo de espera)
+    # chat_llm usa WATSONX_MAX_CONCURRENCY como concurrencia
+    ADMISSION_CHAT_LLM_QUEUE: int = 16
+    ADMISSION_CHAT_LLM_TIMEOUT_SECONDS: float = 10.0
+    ADMISSION_CHAT_DATOS_CONCURRENCY: int = 4
+    ADMISSION_CHAT_DATOS_QUEUE: int = 32
+    ADMISSION_CHAT_DATOS_TIMEOUT_SECONDS: float = 3.0
+    ADMISSION_DASHBOARD_CONCURRENCY: int = 8
+    ADMISSION_DASHBOARD_QUEUE: int = 64
+    ADMISSION_DASHBOARD_TIMEOUT_SECONDS: float = 2.0
+    
+    # Rate limit por cliente (cubetas de tokens); backend "memoria" (cada worker
+    # aplica su parte del límite) o "redis" (límite exacto entre workers y réplicas)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: str = "memoria"
+    RATE_LIMIT_REDIS_URL: str = "redis://localhost:6379/0"
+    RATE_LIMIT_LLM_PER_MINUTE: float = 6.0  # Respuestas del LLM por cliente
+    RATE_LIMIT_LLM_BURST: int = 3
+    RATE_LIMIT_DATOS_PER_MINUTE: float = 120.0  # Requests de dashboard por cliente
+    RATE_LIMIT_DATOS_BURST: int = 40
+    RATE_LIMIT_IP_MULTIPLICADOR: float = 10.0  # Cubeta por IP: tasa y ráfaga × este factor
+    RATE_LIMIT_CLIENT_SECRET: str = ""  # Firma de X-Client-Id (vacío = el cliente es la IP)
+    
+    # Cache de respuestas del chat: la misma pregunta con el mismo contexto no vuelve al LLM
+    CHAT_CACHE_TTL_SECONDS: int = 600
+    CHAT_CACHE_MAX_ITEMS: int = 1000
     
+    # Cache del dashboard (stale-while-revalidate): una vista es fresca por TTL (0 = sin
+    # cache); vencida, se sirve hasta STALE segundos más mientras se recarga en segundo plano
+    DASHBOARD_CACHE_TTL_SECONDS: float = 300.0
+    DASHBOARD_CACHE_STALE_SECONDS: float = 3600.0
+    DASHBOARD_CACHE_MAX_ITEMS: int = 500
+    DASHBOARD_REFRESCO_CONCURRENCIA: int = 2  # Recargas simultáneas en segundo plano
+    DASHBOARD_REFRESCO_TOP: int = 20  # Vistas más pedidas que se recargan antes de expirar
+    DASHBOARD_REFRESCO_INTERVALO_SECONDS: float = 15.0
+
+    # Nivel compartido de los caches del dashboard y del chat entre réplicas: servidor con
+    # protocolo Redis (requiere `redis`; vacío = solo memoria de cada proceso)
+    CACHE_COMPARTIDO_URL: str = ""
+    CACHE_COMPARTIDO_PREFIJO: str = "calzando:cache:"
+    CACHE_COMPARTIDO_TIMEOUT_MS: float = 50.0
+    CACHE_COMPARTIDO_PAUSA_SECONDS: float = 30.0  # Solo memoria tras un error del servidor
+
     # CORS - string opcional, se parsea en main.py
     CORS_ORIGINS: str = "*"
     
     # Logging
     LOG_LEVEL: str = "INFO"
     
+    # Cubo de inventario en memoria (tienda × unidad × periodo)
+    CUBO_TTL_SECONDS: int = 900
+    
+    # Cubo compartido entre workers: un proceso cargador lo publica en este archivo y
+    # los workers lo mapean en memoria (vacío = cada proceso carga el suyo de la base)
+    CUBO_COMPARTIDO_PATH: str = ""
+    CUBO_COMPARTIDO_REVISION_SECONDS: float = 1.0  # Cada cuánto un worker revisa si hay versión nueva
+    CUBO_COMPARTIDO_ESPERA_SECONDS: float = 60.0  # Espera máxima al primer snapshot al arrancar
+    
+    # Detección de cambios: huellas (filas, suma y suma ponderada por tienda/unidad) por (ANIO, MES); solo
+    # los meses que cambiaron se recargan. 0 = sin detección (recarga completa por TTL)
+    CAMBIOS_INTERVALO_SECONDS: float = 60.0
+    CAMBIOS_MESES_RECIENTES: int = 3  # Meses que se revisan en cada ciclo
+    CAMBIOS_COMPLETO_CADA: int = 10  # Cada cuántos ciclos se revisan todos los meses
+    
+    # Monitor de lag del event loop
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: float = 100.0
+    LOOP_MONITOR_THRESHOLD_MS: float = 200.0
+    LOOP_MONITOR_DEBUG: bool = False  # Registrar el stack de quien bloquea el loop
+    
+    # Captura de tráfico para replay (vacío = deshabilitada)
+    TRAFFIC_CAPTURE_PATH: str = ""
+    
+    # Alertas de cambio de status
+    ALERTAS_HISTORIAL: int = 500  # Transiciones recientes que se conservan para reconexión
+    ALERTAS_WEBHOOK_URLS: str = ""  # URLs separadas por coma (vacío = sin webhooks)
+    ALERTAS_WEBHOOK_TIMEOUT_SECONDS: float = 5.0
+    ALERTAS_AUTO_REFRESH: bool = False  # Recargar el cubo cada CUBO_TTL_SECONDS aunque no haya requests
+    
+    # Perfilado SQL
+    SQL_SLOW_QUERY_MS: float = 500.0
+    SQL_EXPLAIN_SLOW: bool = False
+    SQL_EXPLAIN_SCHEMA: str = "SYSTOOLS"  # Esquema de las tablas EXPLAIN_*
+    
+    # Plazos por endpoint (segundos, 0 = sin plazo): al vencer o si el cliente se
+    # desconecta se cancela el trabajo en curso (sentencias SQL y generación del LLM)
+    PLAZO_DASHBOARD_SECONDS: float = 15.0
+    PLAZO_CHAT_SECONDS: float = 60.0
+    PLAZO_HEALTH_SECONDS: float = 10.0
+    PLAZOS_ENDPOINT: str = ""  # Excepciones "ruta=segundos" separadas por coma (ej. /api/dashboard/historico=5)
+    
+    # Lotes de detalle por tienda: las consultas de un mismo periodo que llegan
+    # dentro de la ventana se resuelven con un solo WHERE TIENDA IN (...) (0 = sin lotes)
+    TIENDA_LOTE_VENTANA_MS: float = 5.0
+    TIENDA_LOTE_MAX: int = 100
+    
+    def por_worker(self, total: float, minimo: float = 1) -> float:
+        """Parte de un límite del contenedor que aplica cada worker"""
+        return max(minimo, total / max(1, self.WEB_CONCURRENCY))
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -41,6 +145,8 @@ settings = Settings()
 # Constantes de negocio
 BENCHMARK_MIN_DIAS = 28
 BENCHMARK_MAX_DIAS = 90
+EXCELENTE_MIN_DIAS = 40  # Banda "excelente" dentro de ÓPTIMO (cerca del punto medio, 59 días)
+EXCELENTE_MAX_DIAS = 70
 DEFAULT_YEAR = 2025
 DEFAULT_MONTH = 5  # Mayo (último mes con datos)
 
@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from app.config import settings
-from app.api import chat, dashboard, health
+from app.api import alertas, chat, dashboard, health, metrics
+from app.repositories import fuentes
+from app.services import alertas_service, cambios_service, db_service
+from app.utils import admission, cache_compartido, cancelacion, rate_limit, telemetry
+from app.utils.loop_monitor import MonitorLoop
+from app.utils.traffic_capture import CapturaTrafico
 
 # Función simple para parsear CORS_ORIGINS
 def parse_cors_origins(cors_str: str) -> list[str]:
@@ -10,6 +18,26 @@ def parse_cors_origins(cors_str: str) -> list[str]:
         return ["*"]
     return [origin.strip() for origin in cors_str.split(",") if origin.strip()]
 
+def ruta_plantilla(request: Request) -> str:
+    """Ruta declarada que atiende el request (ej. /api/dashboard/tiendas/{tienda_nombre})"""
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "sin_ruta"
+
+DURACION_HTTP = telemetry.histograma(
+    "calzando_http_request_duration_seconds",
+    "Duración total de los requests HTTP",
+    ("endpoint", "method", "status")
+)
+
+monitor_loop = MonitorLoop(
+    intervalo=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    umbral=settings.LOOP_MONITOR_THRESHOLD_MS / 1000,
+    debug=settings.LOOP_MONITOR_DEBUG
+)
+
 # Crear aplicación FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
@@ -19,6 +47,51 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+def respuesta_rechazo(exc: admission.CargaRechazada) -> JSONResponse:
+    """429 (cola llena) o 503 (plazo vencido) con Retry-After"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": "Servicio saturado, intenta de nuevo más tarde", "clase": exc.clase},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(admission.CargaRechazada)
+async def carga_rechazada_handler(request: Request, exc: admission.CargaRechazada):
+    return respuesta_rechazo(exc)
+
+# Control de admisión por clase de carga (queda dentro de CORS y telemetría)
+@app.middleware("http")
+async def admision_middleware(request: Request, call_next):
+    clase = admission.clase_para_ruta(request.url.path)
+    if clase is None:
+        return await call_next(request)
+    try:
+        async with clase.admitir():
+            return await call_next(request)
+    except admission.CargaRechazada as exc:
+        return respuesta_rechazo(exc)
+
+def respuesta_limite(exc: rate_limit.LimiteExcedido) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Demasiadas solicitudes, intenta de nuevo más tarde", "cubeta": exc.cubeta},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+@app.exception_handler(rate_limit.LimiteExcedido)
+async def limite_excedido_handler(request: Request, exc: rate_limit.LimiteExcedido):
+    return respuesta_limite(exc)
+
+# Rate limit de requests de datos por cliente (antes de hacer cola en admisión)
+@app.middleware("http")
+async def rate_limit_middleware(request: Request, call_next):
+    if admission.clase_para_ruta(request.url.path) is not admission.DASHBOARD:
+        return await call_next(request)
+    permitido, retry_after = await rate_limit.permitir(rate_limit.clave_cliente(request), rate_limit.CUBETA_DATOS)
+    if not permitido:
+        return respuesta_limite(rate_limit.LimiteExcedido(rate_limit.CUBETA_DATOS, retry_after))
+    return await call_next(request)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -26,12 +99,64 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
+)
+
+# Telemetría: histograma por endpoint y desglose por etapa en Server-Timing
+@app.middleware("http")
+async def telemetria_middleware(request: Request, call_next):
+    endpoint = ruta_plantilla(request)
+    tiempos = telemetry.iniciar_request(endpoint)
+    inicio = time.perf_counter()
+    
+    response = await call_next(request)
+    
+    duracion = time.perf_counter() - inicio
+    DURACION_HTTP.observar(
+        duracion,
+        endpoint=endpoint,
+        method=request.method,
+        status=str(response.status_code)
+    )
+    response.headers["Server-Timing"] = telemetry.server_timing(tiempos, total=duracion)
+    return response
+
+# Captura de tráfico (opt-in): trazas para benchmarks.replay
+captura_trafico = CapturaTrafico(settings.TRAFFIC_CAPTURE_PATH) if settings.TRAFFIC_CAPTURE_PATH else None
+
+async def captura_trafico_middleware(request: Request, call_next):
+    traza = captura_trafico.iniciar_traza(
+        metodo=request.method,
+        endpoint=ruta_plantilla(request),
+        path=request.url.path,
+        query=request.url.query,
+        session_id=request.headers.get("x-session-id")
+    )
+    inicio = time.perf_counter()
+    
+    response = await call_next(request)
+    
+    traza["status"] = response.status_code
+    traza["duration_ms"] = round((time.perf_counter() - inicio) * 1000, 2)
+    captura_trafico.registrar(traza)
+    return response
+
+if captura_trafico is not None:
+    app.middleware("http")(captura_trafico_middleware)
+
+# Plazos y desconexión del cliente: el más externo, para cancelar todo lo que
+# corre dentro (admisión, handler, sentencias SQL y generación del LLM)
+app.add_middleware(
+    cancelacion.MiddlewareCancelacion,
+    endpoint=lambda scope: ruta_plantilla(Request(scope))
 )
 
 # Incluir routers
 app.include_router(health.router, tags=["Health"])
+app.include_router(metrics.router, tags=["Metrics"])
 app.include_router(chat.router, prefix="/api", tags=["Chat"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(alertas.router, prefix="/api", tags=["Alertas"])
 
 # Root endpoint
 @app.get("/")
@@ -51,9 +176,26 @@ async def startup_event():
     print(f"🚀 {settings.APP_NAME} v{settings.APP_VERSION} iniciado")
     print(f"📝 Documentación: http://localhost:8000/docs")
     print(f"🌍 Entorno: {settings.APP_ENV}")
+    print(f"🗄️  Fuente de datos: {settings.DATA_BACKEND}")
+    
+    if settings.LOOP_MONITOR_ENABLED:
+        monitor_loop.iniciar()
+    
+    alertas_service.iniciar()
+    db_service.iniciar()
+    cambios_service.iniciar()
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     """Ejecutar al cerrar la aplicación"""
+    await monitor_loop.detener()
+    await alertas_service.detener()
+    await db_service.detener()
+    await cambios_service.detener()
+    await cache_compartido.cerrar()
+    admission.cerrar()
+    fuentes.cerrar()
+    if captura_trafico is not None:
+        captura_trafico.cerrar()
     print("👋 Aplicación cerrada")
\ No newline at end of file
@@ -0,0 +1,41 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class TransicionStatus(BaseModel):
+    """Cambio de status de una tienda (o tienda × unidad) respecto al mes anterior"""
+    id: int = Field(..., description="ID estable de la transición (llave y huellas de sus meses), usable como Last-Event-ID")
+    tienda: str
+    unidad: Optional[str] = None  # None = nivel tienda
+    periodo: str
+    periodo_anterior: str
+    status_anterior: str
+    status_nuevo: str
+    cobertura_anterior: float
+    cobertura: float
+    direccion: str  # empeora, mejora o cambio
+    version: int  # Versión de los datos que la generaron
+    timestamp: datetime = Field(default_factory=datetime.now)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "id": 4731586017246851,
+                "tienda": "Tienda 3",
+                "unidad": None,
+                "periodo": "Mayo 2025",
+                "periodo_anterior": "Abril 2025",
+                "status_anterior": "ÓPTIMO",
+                "status_nuevo": "CRÍTICO",
+                "cobertura_anterior": 35.2,
+                "cobertura": 22.8,
+                "direccion": "empeora",
+                "version": 3,
+                "timestamp": "2025-06-01T08:00:00"
+            }
+        }
+
+class AlertasResponse(BaseModel):
+    """Transiciones recientes (para clientes que no usan el stream)"""
+    ultimo_id: int
+    transiciones: List[TransicionStatus]
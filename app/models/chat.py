@@ -20,6 +20,7 @@ class ChatResponse(BaseModel):
     response: str = Field(..., description="Respuesta generada por la IA")
     intent: str = Field(..., description="Intención detectada")
     data_used: Optional[Dict[str, Any]] = Field(None, description="Datos usados para la respuesta")
+    source: str = Field("llm", description="Origen de la respuesta: llm, cache o plantilla")
     timestamp: datetime = Field(default_factory=datetime.now)
     
     class Config:
@@ -32,6 +33,7 @@ class ChatResponse(BaseModel):
                     "month": 12,
                     "total_inventario": 87500
                 },
+                "source": "llm",
                 "timestamp": "2025-11-05T10:30:00"
             }
         }
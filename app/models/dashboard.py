@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class DashboardSummary(BaseModel):
     """Resumen general del dashboard"""
@@ -103,4 +103,232 @@ class HistoricoResponse(BaseModel):
                     {"mes": 2, "inventario": 5100, "ventas": 4200, "cobertura": 36.4}
                 ]
             }
-        }
\ No newline at end of file
+        }
+
+class DashboardBundle(BaseModel):
+    """Summary, tiendas e histórico del año en una sola respuesta"""
+    summary: DashboardSummary
+    tiendas: List[TiendaResumen]
+    historico: HistoricoResponse
+
+class PrioridadResurtido(BaseModel):
+    """Una tienda (o tienda × unidad) en la lista de resurtido"""
+    posicion: int
+    tienda: str
+    unidad: Optional[str] = None  # None a nivel tienda
+    inventario: int
+    ventas: int
+    cobertura: float
+    status: str
+    score: Optional[float] = None  # None = sin inventario con ventas (desabasto)
+
+class ResurtidoResponse(BaseModel):
+    """Top-k de prioridades de resurtido de un periodo"""
+    periodo: str
+    nivel: str  # "tienda" o "tienda_unidad"
+    k: int
+    total_candidatos: int
+    prioridades: List[PrioridadResurtido]
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "periodo": "Mayo 2025",
+                "nivel": "tienda_unidad",
+                "k": 2,
+                "total_candidatos": 51,
+                "prioridades": [
+                    {"posicion": 1, "tienda": "Tienda 4", "unidad": "Dama", "inventario": 0,
+                     "ventas": 820, "cobertura": 0, "status": "CRÍTICO", "score": None},
+                    {"posicion": 2, "tienda": "Tienda 9", "unidad": "Niños", "inventario": 310,
+                     "ventas": 1450, "cobertura": 6.4, "status": "CRÍTICO", "score": 226.1}
+                ]
+            }
+        }
+
+class DeltaMetrica(BaseModel):
+    """Valor actual de una métrica y su variación mes a mes y año contra año"""
+    actual: float
+    mom: Optional[float] = None  # Diferencia absoluta vs mes anterior
+    mom_pct: Optional[float] = None
+    yoy: Optional[float] = None  # Diferencia absoluta vs mismo mes del año anterior
+    yoy_pct: Optional[float] = None
+
+class VariacionTienda(BaseModel):
+    """Variaciones de una tienda (o tienda × unidad)"""
+    tienda: str
+    unidad: Optional[str] = None
+    inventario: DeltaMetrica
+    ventas: DeltaMetrica
+    cobertura: DeltaMetrica
+
+class VariacionesResponse(BaseModel):
+    """Variaciones MoM/YoY de toda la cadena para un periodo"""
+    periodo: str
+    periodo_mom: Optional[str] = None  # None si no hay datos del mes anterior
+    periodo_yoy: Optional[str] = None
+    nivel: str  # "tienda" o "tienda_unidad"
+    variaciones: List[VariacionTienda]
+
+class Movimiento(BaseModel):
+    """Una posición del ranking de mayores movimientos"""
+    posicion: int
+    tienda: str
+    unidad: Optional[str] = None
+    actual: float
+    anterior: float
+    delta: float
+    delta_pct: float
+
+class MovimientosResponse(BaseModel):
+    """Ranking de mayores variaciones de una métrica"""
+    periodo: str
+    periodo_referencia: str
+    metrica: str  # inventario, ventas o cobertura
+    comparacion: str  # mom o yoy
+    direccion: str  # abs, sube o baja
+    k: int
+    movimientos: List[Movimiento]
+
+class SaludResponse(BaseModel):
+    """Salud general de la cadena en un periodo"""
+    periodo: str
+    salud_general: str  # EXCELENTE, BUENA, REGULAR, DEFICIENTE, CRÍTICA
+    score: int  # 1-5 (0 sin datos)
+    tiendas_saludables_pct: float
+    total_tiendas: int
+    tiendas_criticas: int
+    tiendas_optimas: int  # Incluye las excelentes
+    tiendas_excelentes: int  # ÓPTIMAS con cobertura en la banda de 40-70 días
+    tiendas_alerta: int  # SOBREINVENTARIO + SIN VENTAS
+    por_status: Dict[str, int]
+    version: int  # Versión de los datos con que se calculó
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "periodo": "Mayo 2025",
+                "salud_general": "BUENA",
+                "score": 4,
+                "tiendas_saludables_pct": 70.6,
+                "total_tiendas": 17,
+                "tiendas_criticas": 4,
+                "tiendas_optimas": 12,
+                "tiendas_excelentes": 5,
+                "tiendas_alerta": 1,
+                "por_status": {"SIN VENTAS": 0, "CRÍTICO": 4, "ÓPTIMO": 12, "SOBREINVENTARIO": 1},
+                "version": 1
+            }
+        }
+
+class PronosticoTienda(BaseModel):
+    """Proyección de desabasto de una tienda (o tienda × unidad)"""
+    posicion: int
+    tienda: str
+    unidad: Optional[str] = None
+    inventario: int
+    ventas_pronostico: float  # Piezas pronosticadas para el mes siguiente
+    cobertura_proyectada: float  # Días hasta desabasto a la demanda pronosticada
+    dias_hasta_critico: float  # Días hasta caer bajo el benchmark mínimo
+    status_proyectado: str
+    critico_proximo_mes: bool
+
+class PronosticoResponse(BaseModel):
+    """Tiendas que se quedarían sin inventario más pronto"""
+    periodo_base: str
+    periodo_pronostico: str
+    metodo: str  # ses, estacional o combinado
+    nivel: str  # "tienda" o "tienda_unidad"
+    benchmark_min_dias: int
+    total_criticos_proximo_mes: int
+    pronosticos: List[PronosticoTienda]
+
+class CatalogoResponse(BaseModel):
+    """Dimensiones con datos: tiendas, unidades de negocio y periodos"""
+    tiendas: List[str]
+    unidades: List[str]
+    periodos: List[str]  # "AAAA-MM", ordenados
+    primer_periodo: Optional[str] = None
+    ultimo_periodo: Optional[str] = None
+    rango: str  # Ej. "Enero 2023 a Mayo 2025"
+    version: int  # Versión de los datos (0 si se leyó directo de la base)
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "tiendas": ["Tienda 1", "Tienda 2"],
+                "unidades": ["Caballero", "Dama"],
+                "periodos": ["2023-01", "2023-02"],
+                "primer_periodo": "2023-01",
+                "ultimo_periodo": "2025-05",
+                "rango": "Enero 2023 a Mayo 2025",
+                "version": 1
+            }
+        }
+
+class FiltrosConsulta(BaseModel):
+    """Filtros por dimensión; una lista vacía no filtra"""
+    tienda: List[str] = Field(default_factory=list)
+    unidad: List[str] = Field(default_factory=list)
+    anio: List[int] = Field(default_factory=list)
+    mes: List[int] = Field(default_factory=list)
+    desde: Optional[str] = Field(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="Primer periodo AAAA-MM")
+    hasta: Optional[str] = Field(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$", description="Último periodo AAAA-MM")
+
+class CondicionConsulta(BaseModel):
+    """Condición sobre una medida agregada (ej. cobertura < 28)"""
+    medida: str = Field(..., pattern="^(inventario|ventas|cobertura|sell_through)$")
+    operador: str = Field(..., pattern="^(=|<>|>|>=|<|<=)$")
+    valor: float
+
+class ConsultaRequest(BaseModel):
+    """Corte ad-hoc de inventario y ventas"""
+    dimensiones: List[str] = Field(default_factory=lambda: ["tienda"], description="tienda, unidad, anio, mes")
+    medidas: List[str] = Field(
+        default_factory=lambda: ["inventario", "ventas", "cobertura"],
+        description="inventario, ventas, cobertura, sell_through, status"
+    )
+    filtros: FiltrosConsulta = Field(default_factory=FiltrosConsulta)
+    condiciones: List[CondicionConsulta] = Field(default_factory=list)
+    orden: List[str] = Field(default_factory=list, description="Dimensiones o medidas; prefijo '-' descendente")
+    limite: int = Field(100, ge=1, le=1000)
+    offset: int = Field(0, ge=0)
+    base: str = Field(
+        "inventario",
+        pattern="^(inventario|completa)$",
+        description="inventario: ventas solo donde hay inventario (como el dashboard); completa: cada tabla por separado"
+    )
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "dimensiones": ["tienda", "unidad"],
+                "medidas": ["inventario", "ventas", "cobertura", "status"],
+                "filtros": {"anio": [2025], "mes": [5]},
+                "condiciones": [{"medida": "cobertura", "operador": "<", "valor": 28}],
+                "orden": ["cobertura"],
+                "limite": 20
+            }
+        }
+
+class ConsultaResponse(BaseModel):
+    """Filas del corte pedido, paginadas"""
+    columnas: List[str]
+    filas: List[Dict[str, Any]]
+    limite: int
+    offset: int
+    hay_mas: bool  # Hay más filas después de esta página
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "columnas": ["tienda", "unidad", "inventario", "ventas", "cobertura", "status"],
+                "filas": [
+                    {"tienda": "Tienda 5", "unidad": "Dama", "inventario": 320, "ventas": 610,
+                     "cobertura": 15.7, "status": "CRÍTICO"}
+                ],
+                "limite": 20,
+                "offset": 0,
+                "hay_mas": False
+            }
+        }
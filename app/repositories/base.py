@@ -0,0 +1,271 @@
+"""
+Capa de fuentes de datos
+Interfaz de repositorio detrás de los servicios del dashboard y del cubo.
+Las fuentes (Db2, réplica SQLite o snapshot Parquet) solo aportan la
+conexión y la ejecución; las sentencias son las mismas para todas
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from app.config import settings
+from app.repositories.consulta import Consulta, construir_sql
+from app.utils import cancelacion, telemetry
+from app.utils.sql_profiler import PerfiladorSQL
+import logging
+
+logger = logging.getLogger(__name__)
+
+perfilador = PerfiladorSQL(
+    umbral_lento_ms=settings.SQL_SLOW_QUERY_MS,
+    capturar_explain=settings.SQL_EXPLAIN_SLOW
+)
+
+# Ejecuta (statement_id, sql, params) y devuelve todas las filas
+Ejecutor = Callable[[str, str, tuple], List[tuple]]
+
+class SesionDatos:
+    """
+    Consultas del dashboard sobre una conexión abierta
+
+    Todas devuelven filas crudas (tuplas); el cálculo de KPIs queda en los
+    servicios para que sea idéntico con cualquier fuente
+
+    Args:
+        ejecutar: Función que ejecuta una sentencia perfilada
+        esquema: Esquema de las tablas INVENTARIO/VENTAS (vacío = sin prefijo)
+        dialecto: "db2" o "sqlite" (sintaxis de paginación)
+    """
+
+    def __init__(self, ejecutar: Ejecutor, esquema: str = "", dialecto: str = "db2"):
+        self._ejecutar = ejecutar
+        self._prefijo = f"{esquema}." if esquema else ""
+        self.dialecto = dialecto
+
+    def tabla(self, nombre: str) -> str:
+        return f"{self._prefijo}{nombre}"
+
+    def ejecutar(self, statement_id: str, sql: str, params: tuple = ()) -> List[tuple]:
+        return self._ejecutar(statement_id, sql, params)
+
+    def consultar(self, consulta: Consulta, statement_id: Optional[str] = None) -> List[tuple]:
+        """
+        Ejecutar una consulta agregada del motor genérico
+
+        Returns:
+            Filas con las columnas de `consulta.columnas`
+        """
+        sql, params = construir_sql(consulta, self.tabla, self.dialecto)
+        if statement_id is None:
+            statement_id = "consulta_" + ("_".join(consulta.dimensiones) or "total")
+        return self.ejecutar(statement_id, sql, params)
+
+    def resumen_por_tienda(self, year: int, month: int) -> List[tuple]:
+        """Filas (tienda, inventario, ventas) de un periodo, ordenadas por tienda"""
+        return self.consultar(
+            Consulta(["tienda"], filtros={"anio": [year], "mes": [month]}),
+            "resumen_por_tienda"
+        )
+
+    def catalogo(self) -> Tuple[List[tuple], List[tuple]]:
+        """
+        Dimensiones distintas de INVENTARIO y VENTAS
+
+        Returns:
+            Tupla (filas (tienda, anio, mes, en_inventario), filas (unidad,))
+        """
+        sql_tiendas = f"""
+        SELECT TIENDA, ANIO, MES, MAX(EN_INVENTARIO)
+        FROM (
+            SELECT DISTINCT TIENDA, ANIO, MES, 1 AS EN_INVENTARIO FROM {self.tabla("INVENTARIO")}
+            UNION ALL
+            SELECT DISTINCT TIENDA, ANIO, MES, 0 AS EN_INVENTARIO FROM {self.tabla("VENTAS")}
+        ) T
+        GROUP BY TIENDA, ANIO, MES
+        """
+        sql_unidades = f"""
+        SELECT DISTINCT UNIDAD_NEGOCIO FROM {self.tabla("INVENTARIO")}
+        UNION
+        SELECT DISTINCT UNIDAD_NEGOCIO FROM {self.tabla("VENTAS")}
+        """
+        return (
+            self.ejecutar("catalogo_tiendas", sql_tiendas),
+            self.ejecutar("catalogo_unidades", sql_unidades)
+        )
+
+    def unidades_tiendas(self, tiendas: List[str], year: int, month: int) -> List[tuple]:
+        """
+        Filas (tienda, unidad, inventario, ventas) de una o varias tiendas en un periodo
+
+        Incluye unidades con ventas y sin inventario; cada tabla se filtra
+        (WHERE TIENDA IN (...)) antes de unirse, no después del FULL OUTER
+        JOIN, así un lote de detalles se resuelve en una sola ida a la base
+        """
+        return self.consultar(
+            Consulta(["tienda", "unidad"], filtros={"tienda": tiendas, "anio": [year], "mes": [month]}, base="completa"),
+            "tienda_unidades"
+        )
+
+    def historico(self, year: int, tienda: Optional[str] = None) -> List[tuple]:
+        """Filas (mes, inventario, ventas) de un año, de una tienda o de la cadena"""
+        filtros = {"anio": [year]}
+        if tienda:
+            filtros["tienda"] = [tienda]
+        return self.consultar(
+            Consulta(["mes"], filtros=filtros),
+            "historico_tienda" if tienda else "historico_cadena"
+        )
+
+    def huellas(self, desde: Optional[Tuple[int, int]] = None) -> List[tuple]:
+        """
+        Filas (tabla, anio, mes, filas, suma, suma ponderada) por periodo de
+        INVENTARIO y VENTAS, para detectar qué meses cambiaron
+
+        La suma ponderada multiplica las piezas de cada fila por un hash de
+        (TIENDA, UNIDAD_NEGOCIO): cambia si las piezas se mueven entre
+        tiendas o unidades aunque el total del mes quede igual
+
+        Args:
+            desde: Solo los periodos a partir de este (anio, mes)
+        """
+        # HASH4(..., 1) es CRC32 en Db2; las conexiones SQLite la registran igual
+        peso = "HASH4(RTRIM(TIENDA) || '|' || RTRIM(UNIDAD_NEGOCIO), 1)"
+        peso = f"({peso} % 65536)" if self.dialecto == "sqlite" else f"MOD({peso}, 65536)"
+        partes = []
+        params: list = []
+        for tabla, columna in (("INVENTARIO", "INV_PZS"), ("VENTAS", "VTA_PZS")):
+            where = ""
+            if desde is not None:
+                where = "WHERE ANIO > ? OR (ANIO = ? AND MES >= ?)"
+                params += [desde[0], desde[0], desde[1]]
+            partes.append(f"""
+            SELECT '{tabla}', ANIO, MES, COUNT(*),
+                SUM(CAST({columna} AS BIGINT)), SUM(CAST({columna} AS BIGINT) * {peso})
+            FROM {self.tabla(tabla)}
+            {where}
+            GROUP BY ANIO, MES
+            """)
+        return self.ejecutar(
+            "huellas_recientes" if desde is not None else "huellas_periodo",
+            "UNION ALL".join(partes),
+            tuple(params)
+        )
+
+    def cubo(self, periodos: Optional[List[Tuple[int, int]]] = None) -> List[tuple]:
+        """
+        Filas (tienda, unidad, anio, mes, inventario, ventas, presente) de toda
+        la cadena, o solo de los periodos indicados
+
+        Cada tabla se agrega por separado y luego se unen, así el join trabaja
+        sobre una fila por llave en lugar de sobre las tablas completas
+        """
+        where, params = _filtro_periodos(periodos)
+        sql = f"""
+        SELECT
+            COALESCE(I.TIENDA, V.TIENDA),
+            COALESCE(I.UNIDAD_NEGOCIO, V.UNIDAD_NEGOCIO),
+            COALESCE(I.ANIO, V.ANIO),
+            COALESCE(I.MES, V.MES),
+            COALESCE(I.INV_PZS, 0),
+            COALESCE(V.VTA_PZS, 0),
+            CASE WHEN I.TIENDA IS NULL THEN 0 ELSE 1 END
+        FROM (
+            SELECT TIENDA, UNIDAD_NEGOCIO, ANIO, MES, SUM(INV_PZS) AS INV_PZS
+            FROM {self.tabla("INVENTARIO")}
+            {where}
+            GROUP BY TIENDA, UNIDAD_NEGOCIO, ANIO, MES
+        ) I
+        FULL OUTER JOIN (
+            SELECT TIENDA, UNIDAD_NEGOCIO, ANIO, MES, SUM(VTA_PZS) AS VTA_PZS
+            FROM {self.tabla("VENTAS")}
+            {where}
+            GROUP BY TIENDA, UNIDAD_NEGOCIO, ANIO, MES
+        ) V
+            ON I.TIENDA = V.TIENDA
+            AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
+            AND I.ANIO = V.ANIO
+            AND I.MES = V.MES
+        """
+        if periodos is None:
+            return self.ejecutar("cubo_cadena", sql)
+        return self.ejecutar("cubo_periodos", sql, params + params)
+
+    def tabla_completa(self, nombre: str, periodos: Optional[List[Tuple[int, int]]] = None) -> List[tuple]:
+        """Filas (tienda, unidad, anio, mes, piezas) de INVENTARIO o VENTAS (o de algunos periodos), para snapshots"""
+        columna = "INV_PZS" if nombre == "INVENTARIO" else "VTA_PZS"
+        where, params = _filtro_periodos(periodos)
+        sql = f"""
+        SELECT TIENDA, UNIDAD_NEGOCIO, ANIO, MES, {columna}
+        FROM {self.tabla(nombre)}
+        {where}
+        """
+        if periodos is None:
+            return self.ejecutar(f"snapshot_{nombre.lower()}", sql)
+        return self.ejecutar(f"snapshot_{nombre.lower()}_periodos", sql, params)
+
+def _filtro_periodos(periodos: Optional[List[Tuple[int, int]]]) -> Tuple[str, tuple]:
+    """WHERE de una lista de (anio, mes); vacío si no se filtra"""
+    if periodos is None:
+        return "", ()
+    if not periodos:
+        return "WHERE 1 = 0", ()
+    condiciones = " OR ".join("(ANIO = ? AND MES = ?)" for _ in periodos)
+    return f"WHERE {condiciones}", tuple(v for periodo in periodos for v in periodo)
+
+class FuenteDatos(ABC):
+    """
+    Fuente intercambiable de INVENTARIO/VENTAS
+
+    Las subclases abren una sesión (conexión + ejecución perfilada) y
+    saben probar su propia disponibilidad
+    """
+
+    nombre: str = "fuente"
+
+    @abstractmethod
+    @contextmanager
+    def sesion(self) -> Iterator[SesionDatos]:
+        """Sesión de consultas; la conexión se libera al salir"""
+
+    def probar(self) -> bool:
+        """True si la fuente responde"""
+        try:
+            with self.sesion() as sesion:
+                sesion.ejecutar("probar", f"SELECT COUNT(*) FROM {sesion.tabla('INVENTARIO')} WHERE 1 = 0")
+            return True
+        except Exception as e:
+            logger.warning(f"Fuente {self.nombre} no disponible: {str(e)}")
+            return False
+
+    def cerrar(self) -> None:
+        """Liberar recursos compartidos (conexiones abiertas, memoria)"""
+
+def medir_sentencia(
+    statement_id: str,
+    sql: str,
+    params: tuple,
+    preparar: Callable[[], Any],
+    ejecutar: Callable[[Any], None],
+    leer: Callable[[Any], List[tuple]],
+    explain: Optional[Callable[[], Optional[List[Dict[str, Any]]]]] = None
+) -> List[tuple]:
+    """
+    Ejecutar una sentencia midiendo prepare/execute/fetch
+
+    Se mide como la etapa db_query y queda perfilada por statement_id
+    (histogramas por fase, filas y slow query log) igual en todas las fuentes.
+    Si el request ya se canceló la sentencia no se envía
+
+    Raises:
+        Cancelado: El request dueño de la sesión se canceló
+    """
+    cancelacion.verificar("db_query")
+    with telemetry.span("db_query"), perfilador.medir(statement_id, params, sql=sql, explain=explain) as perfil:
+        with perfil.fase("prepare"):
+            stmt = preparar()
+        with perfil.fase("execute"):
+            ejecutar(stmt)
+        with perfil.fase("fetch"):
+            filas = leer(stmt)
+        perfil.filas = len(filas)
+    return filas
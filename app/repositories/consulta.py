@@ -0,0 +1,224 @@
+"""
+Motor de consultas agregadas
+Genera el SQL de cualquier corte de INVENTARIO/VENTAS a partir de
+dimensiones, medidas, filtros, orden y límite. Cada tabla se pre-agrega con
+los filtros ya aplicados sobre sus columnas (así Db2 puede usar los índices
+por ANIO, MES, TIENDA, UNIDAD_NEGOCIO) y después se unen; el orden, las
+condiciones sobre medidas y la paginación también se resuelven en la base
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Dimensión -> columna
+DIMENSIONES = {
+    "tienda": "TIENDA",
+    "unidad": "UNIDAD_NEGOCIO",
+    "anio": "ANIO",
+    "mes": "MES"
+}
+
+# Medida -> expresión sobre el agregado A (INVENTARIO, VENTAS)
+MEDIDAS = {
+    "inventario": "A.INVENTARIO",
+    "ventas": "A.VENTAS",
+    "cobertura": "CASE WHEN A.VENTAS <> 0 THEN A.INVENTARIO * 30.0 / A.VENTAS END",
+    "sell_through": "CASE WHEN A.INVENTARIO <> 0 THEN A.VENTAS * 100.0 / A.INVENTARIO ELSE 0 END"
+}
+
+# Medidas que pueden ser nulas (cobertura sin ventas = infinita)
+NULABLES = {"cobertura"}
+
+OPERADORES = ("=", "<>", ">", ">=", "<", "<=")
+
+# inventario: ventas solo de llaves con fila en INVENTARIO (igual que los dashboards)
+# completa: cada tabla suma por separado (unión de llaves)
+BASES = ("inventario", "completa")
+
+LLAVE = ("TIENDA", "UNIDAD_NEGOCIO", "ANIO", "MES")
+
+@dataclass
+class Condicion:
+    """Condición sobre una medida (ej. cobertura < 28)"""
+    medida: str
+    operador: str
+    valor: float
+
+@dataclass
+class Consulta:
+    """
+    Corte agregado de inventario y ventas
+
+    Args:
+        dimensiones: Agrupación (claves de DIMENSIONES); vacía = total
+        medidas: Columnas de salida (claves de MEDIDAS)
+        filtros: Dimensión -> valores permitidos
+        desde: Primer periodo (año, mes) incluido
+        hasta: Último periodo (año, mes) incluido
+        condiciones: Filtros sobre medidas ya agregadas
+        orden: Campos (dimensión o medida); prefijo "-" para descendente
+        limite: Máximo de filas (None = todas)
+        offset: Filas a saltar
+        base: Ver BASES
+    """
+    dimensiones: List[str]
+    medidas: List[str] = field(default_factory=lambda: ["inventario", "ventas"])
+    filtros: Dict[str, List[Any]] = field(default_factory=dict)
+    desde: Optional[Tuple[int, int]] = None
+    hasta: Optional[Tuple[int, int]] = None
+    condiciones: List[Condicion] = field(default_factory=list)
+    orden: List[str] = field(default_factory=list)
+    limite: Optional[int] = None
+    offset: int = 0
+    base: str = "inventario"
+
+    def validar(self) -> None:
+        """
+        Raises:
+            ValueError: Dimensión, medida, operador, orden o base inválidos
+        """
+        for d in list(self.dimensiones) + list(self.filtros):
+            if d not in DIMENSIONES:
+                raise ValueError(f"Dimensión inválida: {d}")
+        if len(set(self.dimensiones)) != len(self.dimensiones):
+            raise ValueError("Dimensiones repetidas")
+        if not self.medidas:
+            raise ValueError("La consulta necesita al menos una medida")
+        for m in list(self.medidas) + [c.medida for c in self.condiciones]:
+            if m not in MEDIDAS:
+                raise ValueError(f"Medida inválida: {m}")
+        for c in self.condiciones:
+            if c.operador not in OPERADORES:
+                raise ValueError(f"Operador inválido: {c.operador}")
+        for campo in self.orden:
+            nombre = campo.lstrip("-")
+            if nombre not in MEDIDAS and nombre not in self.dimensiones:
+                raise ValueError(f"No se puede ordenar por {nombre}: debe ser medida o dimensión de la consulta")
+        if self.base not in BASES:
+            raise ValueError(f"Base inválida: {self.base}")
+        if (self.limite is not None and self.limite < 1) or self.offset < 0:
+            raise ValueError("Límite u offset inválido")
+
+    @property
+    def columnas(self) -> List[str]:
+        """Nombres de las columnas del resultado, en orden"""
+        return list(self.dimensiones) + list(self.medidas)
+
+def _filtros_sql(consulta: Consulta) -> Tuple[str, list]:
+    """WHERE sobre columnas base (sin funciones, para que los índices apliquen)"""
+    condiciones = []
+    params: list = []
+
+    for dimension, valores in consulta.filtros.items():
+        valores = list(valores)
+        if not valores:
+            continue
+        columna = DIMENSIONES[dimension]
+        if len(valores) == 1:
+            condiciones.append(f"{columna} = ?")
+        else:
+            condiciones.append(f"{columna} IN ({', '.join('?' for _ in valores)})")
+        params.extend(valores)
+
+    if consulta.desde:
+        condiciones.append("(ANIO > ? OR (ANIO = ? AND MES >= ?))")
+        params.extend([consulta.desde[0], consulta.desde[0], consulta.desde[1]])
+    if consulta.hasta:
+        condiciones.append("(ANIO < ? OR (ANIO = ? AND MES <= ?))")
+        params.extend([consulta.hasta[0], consulta.hasta[0], consulta.hasta[1]])
+
+    return (" WHERE " + " AND ".join(condiciones) if condiciones else ""), params
+
+def _preagregado(tabla: str, columna: str, alias: str, grano: List[str], where: str) -> str:
+    seleccion = ", ".join(grano + [f"SUM({columna}) AS {alias}"])
+    agrupacion = f" GROUP BY {', '.join(grano)}" if grano else ""
+    return f"SELECT {seleccion} FROM {tabla}{where}{agrupacion}"
+
+def _paginar(limite: Optional[int], offset: int, dialecto: str) -> str:
+    """Top-N y paginación (enteros ya validados, van como literales)"""
+    if limite is None and not offset:
+        return ""
+    if dialecto == "db2":
+        sql = f" OFFSET {int(offset)} ROWS" if offset else ""
+        if limite is not None:
+            sql += f" FETCH FIRST {int(limite)} ROWS ONLY"
+        return sql
+    return f" LIMIT {int(limite) if limite is not None else -1} OFFSET {int(offset)}"
+
+def construir_sql(consulta: Consulta, tabla: Callable[[str], str], dialecto: str = "db2") -> Tuple[str, tuple]:
+    """
+    SQL parametrizado de una consulta
+
+    Args:
+        consulta: Consulta validada
+        tabla: Nombre calificado de una tabla ("INVENTARIO" -> "ESQUEMA.INVENTARIO")
+        dialecto: "db2" (OFFSET/FETCH FIRST) o "sqlite" (LIMIT/OFFSET)
+
+    Returns:
+        Tupla (sql, params); las filas traen `consulta.columnas` en orden
+    """
+    consulta.validar()
+    columnas_dim = [DIMENSIONES[d] for d in consulta.dimensiones]
+    where, params_filtro = _filtros_sql(consulta)
+
+    if consulta.base == "inventario":
+        # Pre-agregado a nivel llave: las ventas solo cuentan donde hay inventario
+        grano = list(LLAVE)
+        union = " AND ".join(f"I.{c} = V.{c}" for c in LLAVE)
+        agregado = f"""
+            SELECT {", ".join([f"I.{c} AS {c}" for c in columnas_dim] + [
+                "COALESCE(SUM(I.INV_PZS), 0) AS INVENTARIO",
+                "SUM(COALESCE(V.VTA_PZS, 0)) AS VENTAS"
+            ])}
+            FROM ({_preagregado(tabla("INVENTARIO"), "INV_PZS", "INV_PZS", grano, where)}) I
+            LEFT JOIN ({_preagregado(tabla("VENTAS"), "VTA_PZS", "VTA_PZS", grano, where)}) V
+                ON {union}
+            {"GROUP BY " + ", ".join(f"I.{c}" for c in columnas_dim) if columnas_dim else ""}
+        """
+    else:
+        # Pre-agregado directo al grano pedido y unión completa de llaves
+        grano = columnas_dim
+        if grano:
+            union = "FULL OUTER JOIN ({v}) V ON " + " AND ".join(f"I.{c} = V.{c}" for c in grano)
+        else:
+            union = "CROSS JOIN ({v}) V"
+        agregado = f"""
+            SELECT {", ".join([f"COALESCE(I.{c}, V.{c}) AS {c}" for c in columnas_dim] + [
+                "COALESCE(I.INV_PZS, 0) AS INVENTARIO",
+                "COALESCE(V.VTA_PZS, 0) AS VENTAS"
+            ])}
+            FROM ({_preagregado(tabla("INVENTARIO"), "INV_PZS", "INV_PZS", grano, where)}) I
+            {union.format(v=_preagregado(tabla("VENTAS"), "VTA_PZS", "VTA_PZS", grano, where))}
+        """
+    params = params_filtro + params_filtro
+
+    derivado = ", ".join(["A.*"] + [f"{expr} AS {m.upper()}" for m, expr in MEDIDAS.items() if expr != f"A.{m.upper()}"])
+
+    condiciones = []
+    for c in consulta.condiciones:
+        condiciones.append(f"R.{c.medida.upper()} {c.operador} ?")
+        params.append(c.valor)
+
+    # Orden pedido y después las dimensiones, para que la paginación sea estable
+    orden = []
+    for campo in consulta.orden + [d for d in consulta.dimensiones if d not in {o.lstrip("-") for o in consulta.orden}]:
+        nombre = campo.lstrip("-")
+        desc = campo.startswith("-")
+        columna = f"R.{DIMENSIONES.get(nombre, nombre.upper())}"
+        if nombre in NULABLES:
+            # Nulo = infinito: al final en ascendente, al inicio en descendente
+            orden.append(f"CASE WHEN {columna} IS NULL THEN {0 if desc else 1} ELSE {1 if desc else 0} END")
+        orden.append(f"{columna}{' DESC' if desc else ''}")
+
+    salida = ", ".join([f"R.{c}" for c in columnas_dim] + [f"R.{m.upper()}" for m in consulta.medidas])
+    sql = f"""
+    SELECT {salida}
+    FROM (
+        SELECT {derivado}
+        FROM ({agregado}) A
+    ) R
+    {"WHERE " + " AND ".join(condiciones) if condiciones else ""}
+    {"ORDER BY " + ", ".join(orden) if orden else ""}
+    {_paginar(consulta.limite, consulta.offset, dialecto)}
+    """
+    return sql, tuple(params)
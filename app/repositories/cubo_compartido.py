@@ -0,0 +1,174 @@
+"""
+Snapshot del cubo compartido entre procesos
+Un solo proceso (el cargador) escribe el cubo de inventario en un archivo y
+los workers lo mapean en memoria de solo lectura: los arreglos NumPy apuntan
+directo a las páginas del archivo, así N workers comparten una sola copia.
+Cada versión se escribe aparte y se publica con un rename atómico; un
+worker que aún tiene mapeada la anterior la sigue leyendo sin problema
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Optional, Tuple
+import numpy as np
+from app.utils.metrics_engine import CuboInventario
+import logging
+
+logger = logging.getLogger(__name__)
+
+MAGIA = b"CALZCUBO"
+FORMATO = 1
+ALINEACION = 64  # Los arreglos empiezan alineados a línea de caché
+
+# Identidad del archivo publicado (inodo, mtime, tamaño): cambia con cada versión
+Identidad = Tuple[int, int, int]
+
+def _alinear(n: int) -> int:
+    return (n + ALINEACION - 1) // ALINEACION * ALINEACION
+
+def _identidad(st: os.stat_result) -> Identidad:
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+def identidad(ruta: str) -> Optional[Identidad]:
+    """Identidad del snapshot publicado (None si aún no existe)"""
+    try:
+        return _identidad(os.stat(ruta))
+    except FileNotFoundError:
+        return None
+
+def publicar(cubo: CuboInventario, ruta: str) -> int:
+    """
+    Escribir el cubo y publicarlo de forma atómica
+
+    Formato: MAGIA | largo del encabezado (uint64) | encabezado JSON |
+    arreglos inv, vta (float64) y presente (bool), cada uno alineado
+
+    Returns:
+        Bytes escritos
+    """
+    arreglos = {
+        "inv": np.ascontiguousarray(cubo.inv, dtype=np.float64),
+        "vta": np.ascontiguousarray(cubo.vta, dtype=np.float64),
+        "presente": np.ascontiguousarray(cubo.presente, dtype=np.bool_)
+    }
+    offsets = {}
+    posicion = 0
+    for nombre, arreglo in arreglos.items():
+        offsets[nombre] = {"dtype": arreglo.dtype.str, "offset": posicion}
+        posicion = _alinear(posicion + arreglo.nbytes)
+
+    encabezado = json.dumps({
+        "formato": FORMATO,
+        "version": cubo.version,
+        "tiendas": list(cubo.tiendas),
+        "unidades": list(cubo.unidades),
+        "periodos": [list(p) for p in cubo.periodos],
+        "forma": list(cubo.inv.shape),
+        "huellas": [[*periodo, *huella] for periodo, huella in cubo.huellas.items()],
+        "recarga": None if cubo.recargados is None else {
+            "base_version": cubo.base_version,
+            "periodos": [list(p) for p in sorted(cubo.recargados)]
+        },
+        "arreglos": offsets
+    }, ensure_ascii=False).encode("utf-8")
+    inicio_datos = _alinear(len(MAGIA) + 8 + len(encabezado))
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(MAGIA)
+        f.write(struct.pack("<Q", len(encabezado)))
+        f.write(encabezado)
+        for nombre, arreglo in arreglos.items():
+            f.seek(inicio_datos + offsets[nombre]["offset"])
+            f.write(memoryview(arreglo).cast("B"))
+        f.truncate(inicio_datos + posicion)
+        f.flush()
+        os.fsync(f.fileno())
+    # Los workers ven la versión anterior o la nueva completa, nunca una a medias
+    os.replace(temporal, ruta)
+
+    tamano = inicio_datos + posicion
+    logger.info(f"Cubo v{cubo.version} publicado en {ruta} ({tamano / 1e6:.1f} MB)")
+    return tamano
+
+def leer_version(ruta: str) -> int:
+    """Versión del snapshot publicado (0 si no hay o no se puede leer)"""
+    try:
+        with open(ruta, "rb") as f:
+            if f.read(len(MAGIA)) != MAGIA:
+                return 0
+            largo, = struct.unpack("<Q", f.read(8))
+            return int(json.loads(f.read(largo))["version"])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+def abrir(ruta: str, espera: float = 0.0) -> Tuple[CuboInventario, Identidad]:
+    """
+    Mapear el snapshot publicado (solo lectura, sin copiar los arreglos)
+
+    Args:
+        ruta: Archivo publicado por el cargador
+        espera: Segundos a esperar si todavía no existe (arranque)
+
+    Returns:
+        Tupla (cubo, identidad del archivo mapeado)
+
+    Raises:
+        FileNotFoundError: El cargador no publicó nada dentro de la espera
+        ValueError: El archivo no es un snapshot válido
+    """
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            f = open(ruta, "rb")
+            break
+        except FileNotFoundError:
+            if time.monotonic() >= limite:
+                raise FileNotFoundError(f"No hay snapshot del cubo en {ruta}; ¿está corriendo el cargador?")
+            time.sleep(0.1)
+
+    with f:
+        ident = _identidad(os.fstat(f.fileno()))
+        mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapa[:len(MAGIA)] != MAGIA:
+        raise ValueError(f"{ruta} no es un snapshot del cubo")
+    largo, = struct.unpack_from("<Q", mapa, len(MAGIA))
+    meta = json.loads(mapa[len(MAGIA) + 8:len(MAGIA) + 8 + largo])
+    if meta["formato"] != FORMATO:
+        raise ValueError(f"Formato de snapshot {meta['formato']} no soportado")
+    inicio_datos = _alinear(len(MAGIA) + 8 + largo)
+
+    forma = tuple(meta["forma"])
+    elementos = int(np.prod(forma))
+    arreglos = {}
+    for nombre, info in meta["arreglos"].items():
+        dtype = np.dtype(info["dtype"])
+        if elementos == 0:
+            arreglos[nombre] = np.zeros(forma, dtype=dtype)
+            continue
+        # frombuffer sobre el mmap: vista de solo lectura, sin copia
+        arreglos[nombre] = np.frombuffer(
+            mapa, dtype=dtype, count=elementos, offset=inicio_datos + info["offset"]
+        ).reshape(forma)
+
+    cubo = CuboInventario(
+        tiendas=meta["tiendas"],
+        unidades=meta["unidades"],
+        periodos=[tuple(p) for p in meta["periodos"]],
+        inv=arreglos["inv"],
+        vta=arreglos["vta"],
+        presente=arreglos["presente"],
+        version=meta["version"],
+        huellas={(h[0], h[1]): tuple(h[2:]) for h in meta.get("huellas", [])}
+    )
+    recarga = meta.get("recarga")
+    if recarga:
+        cubo.base_version = recarga["base_version"]
+        cubo.recargados = frozenset(tuple(p) for p in recarga["periodos"])
+    return cubo, ident
@@ -0,0 +1,132 @@
+"""
+Fuente de datos IBM Db2
+Una conexión por sesión contra Db2 on Cloud (ibm_db)
+"""
+
+import math
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from app.config import settings
+from app.repositories.base import FuenteDatos, SesionDatos, medir_sentencia
+from app.utils import cancelacion, telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+def _leer_tuplas(ibm_db, stmt) -> List[tuple]:
+    token = cancelacion.actual()
+    filas = []
+    row = ibm_db.fetch_tuple(stmt)
+    while row:
+        filas.append(row)
+        if token is not None and token.cancelado:
+            # Soltar el cursor en lugar de seguir trayendo filas para nadie
+            ibm_db.free_stmt(stmt)
+            token.verificar("db_fetch")
+        row = ibm_db.fetch_tuple(stmt)
+    return filas
+
+class FuenteDb2(FuenteDatos):
+    """
+    Db2 con las credenciales DB2_* de Settings
+
+    ibm_db se importa al crear la fuente, así las fuentes locales no
+    requieren el driver instalado
+    """
+
+    nombre = "db2"
+
+    def __init__(self):
+        faltantes = [
+            v for v in ("DB2_DATABASE", "DB2_HOSTNAME", "DB2_PORT", "DB2_UID", "DB2_PWD")
+            if not getattr(settings, v)
+        ]
+        if faltantes:
+            raise ValueError(f"DATA_BACKEND=db2 requiere {', '.join(faltantes)}")
+
+        import ibm_db
+        self._ibm_db = ibm_db
+        self.esquema = settings.DB2_SCHEMA
+        self.dsn = (
+            f"DATABASE={settings.DB2_DATABASE};"
+            f"HOSTNAME={settings.DB2_HOSTNAME};"
+            f"PORT={settings.DB2_PORT};"
+            f"PROTOCOL=TCPIP;"
+            f"UID={settings.DB2_UID};"
+            f"PWD={settings.DB2_PWD};"
+            f"SECURITY=SSL;"
+        )
+
+    def conectar(self):
+        """Crear conexión a Db2"""
+        try:
+            with telemetry.span("db_connect"):
+                return self._ibm_db.connect(self.dsn, "", "")
+        except Exception as e:
+            logger.error(f"Error conectando a Db2: {e}")
+            raise ConnectionError(f"No se pudo conectar a Db2: {str(e)}")
+
+    @contextmanager
+    def sesion(self) -> Iterator[SesionDatos]:
+        conn = self.conectar()
+        try:
+            yield SesionDatos(lambda sid, sql, params: self._ejecutar(conn, sid, sql, params), self.esquema)
+        finally:
+            self._ibm_db.close(conn)
+
+    def probar(self) -> bool:
+        try:
+            conn = self.conectar()
+            self._ibm_db.close(conn)
+            return True
+        except Exception:
+            return False
+
+    def _ejecutar(self, conn, statement_id: str, sql: str, params: tuple) -> List[tuple]:
+        ibm_db = self._ibm_db
+        return medir_sentencia(
+            statement_id, sql, params,
+            preparar=lambda: self._preparar(conn, sql),
+            ejecutar=lambda stmt: ibm_db.execute(stmt, params),
+            leer=lambda stmt: _leer_tuplas(ibm_db, stmt),
+            explain=lambda: self._capturar_explain(conn, sql)
+        )
+
+    def _preparar(self, conn, sql: str):
+        """Preparar la sentencia con el plazo restante del request como query timeout"""
+        ibm_db = self._ibm_db
+        stmt = ibm_db.prepare(conn, sql)
+        restante = cancelacion.restante()
+        if restante is not None:
+            # Db2 interrumpe la sentencia por su cuenta si el request ya no puede responder
+            ibm_db.set_option(stmt, {ibm_db.SQL_ATTR_QUERY_TIMEOUT: max(1, math.ceil(restante))}, 0)
+        return stmt
+
+    def _capturar_explain(self, conn, sql: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Obtener el plan de acceso de una sentencia (requiere tablas EXPLAIN_*)
+        """
+        ibm_db = self._ibm_db
+        try:
+            ibm_db.exec_immediate(conn, f"EXPLAIN PLAN SET QUERYTAG = 'SLOWLOG' FOR {sql}")
+
+            sql_plan = f"""
+            SELECT OPERATOR_ID, OPERATOR_TYPE, TOTAL_COST, IO_COST, CPU_COST
+            FROM {settings.SQL_EXPLAIN_SCHEMA}.EXPLAIN_OPERATOR
+            WHERE EXPLAIN_TIME = (
+                SELECT MAX(EXPLAIN_TIME) FROM {settings.SQL_EXPLAIN_SCHEMA}.EXPLAIN_STATEMENT
+                WHERE QUERYTAG = 'SLOWLOG'
+            )
+            ORDER BY OPERATOR_ID
+            """
+            stmt = ibm_db.exec_immediate(conn, sql_plan)
+
+            plan = []
+            row = ibm_db.fetch_assoc(stmt)
+            while row:
+                plan.append({k.lower(): v for k, v in row.items()})
+                row = ibm_db.fetch_assoc(stmt)
+            return plan
+        except Exception as e:
+            logger.warning(f"No se pudo capturar EXPLAIN: {e}")
+            return None
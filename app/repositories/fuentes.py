@@ -0,0 +1,55 @@
+"""
+Selección de la fuente de datos activa según Settings
+DATA_BACKEND: "db2" (default), "sqlite" o "parquet"; las fuentes locales
+leen DATA_LOCAL_PATH
+"""
+
+import threading
+from typing import Optional
+from app.config import settings
+from app.repositories.base import FuenteDatos
+import logging
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("db2", "sqlite", "parquet")
+
+_fuente: Optional[FuenteDatos] = None
+_lock = threading.Lock()
+
+def crear_fuente(backend: str, ruta: Optional[str] = None) -> FuenteDatos:
+    """
+    Construir una fuente por nombre
+
+    Args:
+        backend: Uno de BACKENDS
+        ruta: Archivo SQLite o directorio Parquet (default: DATA_LOCAL_PATH)
+    """
+    ruta = ruta or settings.DATA_LOCAL_PATH
+    if backend == "db2":
+        from app.repositories.db2 import FuenteDb2
+        return FuenteDb2()
+    if backend == "sqlite":
+        from app.repositories.local import FuenteSQLite
+        return FuenteSQLite(ruta)
+    if backend == "parquet":
+        from app.repositories.local import FuenteParquet
+        return FuenteParquet(ruta)
+    raise ValueError(f"DATA_BACKEND inválido: '{backend}' (opciones: {', '.join(BACKENDS)})")
+
+def get_fuente() -> FuenteDatos:
+    """Fuente activa, creada en el primer uso"""
+    global _fuente
+    if _fuente is None:
+        with _lock:
+            if _fuente is None:
+                _fuente = crear_fuente(settings.DATA_BACKEND)
+                logger.info(f"Fuente de datos: {_fuente.nombre}")
+    return _fuente
+
+def cerrar() -> None:
+    global _fuente
+    with _lock:
+        if _fuente is not None:
+            _fuente.cerrar()
+            _fuente = None
@@ -0,0 +1,45 @@
+"""
+Huellas de INVENTARIO/VENTAS por periodo
+Filas, suma y suma ponderada por (TIENDA, UNIDAD_NEGOCIO) de las piezas
+por (ANIO, MES) en cada tabla. Comparar huellas dice qué meses cambiaron
+(altas, bajas o correcciones) sin releer sus filas; la suma ponderada
+detecta además piezas intercambiadas o movidas entre tiendas o unidades
+que dejan igual el total del mes
+"""
+
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+Periodo = Tuple[int, int]
+# (filas, suma, suma ponderada) de INVENTARIO y luego de VENTAS
+Huella = Tuple[int, int, int, int, int, int]
+
+_POSICION = {"INVENTARIO": 0, "VENTAS": 3}
+
+def por_periodo(filas: Iterable[Sequence]) -> Dict[Periodo, Huella]:
+    """Filas (tabla, anio, mes, filas, suma, ponderada) -> huella por periodo"""
+    acumulado: Dict[Periodo, list] = {}
+    for tabla, anio, mes, conteo, suma, ponderada in filas:
+        huella = acumulado.setdefault((int(anio), int(mes)), [0] * 6)
+        i = _POSICION[tabla.strip()]
+        huella[i:i + 3] = [int(conteo or 0), int(suma or 0), int(ponderada or 0)]
+    return {periodo: tuple(h) for periodo, h in sorted(acumulado.items())}
+
+def cambiados(
+    antes: Dict[Periodo, Huella],
+    despues: Dict[Periodo, Huella],
+    desde: Optional[Periodo] = None
+) -> Set[Periodo]:
+    """
+    Periodos nuevos, eliminados o con otra huella
+
+    Args:
+        desde: Si `despues` solo cubre los periodos a partir de este, los
+            anteriores de `antes` no se comparan
+    """
+    periodos = set(despues) | {p for p in antes if desde is None or p >= desde}
+    return {p for p in periodos if antes.get(p) != despues.get(p)}
+
+def restar_meses(periodo: Periodo, meses: int) -> Periodo:
+    anio, mes = periodo
+    total = anio * 12 + (mes - 1) - meses
+    return total // 12, total % 12 + 1
@@ -0,0 +1,242 @@
+"""
+Fuentes de datos locales
+Réplica SQLite en disco o snapshot Parquet, con las mismas tablas
+INVENTARIO/VENTAS que Db2. Sirven el dashboard a latencia de proceso y
+permiten correr la API y los benchmarks sin la nube
+"""
+
+import itertools
+import os
+import sqlite3
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from app.repositories import huellas
+from app.repositories.base import FuenteDatos, SesionDatos, medir_sentencia
+from app.utils import cancelacion
+import logging
+
+logger = logging.getLogger(__name__)
+
+TABLAS = {
+    "INVENTARIO": "INV_PZS",
+    "VENTAS": "VTA_PZS"
+}
+
+_ESQUEMA_SQLITE = """
+CREATE TABLE IF NOT EXISTS {tabla} (
+    TIENDA TEXT NOT NULL, UNIDAD_NEGOCIO TEXT NOT NULL,
+    ANIO INTEGER NOT NULL, MES INTEGER NOT NULL, {columna} INTEGER
+);
+CREATE INDEX IF NOT EXISTS IX_{tabla} ON {tabla} (ANIO, MES, TIENDA, UNIDAD_NEGOCIO);
+"""
+
+_memorias = itertools.count(1)
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise RuntimeError("Los snapshots Parquet requieren el paquete 'pyarrow'") from e
+    return pyarrow, pyarrow.parquet
+
+def _hash4(texto: Optional[str], algoritmo: int = 0) -> Optional[int]:
+    """HASH4 de Db2: Adler-32 (0) o CRC32 (1) del texto en UTF-8, como INTEGER con signo"""
+    if texto is None:
+        return None
+    datos = texto.encode("utf-8")
+    valor = zlib.crc32(datos) if algoritmo == 1 else zlib.adler32(datos)
+    return valor - (1 << 32) if valor >= 1 << 31 else valor
+
+def registrar_funciones(conn: sqlite3.Connection) -> None:
+    """Funciones de Db2 que usan las consultas y SQLite no trae"""
+    conn.create_function("HASH4", 2, _hash4, deterministic=True)
+
+def crear_tablas(conn: sqlite3.Connection, filas: Dict[str, List[tuple]]) -> None:
+    """Crear INVENTARIO/VENTAS con sus índices y cargar las filas (tienda, unidad, anio, mes, piezas)"""
+    for tabla, columna in TABLAS.items():
+        conn.executescript(_ESQUEMA_SQLITE.format(tabla=tabla, columna=columna))
+        conn.execute(f"DELETE FROM {tabla}")
+        conn.executemany(f"INSERT INTO {tabla} VALUES (?, ?, ?, ?, ?)", filas.get(tabla, []))
+    conn.commit()
+
+class FuenteSQLite(FuenteDatos):
+    """
+    Réplica SQLite de solo lectura
+
+    Cada hilo del pool reutiliza su propia conexión (sqlite3 no comparte
+    conexiones entre hilos), así una sesión no paga el costo de conectar
+
+    Args:
+        ruta: Archivo .sqlite con las tablas INVENTARIO y VENTAS
+    """
+
+    nombre = "sqlite"
+
+    def __init__(self, ruta: str):
+        if not os.path.exists(ruta):
+            raise FileNotFoundError(f"No existe la réplica SQLite {ruta}")
+        self.ruta = ruta
+        self._uri = f"file:{os.path.abspath(ruta)}?mode=ro"
+        self._local = threading.local()
+
+    def _conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+            registrar_funciones(conn)
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def sesion(self) -> Iterator[SesionDatos]:
+        conn = self._conexion()
+        yield SesionDatos(lambda sid, sql, params: self._ejecutar(conn, sid, sql, params), dialecto="sqlite")
+
+    def _ejecutar(self, conn: sqlite3.Connection, statement_id: str, sql: str, params: tuple) -> List[tuple]:
+        token = cancelacion.actual()
+        # Si el request se cancela, la sentencia en curso se interrumpe desde el loop
+        quitar = token.al_cancelar(conn.interrupt) if token is not None else None
+        try:
+            return medir_sentencia(
+                statement_id, sql, params,
+                preparar=conn.cursor,
+                ejecutar=lambda cursor: cursor.execute(sql, params),
+                leer=lambda cursor: cursor.fetchall(),
+                explain=lambda: self._capturar_explain(conn, sql, params)
+            )
+        except sqlite3.OperationalError:
+            if token is not None:
+                token.verificar("db_query")
+            raise
+        finally:
+            if quitar is not None:
+                quitar()
+
+    def _capturar_explain(self, conn: sqlite3.Connection, sql: str, params: tuple) -> Optional[List[Dict[str, Any]]]:
+        """Plan de la sentencia según EXPLAIN QUERY PLAN"""
+        try:
+            filas = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            return [{"id": f[0], "parent": f[1], "detail": f[3]} for f in filas]
+        except Exception as e:
+            logger.warning(f"No se pudo capturar EXPLAIN: {e}")
+            return None
+
+class FuenteParquet(FuenteSQLite):
+    """
+    Snapshot Parquet (inventario.parquet y ventas.parquet en un directorio)
+
+    Los archivos se cargan una vez a una base SQLite en memoria compartida
+    entre hilos; requiere el paquete `pyarrow`
+
+    Args:
+        directorio: Directorio con los archivos del snapshot
+    """
+
+    nombre = "parquet"
+
+    def __init__(self, directorio: str):
+        _, pq = _pyarrow()
+
+        filas = {}
+        for tabla, columna in TABLAS.items():
+            ruta = os.path.join(directorio, f"{tabla.lower()}.parquet")
+            if not os.path.exists(ruta):
+                raise FileNotFoundError(f"No existe {ruta}")
+            datos = pq.read_table(ruta, columns=["TIENDA", "UNIDAD_NEGOCIO", "ANIO", "MES", columna]).to_pydict()
+            filas[tabla] = list(zip(*(datos[c] for c in ("TIENDA", "UNIDAD_NEGOCIO", "ANIO", "MES", columna))))
+
+        self.ruta = directorio
+        self._uri = f"file:calzando-parquet-{next(_memorias)}?mode=memory&cache=shared"
+        self._local = threading.local()
+        # La base en memoria vive mientras haya una conexión abierta
+        self._ancla = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        crear_tablas(self._ancla, filas)
+        logger.info(
+            f"Snapshot Parquet cargado de {directorio}: "
+            f"{len(filas['INVENTARIO']):,} filas de inventario, {len(filas['VENTAS']):,} de ventas"
+        )
+
+    def cerrar(self) -> None:
+        self._ancla.close()
+
+def exportar_sqlite(origen: FuenteDatos, ruta: str) -> Dict[str, int]:
+    """
+    Copiar INVENTARIO/VENTAS de una fuente a una réplica SQLite
+
+    Returns:
+        Filas copiadas por tabla
+    """
+    with origen.sesion() as sesion:
+        filas = {tabla: sesion.tabla_completa(tabla) for tabla in TABLAS}
+
+    temporal = f"{ruta}.tmp"
+    if os.path.exists(temporal):
+        os.remove(temporal)
+    conn = sqlite3.connect(temporal)
+    try:
+        crear_tablas(conn, filas)
+    finally:
+        conn.close()
+    # Reemplazo atómico: los lectores ven la réplica anterior o la nueva completa
+    os.replace(temporal, ruta)
+    return {tabla: len(f) for tabla, f in filas.items()}
+
+def sincronizar_sqlite(origen: FuenteDatos, ruta: str) -> Dict[str, int]:
+    """
+    Actualizar una réplica SQLite existente copiando solo los meses que cambiaron
+
+    Compara las huellas por (ANIO, MES) de la fuente y de la réplica, y
+    reemplaza en una sola transacción las filas de los meses distintos; los
+    lectores ven la réplica anterior o la nueva completa. Sin réplica hace
+    la exportación completa
+
+    Returns:
+        Filas copiadas por tabla y periodos actualizados ("PERIODOS")
+    """
+    if not os.path.exists(ruta):
+        filas = exportar_sqlite(origen, ruta)
+        return {**filas, "PERIODOS": -1}
+
+    conn = sqlite3.connect(ruta)
+    registrar_funciones(conn)
+    try:
+        replica = SesionDatos(lambda sid, sql, params: conn.execute(sql, params).fetchall(), dialecto="sqlite")
+        with origen.sesion() as sesion:
+            cambiados = sorted(huellas.cambiados(
+                huellas.por_periodo(replica.huellas()),
+                huellas.por_periodo(sesion.huellas())
+            ))
+            filas = {tabla: sesion.tabla_completa(tabla, cambiados) for tabla in TABLAS} if cambiados else {}
+
+        with conn:
+            for tabla in filas:
+                conn.executemany(f"DELETE FROM {tabla} WHERE ANIO = ? AND MES = ?", cambiados)
+                conn.executemany(f"INSERT INTO {tabla} VALUES (?, ?, ?, ?, ?)", filas[tabla])
+    finally:
+        conn.close()
+    return {**{tabla: len(filas.get(tabla, [])) for tabla in TABLAS}, "PERIODOS": len(cambiados)}
+
+def exportar_parquet(origen: FuenteDatos, directorio: str) -> Dict[str, int]:
+    """
+    Copiar INVENTARIO/VENTAS de una fuente a un snapshot Parquet (requiere `pyarrow`)
+
+    Returns:
+        Filas copiadas por tabla
+    """
+    pa, pq = _pyarrow()
+
+    os.makedirs(directorio, exist_ok=True)
+    with origen.sesion() as sesion:
+        filas = {tabla: sesion.tabla_completa(tabla) for tabla in TABLAS}
+
+    for tabla, columna in TABLAS.items():
+        columnas = list(zip(*filas[tabla])) or [(), (), (), (), ()]
+        datos = pa.table({
+            nombre: list(valores)
+            for nombre, valores in zip(("TIENDA", "UNIDAD_NEGOCIO", "ANIO", "MES", columna), columnas)
+        })
+        pq.write_table(datos, os.path.join(directorio, f"{tabla.lower()}.parquet"))
+    return {tabla: len(f) for tabla, f in filas.items()}
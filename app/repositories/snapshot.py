@@ -0,0 +1,50 @@
+"""
+Exportar una réplica local de INVENTARIO/VENTAS
+
+Lee de la fuente indicada (default: Db2) y escribe una réplica SQLite o
+un snapshot Parquet para usar con DATA_BACKEND=sqlite|parquet
+
+Uso:
+    python -m app.repositories.snapshot --formato sqlite --destino data/calzando.sqlite
+    python -m app.repositories.snapshot --formato sqlite --incremental  # solo meses que cambiaron
+"""
+
+import argparse
+import time
+from app.config import settings
+from app.repositories.fuentes import BACKENDS, crear_fuente
+from app.repositories.local import exportar_parquet, exportar_sqlite, sincronizar_sqlite
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar réplica local de INVENTARIO/VENTAS")
+    parser.add_argument("--origen", choices=BACKENDS, default="db2")
+    parser.add_argument("--ruta-origen", default=None, help="Archivo/directorio si el origen es local")
+    parser.add_argument("--formato", choices=("sqlite", "parquet"), default="sqlite")
+    parser.add_argument("--destino", default=settings.DATA_LOCAL_PATH)
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Réplica SQLite existente: copiar solo los meses cuya huella cambió"
+    )
+    args = parser.parse_args()
+    if args.incremental and args.formato != "sqlite":
+        parser.error("--incremental solo aplica a --formato sqlite")
+
+    origen = crear_fuente(args.origen, args.ruta_origen)
+    inicio = time.perf_counter()
+    if args.incremental:
+        exportar = sincronizar_sqlite
+    else:
+        exportar = exportar_sqlite if args.formato == "sqlite" else exportar_parquet
+    filas = exportar(origen, args.destino)
+    origen.cerrar()
+
+    if filas.get("PERIODOS", -1) >= 0:
+        print(f"🔄 {filas['PERIODOS']} periodo(s) con cambios")
+
+    print(
+        f"✅ {args.formato} en {args.destino}: {filas['INVENTARIO']:,} filas de inventario, "
+        f"{filas['VENTAS']:,} de ventas ({time.perf_counter() - inicio:.1f}s)"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+"""
+Servicio de alertas de cambio de status
+Cada vez que se carga o recarga el cubo calcula, en una pasada vectorizada,
+las transiciones de status de cada tienda y tienda × unidad contra el mes
+anterior, y publica las nuevas a los suscriptores (stream SSE y webhooks).
+Tras una recarga parcial solo se recalculan los periodos releídos y el mes
+siguiente a cada uno
+"""
+
+import asyncio
+import hashlib
+import json
+import urllib.request
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from app.config import settings, MES_MAP_INV
+from app.models.alertas import TransicionStatus
+from app.services import cubo_service
+from app.utils import telemetry
+from app.utils.metrics_engine import (
+    CuboInventario,
+    calcular_kpis,
+    dias_api,
+    transiciones_status,
+    STATUS_ETIQUETAS,
+    STATUS_CRITICO,
+    STATUS_OPTIMO
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+ALERTAS = telemetry.contador(
+    "calzando_alertas_total",
+    "Transiciones de status publicadas",
+    ("direccion",)
+)
+
+ALERTAS_DESCARTADAS = telemetry.contador(
+    "calzando_alertas_descartadas_total",
+    "Transiciones que no se entregaron por cola llena o error",
+    ("canal",)
+)
+
+# Llave de una transición: (tienda, unidad, año, mes, status anterior, status nuevo)
+Llave = Tuple[str, Optional[str], int, int, int, int]
+Periodo = Tuple[int, int]
+
+def _nombre_periodo(anio: int, mes: int) -> str:
+    return f"{MES_MAP_INV.get(mes, f'Mes {mes}')} {anio}"
+
+def _mes_anterior(anio: int, mes: int) -> Periodo:
+    return (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+
+def _mes_siguiente(anio: int, mes: int) -> Periodo:
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+def _id_transicion(llave: Llave, cubo: CuboInventario) -> int:
+    """
+    ID de una transición a partir de su llave y de las huellas de la fuente
+    de los dos meses que compara
+
+    No depende de la versión del cubo ni del proceso: cualquier worker, o uno
+    reiniciado, da el mismo ID a la misma transición con los mismos datos.
+    Cabe en 53 bits para que JavaScript lo lea sin perder precisión
+    """
+    anio, mes = llave[2], llave[3]
+    digest = hashlib.sha1(repr((
+        llave, cubo.huellas.get(_mes_anterior(anio, mes)), cubo.huellas.get((anio, mes))
+    )).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") >> 11
+
+def _orden(llave: Llave) -> tuple:
+    tienda, unidad, anio, mes = llave[:4]
+    return anio, mes, tienda, unidad is not None, unidad or ""
+
+def _direccion(anterior: int, nuevo: int) -> str:
+    if nuevo == STATUS_CRITICO or anterior == STATUS_OPTIMO:
+        return "empeora"
+    if nuevo == STATUS_OPTIMO:
+        return "mejora"
+    return "cambio"
+
+def calcular_transiciones(
+    cubo: CuboInventario,
+    periodos: Optional[Iterable[Periodo]] = None
+) -> List[Tuple[Llave, float, float]]:
+    """
+    Transiciones del cubo a nivel tienda y tienda × unidad
+
+    Args:
+        periodos: Si se indican, solo las transiciones hacia esos periodos;
+            se leen únicamente sus columnas y las del mes anterior
+
+    Returns:
+        Lista de (llave, cobertura anterior, cobertura nueva)
+    """
+    objetivos = set(cubo.periodos if periodos is None else periodos)
+    # Columnas del cubo que hacen falta: cada periodo objetivo con su mes anterior
+    columnas = sorted({
+        c for i, p in enumerate(cubo.periodos)
+        if p in objetivos and i > 0 and cubo.periodos[i - 1] == _mes_anterior(*p)
+        for c in (i - 1, i)
+    })
+    if not columnas:
+        return []
+    ejes = [cubo.periodos[c] for c in columnas]
+    # En las columnas elegidas, los periodos objetivo que siguen a su mes anterior
+    consecutivo = np.array([
+        j > 0 and columnas[j - 1] == c - 1 and cubo.periodos[c] in objetivos
+        and ejes[j - 1] == _mes_anterior(*ejes[j])
+        for j, c in enumerate(columnas)
+    ], dtype=bool)
+    resultado = []
+
+    inv_t, vta_t, presente_t = cubo.por_tienda_en(columnas)
+    niveles = [(calcular_kpis(inv_t, vta_t), presente_t, lambda i: (cubo.tiendas[i], None))]
+
+    filas = len(cubo.tiendas) * len(cubo.unidades)
+    inv = cubo.inv[:, :, columnas].reshape(filas, -1)
+    vta = cubo.vta[:, :, columnas].reshape(filas, -1)
+    presente_u = cubo.presente[:, :, columnas].reshape(filas, -1) | (vta > 0)
+    niveles.append((calcular_kpis(inv, vta), presente_u, lambda i: (
+        cubo.tiendas[i // len(cubo.unidades)], cubo.unidades[i % len(cubo.unidades)]
+    )))
+
+    for kpis, presente, etiqueta in niveles:
+        filas_idx, periodos_idx = transiciones_status(kpis.status, presente, consecutivo)
+        for i, p in zip(filas_idx.tolist(), periodos_idx.tolist()):
+            tienda, unidad = etiqueta(i)
+            anio, mes = ejes[p]
+            llave = (tienda, unidad, anio, mes, int(kpis.status[i, p - 1]), int(kpis.status[i, p]))
+            resultado.append((llave, float(kpis.cobertura[i, p - 1]), float(kpis.cobertura[i, p])))
+    return resultado
+
+class CanalAlertas:
+    """
+    Difusión de transiciones a suscriptores en proceso (SSE)
+
+    Cada suscriptor tiene su propia cola acotada; si un cliente lento la
+    llena, sus transiciones se descartan en lugar de frenar a los demás.
+    Conserva un historial corto para reconexión con Last-Event-ID; los IDs
+    no son crecientes, así que se reenvía lo que sigue a ese ID en el
+    historial (todo el historial si ya no está)
+    """
+
+    def __init__(self, historial: int, max_cola: int = 100):
+        self._historial: Deque[TransicionStatus] = deque(maxlen=historial)
+        self._suscriptores: Set[asyncio.Queue] = set()
+        self._max_cola = max_cola
+
+    @property
+    def ultimo_id(self) -> int:
+        return self._historial[-1].id if self._historial else 0
+
+    def suscribir(self) -> asyncio.Queue:
+        cola = asyncio.Queue(maxsize=self._max_cola)
+        self._suscriptores.add(cola)
+        return cola
+
+    def desuscribir(self, cola: asyncio.Queue) -> None:
+        self._suscriptores.discard(cola)
+
+    def publicar(self, transiciones: List[TransicionStatus]) -> None:
+        for transicion in transiciones:
+            self._historial.append(transicion)
+            for cola in self._suscriptores:
+                try:
+                    cola.put_nowait(transicion)
+                except asyncio.QueueFull:
+                    ALERTAS_DESCARTADAS.inc(canal="sse")
+
+    def recientes(self, desde_id: int = 0, limite: Optional[int] = None) -> List[TransicionStatus]:
+        resultado = list(self._historial)
+        if desde_id:
+            for i in range(len(resultado) - 1, -1, -1):
+                if resultado[i].id == desde_id:
+                    resultado = resultado[i + 1:]
+                    break
+        return resultado[-limite:] if limite else resultado
+
+class EnvioWebhooks:
+    """
+    Cola de envío a webhooks
+
+    Cada recarga genera un solo POST por URL con todas sus transiciones;
+    un worker los envía en orden con reintentos, fuera del event loop
+    """
+
+    def __init__(self, urls: List[str], timeout: float, reintentos: int = 3, max_pendientes: int = 100):
+        self.urls = urls
+        self.timeout = timeout
+        self.reintentos = reintentos
+        self._cola: Optional[asyncio.Queue] = None
+        self._max_pendientes = max_pendientes
+        self._tarea: Optional[asyncio.Task] = None
+
+    def iniciar(self) -> None:
+        if not self.urls or self._tarea is not None:
+            return
+        self._cola = asyncio.Queue(maxsize=self._max_pendientes)
+        self._tarea = asyncio.get_running_loop().create_task(self._enviar())
+        logger.info(f"Webhooks de alertas activos: {len(self.urls)} destino(s)")
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+
+    def encolar(self, transiciones: List[TransicionStatus], version: int) -> None:
+        if self._cola is None or not transiciones:
+            return
+        cuerpo = json.dumps({
+            "version": version,
+            "transiciones": [t.model_dump(mode="json") for t in transiciones]
+        }, ensure_ascii=False).encode("utf-8")
+        try:
+            self._cola.put_nowait(cuerpo)
+        except asyncio.QueueFull:
+            ALERTAS_DESCARTADAS.inc(len(transiciones) * len(self.urls), canal="webhook")
+            logger.warning(f"Cola de webhooks llena; se descartan {len(transiciones)} transiciones")
+
+    def _post(self, url: str, cuerpo: bytes) -> None:
+        request = urllib.request.Request(
+            url, data=cuerpo, method="POST",
+            headers={"Content-Type": "application/json; charset=utf-8"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as respuesta:
+            respuesta.read()
+
+    async def _enviar(self) -> None:
+        while True:
+            cuerpo = await self._cola.get()
+            for url in self.urls:
+                for intento in range(1, self.reintentos + 1):
+                    try:
+                        await asyncio.to_thread(self._post, url, cuerpo)
+                        break
+                    except Exception as e:
+                        logger.warning(f"Webhook {url} falló (intento {intento}/{self.reintentos}): {str(e)}")
+                        if intento == self.reintentos:
+                            ALERTAS_DESCARTADAS.inc(canal="webhook")
+                        else:
+                            await asyncio.sleep(2 ** intento)
+
+class DetectorTransiciones:
+    """
+    Compara las transiciones de cada cubo nuevo contra las ya conocidas
+
+    En la primera carga solo publica las del periodo más reciente (el
+    historial completo no es noticia); después publica toda transición que
+    no existía, ya sea de un periodo nuevo o de uno recargado con cambios.
+    Si el cubo es una recarga parcial del último aplicado, solo recalcula
+    los periodos releídos y el mes siguiente a cada uno
+
+    El ID sale de la llave de la transición y de las huellas de sus dos
+    meses (`_id_transicion`): todos los workers, y uno reiniciado, dan el
+    mismo ID a la misma transición, así desde_id y Last-Event-ID sirven
+    contra cualquiera
+    """
+
+    def __init__(self, canal: CanalAlertas, webhooks: EnvioWebhooks):
+        self.canal = canal
+        self.webhooks = webhooks
+        # Llaves conocidas por periodo de la transición
+        self._conocidas: Optional[Dict[Periodo, Set[Llave]]] = None
+        self.version = 0
+
+    def aplicar_cubo(self, cubo: CuboInventario) -> List[TransicionStatus]:
+        parcial = (
+            cubo.recargados is not None and self._conocidas is not None
+            and cubo.base_version == self.version
+        )
+        objetivos = None
+        if parcial:
+            objetivos = set(cubo.recargados) | {_mes_siguiente(*p) for p in cubo.recargados}
+        with telemetry.span("calcular_transiciones"):
+            calculadas = calcular_transiciones(cubo, objetivos)
+
+        por_periodo: Dict[Periodo, Set[Llave]] = {}
+        for llave, _, _ in calculadas:
+            por_periodo.setdefault((llave[2], llave[3]), set()).add(llave)
+        if self._conocidas is None:
+            ultimo = cubo.periodos[-1] if cubo.periodos else None
+            nuevas = [c for c in calculadas if (c[0][2], c[0][3]) == ultimo]
+        else:
+            nuevas = [c for c in calculadas if c[0] not in self._conocidas.get((c[0][2], c[0][3]), ())]
+
+        if parcial:
+            for periodo in objetivos:
+                self._conocidas.pop(periodo, None)
+            self._conocidas.update(por_periodo)
+        else:
+            self._conocidas = por_periodo
+        self.version = cubo.version
+
+        transiciones = []
+        for (tienda, unidad, anio, mes, anterior, nuevo), cob_anterior, cob_nueva in sorted(
+            nuevas, key=lambda c: _orden(c[0])
+        ):
+            direccion = _direccion(anterior, nuevo)
+            transiciones.append(TransicionStatus(
+                id=_id_transicion((tienda, unidad, anio, mes, anterior, nuevo), cubo),
+                tienda=tienda,
+                unidad=unidad,
+                periodo=_nombre_periodo(anio, mes),
+                periodo_anterior=_nombre_periodo(*_mes_anterior(anio, mes)),
+                status_anterior=STATUS_ETIQUETAS[anterior],
+                status_nuevo=STATUS_ETIQUETAS[nuevo],
+                cobertura_anterior=dias_api(cob_anterior),
+                cobertura=dias_api(cob_nueva),
+                direccion=direccion,
+                version=cubo.version
+            ))
+            ALERTAS.inc(direccion=direccion)
+
+        if transiciones:
+            logger.info(f"Cubo v{cubo.version}: {len(transiciones)} transiciones de status nuevas")
+        self.canal.publicar(transiciones)
+        self.webhooks.encolar(transiciones, cubo.version)
+        return transiciones
+
+canal = CanalAlertas(historial=settings.ALERTAS_HISTORIAL)
+webhooks = EnvioWebhooks(
+    urls=[u.strip() for u in settings.ALERTAS_WEBHOOK_URLS.split(",") if u.strip()],
+    timeout=settings.ALERTAS_WEBHOOK_TIMEOUT_SECONDS
+)
+detector = DetectorTransiciones(canal, webhooks)
+cubo_service.suscribir(detector.aplicar_cubo)
+
+_tarea_refresco: Optional[asyncio.Task] = None
+
+async def _refrescar_periodicamente() -> None:
+    while True:
+        try:
+            await cubo_service.obtener_cubo()
+        except Exception as e:
+            logger.error(f"Error recargando cubo para alertas: {str(e)}", exc_info=True)
+        # Con el cubo compartido solo se revisa si el cargador publicó otra versión
+        if cubo_service.modo_lector():
+            await asyncio.sleep(settings.CUBO_COMPARTIDO_REVISION_SECONDS)
+        else:
+            await asyncio.sleep(settings.CUBO_TTL_SECONDS)
+
+def iniciar() -> None:
+    """
+    Arrancar el envío de webhooks y, si está habilitada, la recarga periódica
+
+    Con el cubo compartido los webhooks los envía solo el proceso cargador;
+    cada worker sigue publicando las transiciones en su stream SSE
+    """
+    global _tarea_refresco
+    if cubo_service.modo_lector():
+        logger.info("Webhooks de alertas: los envía el proceso cargador del cubo")
+    else:
+        webhooks.iniciar()
+    if settings.ALERTAS_AUTO_REFRESH and _tarea_refresco is None:
+        _tarea_refresco = asyncio.get_running_loop().create_task(_refrescar_periodicamente())
+
+async def detener() -> None:
+    global _tarea_refresco
+    if _tarea_refresco is not None:
+        _tarea_refresco.cancel()
+        try:
+            await _tarea_refresco
+        except asyncio.CancelledError:
+            pass
+        _tarea_refresco = None
+    await webhooks.detener()
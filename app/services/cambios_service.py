@@ -0,0 +1,160 @@
+"""
+Detección de cambios en INVENTARIO/VENTAS
+Cada CAMBIOS_INTERVALO_SECONDS compara las huellas por (ANIO, MES) de la
+fuente contra las del cubo: los meses recientes en cada revisión y todos
+cada CAMBIOS_COMPLETO_CADA revisiones (correcciones a meses viejos). Solo
+los meses que cambiaron se recargan en el cubo; con cada cubo nuevo se
+avisa qué periodos cambiaron para invalidar caches y ETags
+"""
+
+import asyncio
+import hashlib
+from typing import Callable, Dict, List, Optional, Set
+from app.config import settings
+from app.repositories import huellas
+from app.repositories.fuentes import get_fuente
+from app.services import cubo_service
+from app.utils import admission, telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+REVISIONES = telemetry.contador(
+    "calzando_cambios_revisiones_total",
+    "Revisiones de huellas de INVENTARIO/VENTAS",
+    ("alcance", "resultado")
+)
+
+PERIODOS_CAMBIADOS = telemetry.contador(
+    "calzando_cambios_periodos_total",
+    "Periodos que cambiaron entre una versión del cubo y la siguiente"
+)
+
+_huellas_vistas: Optional[Dict[huellas.Periodo, huellas.Huella]] = None
+_suscriptores: List[Callable[[Set[huellas.Periodo]], None]] = []
+_tarea: Optional[asyncio.Task] = None
+
+def suscribir(callback: Callable[[Set[huellas.Periodo]], None]) -> None:
+    """
+    Registrar una función que se llama con los periodos que cambiaron
+
+    Se invoca en el event loop cada vez que un cubo nuevo trae huellas
+    distintas a las del anterior; debe ser rápida
+    """
+    _suscriptores.append(callback)
+
+def _aplicar_cubo(cubo) -> None:
+    global _huellas_vistas
+    anteriores = _huellas_vistas
+    _huellas_vistas = dict(cubo.huellas)
+    if anteriores is None:
+        return
+    cambiados = huellas.cambiados(anteriores, cubo.huellas)
+    if not cambiados:
+        return
+    PERIODOS_CAMBIADOS.inc(len(cambiados))
+    for callback in _suscriptores:
+        try:
+            callback(cambiados)
+        except Exception as e:
+            logger.error(f"Error notificando cambios a {callback.__qualname__}: {str(e)}", exc_info=True)
+
+cubo_service.suscribir(_aplicar_cubo)
+
+def version(anio: Optional[int] = None, mes: Optional[int] = None) -> Optional[str]:
+    """
+    Versión de los datos de un mes, de un año o de todo (sin argumentos)
+
+    Sale de las huellas del último cubo cargado: cambia solo cuando cambian
+    los periodos de los que depende la vista. None si aún no hay cubo
+    """
+    vistas = _huellas_vistas
+    if not vistas:
+        return None
+    if mes is not None:
+        periodos = [(anio, mes)]
+    elif anio is not None:
+        periodos = [p for p in vistas if p[0] == anio]
+    else:
+        periodos = list(vistas)
+    digest = hashlib.sha1(settings.APP_VERSION.encode("utf-8"))
+    for periodo in periodos:
+        digest.update(repr((periodo, vistas.get(periodo))).encode("utf-8"))
+    return digest.hexdigest()[:20]
+
+async def etag(anio: Optional[int] = None, mes: Optional[int] = None) -> Optional[str]:
+    """ETag de `version`; None si no se pudo cargar el cubo"""
+    try:
+        await cubo_service.obtener_cubo()
+    except Exception:
+        # Sin ETag el endpoint responde normal (o reporta él mismo el error)
+        return None
+    valor = version(anio, mes)
+    return f'"{valor}"' if valor is not None else None
+
+def _consultar_huellas(desde: Optional[huellas.Periodo]) -> Dict[huellas.Periodo, huellas.Huella]:
+    with get_fuente().sesion() as sesion:
+        return huellas.por_periodo(sesion.huellas(desde))
+
+async def revisar(completa: bool = False) -> Set[huellas.Periodo]:
+    """
+    Comparar las huellas de la fuente con las del cubo y recargar lo que cambió
+
+    Returns:
+        Periodos recargados (vacío si no hubo cambios)
+    """
+    cubo = await cubo_service.obtener_cubo()
+    desde = None
+    if not completa and cubo.huellas:
+        desde = huellas.restar_meses(max(cubo.huellas), settings.CAMBIOS_MESES_RECIENTES - 1)
+
+    with telemetry.span("revisar_huellas"):
+        actuales = await admission.en_hilo(_consultar_huellas, desde)
+    cambiados = huellas.cambiados(cubo.huellas, actuales, desde)
+
+    alcance = "recientes" if desde is not None else "completa"
+    REVISIONES.inc(alcance=alcance, resultado="cambios" if cambiados else "sin_cambios")
+    if not cambiados:
+        return cambiados
+
+    logger.info(f"Cambios en {len(cambiados)} periodo(s) de la fuente ({alcance})")
+    await cubo_service.recargar_periodos(cambiados, actuales)
+    return cambiados
+
+async def _revisar_periodicamente() -> None:
+    try:
+        # Línea base: el cubo se carga con las huellas de la fuente
+        await cubo_service.obtener_cubo()
+    except Exception as e:
+        logger.error(f"Error cargando el cubo para detectar cambios: {str(e)}", exc_info=True)
+
+    revision = 0
+    while True:
+        await asyncio.sleep(settings.CAMBIOS_INTERVALO_SECONDS)
+        revision += 1
+        completa = settings.CAMBIOS_COMPLETO_CADA > 0 and revision % settings.CAMBIOS_COMPLETO_CADA == 0
+        try:
+            await revisar(completa)
+        except Exception as e:
+            REVISIONES.inc(alcance="completa" if completa else "recientes", resultado="error")
+            logger.error(f"Error revisando cambios en la fuente: {str(e)}", exc_info=True)
+
+def activo() -> bool:
+    """True si este proceso revisa la fuente (con cubo compartido, solo el cargador)"""
+    return settings.CAMBIOS_INTERVALO_SECONDS > 0 and not cubo_service.modo_lector()
+
+def iniciar() -> None:
+    """Arrancar la revisión periódica de huellas"""
+    global _tarea
+    if activo() and _tarea is None:
+        _tarea = asyncio.get_running_loop().create_task(_revisar_periodicamente())
+
+async def detener() -> None:
+    global _tarea
+    if _tarea is not None:
+        _tarea.cancel()
+        try:
+            await _tarea
+        except asyncio.CancelledError:
+            pass
+        _tarea = None
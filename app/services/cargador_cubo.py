@@ -0,0 +1,62 @@
+"""
+Proceso cargador del cubo compartido
+
+Con varios workers, solo este proceso consulta INVENTARIO/VENTAS para el
+cubo: lo mantiene al día (los meses que cambiaron, con la detección de
+cambios, y completo cada CUBO_TTL_SECONDS), lo publica en
+CUBO_COMPARTIDO_PATH y envía los webhooks de alertas. Los workers mapean
+el snapshot publicado.
+gunicorn.conf.py lo arranca junto con los workers
+
+Uso:
+    CUBO_COMPARTIDO_PATH=/tmp/calzando/cubo.bin python -m app.services.cargador_cubo
+"""
+
+import asyncio
+import logging
+import signal
+from app.config import settings
+from app.repositories import fuentes
+from app.services import alertas_service, cambios_service, cubo_service
+
+logger = logging.getLogger(__name__)
+
+async def ejecutar() -> None:
+    """Mantener publicado el cubo hasta recibir SIGTERM/SIGINT"""
+    if not settings.CUBO_COMPARTIDO_PATH:
+        raise RuntimeError("Define CUBO_COMPARTIDO_PATH para publicar el cubo compartido")
+
+    cubo_service.ser_cargador()
+    alertas_service.webhooks.iniciar()
+    cambios_service.iniciar()
+
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for senal in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(senal, detener.set)
+
+    logger.info(f"Cargador del cubo activo: {settings.CUBO_COMPARTIDO_PATH} cada {settings.CUBO_TTL_SECONDS}s")
+    try:
+        while not detener.is_set():
+            try:
+                # Recarga completa cada CUBO_TTL_SECONDS, aunque la detección de cambios no vea nada
+                await cubo_service.obtener_cubo()
+            except Exception as e:
+                # Los workers siguen sirviendo la última versión publicada
+                logger.error(f"Error recargando el cubo compartido: {str(e)}", exc_info=True)
+            try:
+                await asyncio.wait_for(detener.wait(), timeout=settings.CUBO_TTL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        await cambios_service.detener()
+        await alertas_service.webhooks.detener()
+        fuentes.cerrar()
+        logger.info("Cargador del cubo detenido")
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    asyncio.run(ejecutar())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Servicio de catálogo de dimensiones
+Tiendas, unidades de negocio y periodos (año, mes) con datos, indexados para
+validar entidades en O(1) y resolver nombres de tienda aproximados sin
+consultar la base. Se carga una vez y se reemplaza con cada recarga del cubo
+"""
+
+import asyncio
+import difflib
+import re
+import time
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings, MES_MAP_INV
+from app.models.dashboard import CatalogoResponse
+from app.repositories.fuentes import get_fuente
+from app.services import cubo_service
+from app.utils import admission, telemetry
+from app.utils.intent_parser import validar_periodo
+from app.utils.metrics_engine import CuboInventario
+import logging
+
+logger = logging.getLogger(__name__)
+
+_catalogo: Optional["Catalogo"] = None
+_cargado_en = 0.0
+_lock_carga: Optional[asyncio.Lock] = None
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin acentos, con espacio entre letras y números ("Tienda5" -> "tienda 5")"""
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])", " ", texto)
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", texto).split())
+
+def _orden_natural(texto: str) -> list:
+    """Llave de orden con los números como números ("Tienda 2" antes de "Tienda 10")"""
+    return [int(p) if p.isdigit() else p for p in re.split(r"(\d+)", texto)]
+
+def nombre_periodo(anio: int, mes: int) -> str:
+    return f"{MES_MAP_INV.get(mes, f'Mes {mes}')} {anio}"
+
+class Catalogo:
+    """
+    Dimensiones de los datos cargados
+
+    Args:
+        tiendas: Nombres de tienda (ordenados)
+        unidades: Unidades de negocio (ordenadas)
+        periodos: (año, mes) con al menos una fila (ordenados)
+        presencia: tienda × periodo, True si la tienda tiene fila en INVENTARIO
+        version: Versión del cubo de origen (0 si se cargó de la base)
+    """
+
+    def __init__(
+        self,
+        tiendas: List[str],
+        unidades: List[str],
+        periodos: List[Tuple[int, int]],
+        presencia: np.ndarray,
+        version: int = 0
+    ):
+        self.tiendas = tiendas
+        self.unidades = unidades
+        self.periodos = periodos
+        self.presencia = presencia
+        self.version = version
+        self._indice_tienda = {t: i for i, t in enumerate(tiendas)}
+        self._indice_periodo = {p: i for i, p in enumerate(periodos)}
+        self._unidades = set(unidades)
+        self._normalizadas: Dict[str, str] = {}
+        self._por_numero: Dict[str, List[str]] = {}
+        for tienda in tiendas:
+            clave = normalizar(tienda)
+            self._normalizadas.setdefault(clave, tienda)
+            numeros = " ".join(str(int(n)) for n in re.findall(r"\d+", clave))
+            self._por_numero.setdefault(numeros, []).append(clave)
+
+    @classmethod
+    def desde_filas(cls, filas: Iterable[Sequence], unidades: Iterable[Sequence], version: int = 0) -> "Catalogo":
+        """Construir desde filas (tienda, año, mes, en_inventario) y (unidad,)"""
+        filas = list(filas)
+        tiendas = sorted({f[0] for f in filas})
+        periodos = sorted({(int(f[1]), int(f[2])) for f in filas})
+        it = {t: i for i, t in enumerate(tiendas)}
+        ip = {p: i for i, p in enumerate(periodos)}
+
+        presencia = np.zeros((len(tiendas), len(periodos)), dtype=bool)
+        for tienda, anio, mes, en_inventario in filas:
+            if en_inventario:
+                presencia[it[tienda], ip[(int(anio), int(mes))]] = True
+
+        return cls(tiendas, sorted({u[0] for u in unidades}), periodos, presencia, version)
+
+    @classmethod
+    def desde_cubo(cls, cubo: CuboInventario) -> "Catalogo":
+        """Derivar del cubo recién cargado, sin consultas adicionales"""
+        _, _, presente = cubo.por_tienda()
+        return cls(list(cubo.tiendas), list(cubo.unidades), list(cubo.periodos), presente.copy(), cubo.version)
+
+    @property
+    def primero(self) -> Optional[Tuple[int, int]]:
+        return self.periodos[0] if self.periodos else None
+
+    @property
+    def ultimo(self) -> Optional[Tuple[int, int]]:
+        return self.periodos[-1] if self.periodos else None
+
+    def describir_rango(self) -> str:
+        """Rango de periodos con datos (ej. "Enero 2023 a Mayo 2025")"""
+        if not self.periodos:
+            return "sin datos cargados"
+        return f"{nombre_periodo(*self.primero)} a {nombre_periodo(*self.ultimo)}"
+
+    def tiene_tienda(self, tienda: str) -> bool:
+        return tienda in self._indice_tienda
+
+    def tiene_unidad(self, unidad: str) -> bool:
+        return unidad in self._unidades
+
+    def tiene_periodo(self, anio: int, mes: int) -> bool:
+        return (anio, mes) in self._indice_periodo
+
+    def anios(self) -> List[int]:
+        return sorted({a for a, _ in self.periodos})
+
+    def existe_tienda(self, tienda: str, anio: int, mes: int) -> bool:
+        """True si la tienda tiene inventario en el periodo"""
+        i = self._indice_tienda.get(tienda)
+        p = self._indice_periodo.get((anio, mes))
+        return i is not None and p is not None and bool(self.presencia[i, p])
+
+    def tienda_canonica(self, texto: str) -> Optional[str]:
+        """Nombre del catálogo para el texto sin importar mayúsculas, acentos ni espacios"""
+        if texto in self._indice_tienda:
+            return texto
+        return self._normalizadas.get(normalizar(texto))
+
+    def buscar_tienda(self, texto: str) -> Optional[str]:
+        """
+        Resolver un nombre de tienda escrito a mano ("tienda5", "TIENDA 05", "tineda 5")
+
+        Los números deben coincidir: "Tienda 18" nunca se resuelve a "Tienda 1"
+        aunque el texto se parezca
+        """
+        if texto in self._indice_tienda:
+            return texto
+        clave = normalizar(texto)
+        if clave in self._normalizadas:
+            return self._normalizadas[clave]
+
+        # Solo se compara contra nombres con los mismos números (o sin números)
+        numeros = [str(int(n)) for n in re.findall(r"\d+", clave)]
+        candidatas = self._por_numero.get(" ".join(numeros), [])
+        if numeros and len(candidatas) == 1:
+            return self._normalizadas[candidatas[0]]
+        clave = re.sub(r"\d+", lambda m: str(int(m.group())), clave)
+
+        parecidas = difflib.get_close_matches(clave, candidatas, n=1, cutoff=0.8)
+        return self._normalizadas[parecidas[0]] if parecidas else None
+
+    def validar_periodo(self, anio: int, mes: int) -> Tuple[bool, str]:
+        """Validar contra los periodos cargados (rango y huecos)"""
+        if not self.periodos:
+            return False, "No hay datos cargados"
+        valido, mensaje = validar_periodo(anio, mes, self.primero, self.ultimo)
+        if valido and not self.tiene_periodo(anio, mes):
+            return False, f"No hay datos para {nombre_periodo(anio, mes)}. Los datos disponibles van de {self.describir_rango()}."
+        return valido, mensaje
+
+    def completar_periodo(self, anio: Optional[int], mes: Optional[int]) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Completar un periodo parcial con el más reciente que tenga datos
+
+        Sin año ni mes: el último periodo. Solo año: su último mes con datos.
+        Solo mes: el año más reciente que tenga ese mes
+        """
+        if not self.periodos or (anio is not None and mes is not None):
+            return anio, mes
+        if anio is None and mes is None:
+            return self.ultimo
+        for a, m in reversed(self.periodos):
+            if (anio is None or a == anio) and (mes is None or m == mes):
+                return a, m
+        return anio if anio is not None else self.ultimo[0], mes if mes is not None else self.ultimo[1]
+
+def _aplicar_cubo(cubo: CuboInventario) -> None:
+    global _catalogo, _cargado_en
+    _catalogo = Catalogo.desde_cubo(cubo)
+    _cargado_en = time.monotonic()
+
+def cargar_catalogo() -> Catalogo:
+    """Leer las dimensiones distintas de la fuente de datos"""
+    with get_fuente().sesion() as sesion:
+        filas, unidades = sesion.catalogo()
+    with telemetry.span("construir_catalogo"):
+        catalogo = Catalogo.desde_filas(filas, unidades)
+    logger.info(
+        f"Catálogo cargado: {len(catalogo.tiendas)} tiendas, {len(catalogo.unidades)} unidades, "
+        f"periodos {catalogo.describir_rango()}"
+    )
+    return catalogo
+
+def catalogo_actual() -> Optional[Catalogo]:
+    """Último catálogo cargado, sin esperar ni consultar (None si aún no hay)"""
+    return _catalogo
+
+def _get_lock() -> asyncio.Lock:
+    global _lock_carga
+    if _lock_carga is None:
+        _lock_carga = asyncio.Lock()
+    return _lock_carga
+
+def _vigente() -> bool:
+    return _catalogo is not None and time.monotonic() - _cargado_en < settings.CUBO_TTL_SECONDS
+
+async def obtener_catalogo() -> Catalogo:
+    """
+    Obtener el catálogo, cargándolo de la base si no hay uno vigente
+
+    Cada recarga del cubo lo reemplaza sin consultas; fuera de eso se
+    refresca cada CUBO_TTL_SECONDS. Con el cubo compartido sale siempre del
+    snapshot, así los workers no consultan la base
+    """
+    global _catalogo, _cargado_en
+    if _vigente():
+        return _catalogo
+    if cubo_service.modo_lector():
+        await cubo_service.obtener_cubo()
+        return _catalogo
+
+    async with _get_lock():
+        if _vigente():
+            return _catalogo
+        _catalogo = await admission.en_hilo(cargar_catalogo)
+        _cargado_en = time.monotonic()
+        return _catalogo
+
+async def get_catalogo() -> CatalogoResponse:
+    """Dimensiones disponibles para filtros y validación en el cliente"""
+    catalogo = await obtener_catalogo()
+    periodos = [f"{a}-{m:02d}" for a, m in catalogo.periodos]
+    return CatalogoResponse(
+        tiendas=sorted(catalogo.tiendas, key=_orden_natural),
+        unidades=catalogo.unidades,
+        periodos=periodos,
+        primer_periodo=periodos[0] if periodos else None,
+        ultimo_periodo=periodos[-1] if periodos else None,
+        rango=catalogo.describir_rango(),
+        version=catalogo.version
+    )
+
+async def resolver_periodo(year: Optional[int], month: Optional[int]) -> Tuple[int, int]:
+    """
+    Completar y validar el periodo de un request
+
+    Raises:
+        ValueError: El periodo no tiene datos (el mensaje incluye el rango disponible)
+    """
+    catalogo = await obtener_catalogo()
+    year, month = catalogo.completar_periodo(year, month)
+    valido, mensaje = catalogo.validar_periodo(year, month)
+    if not valido:
+        raise ValueError(mensaje)
+    return year, month
+
+async def resolver_anio(year: Optional[int]) -> int:
+    """Año del request, o el más reciente con datos"""
+    catalogo = await obtener_catalogo()
+    anios = catalogo.anios()
+    if year is None and anios:
+        return anios[-1]
+    if year not in anios:
+        raise ValueError(f"No hay datos para {year}. Los datos disponibles van de {catalogo.describir_rango()}.")
+    return year
+
+async def resolver_tienda(tienda: str, year: Optional[int] = None, month: Optional[int] = None) -> str:
+    """
+    Validar que la tienda exista (y tenga datos en el periodo, si se da), sin consultar la base
+
+    Returns:
+        El nombre como está en el catálogo (variantes de mayúsculas o
+        espacios se resuelven al mismo)
+
+    Raises:
+        ValueError: Tienda desconocida o sin datos en el periodo
+    """
+    catalogo = await obtener_catalogo()
+    canonica = catalogo.tienda_canonica(tienda)
+    if month is None:
+        if canonica is not None:
+            return canonica
+        mensaje = f"No existe la tienda {tienda}"
+    else:
+        if canonica is not None and catalogo.existe_tienda(canonica, year, month):
+            return canonica
+        mensaje = f"No hay datos para {tienda} en {month}/{year}"
+    sugerida = catalogo.buscar_tienda(tienda)
+    if sugerida and sugerida not in (tienda, canonica):
+        mensaje += f". ¿Quisiste decir '{sugerida}'?"
+    raise ValueError(mensaje)
+
+cubo_service.suscribir(_aplicar_cubo)
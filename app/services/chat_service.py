@@ -3,16 +3,135 @@ Servicio de Chat
 Implementa el router de intenciones y orquesta las respuestas del chatbot
 """
 
-from typing import Dict, Any
+import hashlib
+import time
+from typing import Callable, Dict, Any, Optional, Tuple
+from app.services import catalogo_service
 from app.services.db_service import query_tienda_datos, query_todas_tiendas
 from app.services.watsonx_service import generate_chat_response
+from app.utils.cache import CacheNiveles
+from app.utils.cache_compartido import nivel as cache_compartido
 from app.utils.intent_parser import extraer_entidades, requiere_datos_bd
-from app.config import DEFAULT_YEAR, DEFAULT_MONTH, MES_MAP_INV
+from app.utils import admission, rate_limit, telemetry
+from app.config import settings, DEFAULT_YEAR, DEFAULT_MONTH, MES_MAP_INV
 import logging
 
 logger = logging.getLogger(__name__)
 
-async def process_chat_message(message: str, session_id: str = None) -> Dict[str, Any]:
+SYSTEM_ROLE_DEFAULT = "Eres el Asistente Gerencial de Calzando a México."
+
+# Respuestas del LLM por (rol, contexto, pregunta): si cambian los datos cambia el contexto
+_cache_respuestas: CacheNiveles[str] = CacheNiveles(
+    "chat_respuestas",
+    max_elementos=settings.CHAT_CACHE_MAX_ITEMS,
+    ttl=settings.CHAT_CACHE_TTL_SECONDS,
+    compartido=cache_compartido
+)
+
+def _llave_respuesta(message: str, contexto: str, system_role: str) -> str:
+    texto = "\x1f".join((system_role, contexto, " ".join(message.lower().split())))
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+async def _responder(
+    message: str,
+    contexto: str,
+    cliente: Optional[rate_limit.Cliente],
+    plantilla: Optional[Callable[[], str]] = None,
+    system_role: str = SYSTEM_ROLE_DEFAULT
+) -> Tuple[str, str]:
+    """
+    Generar la respuesta respetando el límite de LLM del cliente
+
+    Primero se busca la respuesta en cache (memoria y nivel compartido): la
+    misma pregunta sobre el mismo contexto se responde sin llamar al LLM ni
+    consumir el límite. Si no está, dentro del límite se llama al LLM y se
+    guarda la respuesta; excedido, se responde con la plantilla sin LLM y,
+    si no hay, se rechaza con 429
+    
+    Returns:
+        Tupla (texto, fuente) con fuente "llm", "cache" o "plantilla"
+    """
+    llave = _llave_respuesta(message, contexto, system_role)
+    texto = await _cache_respuestas.obtener(llave)
+    if texto is not None:
+        logger.info("Respuesta desde cache")
+        return texto, "cache"
+    
+    permitido, retry_after = await rate_limit.permitir(cliente or rate_limit.ANONIMO, rate_limit.CUBETA_LLM)
+    if permitido:
+        texto = await generate_chat_response(
+            user_message=message,
+            context=contexto,
+            system_role=system_role
+        )
+        _cache_respuestas.guardar(llave, texto)
+        return texto, "llm"
+    
+    if plantilla is not None:
+        logger.info(f"Límite de LLM excedido para {cliente}: respuesta con plantilla")
+        return plantilla(), "plantilla"
+    
+    raise rate_limit.LimiteExcedido(rate_limit.CUBETA_LLM, retry_after)
+
+def _plantilla_tienda(tienda: str, mes_nombre: str, anio: int, datos: Dict[str, Any]) -> str:
+    """Respuesta sin LLM para una tienda"""
+    cobertura = datos['total_cobertura_dias']
+    lineas = [
+        f"{tienda} en {mes_nombre} {anio}: {datos['total_inventario']:,} piezas en inventario, "
+        f"{datos['total_ventas']:,} vendidas y {cobertura:.1f} días de cobertura "
+        f"({datos['status']}).",
+        "",
+        "Por unidad de negocio:"
+    ]
+    for u in datos['detalle_unidades']:
+        cob = f"{u['cobertura_dias']:.1f} días" if u['ventas'] else "sin ventas"
+        lineas.append(f"• {u['unidad']}: {u['inventario']:,} inv, {u['ventas']:,} vta, {cob}")
+    lineas.append("")
+    lineas.append("Benchmark retail: 28-90 días es óptimo.")
+    return "\n".join(lineas)
+
+def _plantilla_resumen(
+    mes_nombre: str,
+    anio: int,
+    total_tiendas: int,
+    total_inv: int,
+    total_vta: int,
+    criticas: list,
+    alertas: list
+) -> str:
+    """Respuesta sin LLM para el resumen de la cadena"""
+    lineas = [
+        f"Resumen de {mes_nombre} {anio}: {total_tiendas} tiendas, {total_inv:,} piezas en inventario "
+        f"y {total_vta:,} vendidas.",
+        f"🚨 Tiendas críticas ({len(criticas)}): {', '.join(criticas) if criticas else 'ninguna'}",
+        f"⚠️  Tiendas con alerta ({len(alertas)}): {', '.join(alertas) if alertas else 'ninguna'}"
+    ]
+    return "\n".join(lineas)
+
+async def _obtener_catalogo() -> Optional[catalogo_service.Catalogo]:
+    """Catálogo de dimensiones, o None si no se pudo cargar (se valida en la BD como antes)"""
+    try:
+        return await catalogo_service.obtener_catalogo()
+    except Exception as e:
+        logger.warning(f"Catálogo no disponible: {str(e)}")
+        return None
+
+def _rango_disponible() -> str:
+    catalogo = catalogo_service.catalogo_actual()
+    if catalogo is None or not catalogo.periodos:
+        return ""
+    return f" Los datos disponibles van de {catalogo.describir_rango()}."
+
+def _sin_datos(intent: str, texto: str) -> Dict[str, Any]:
+    """Respuesta sin datos ni LLM (entidad inválida o periodo sin datos)"""
+    return {
+        "response": texto,
+        "intent": intent,
+        "source": "plantilla",
+        "data_used": None
+    }
+
+async def process_chat_message(message: str, session_id: str = None, cliente: Optional[rate_limit.Cliente] = None) -> Dict[str, Any]:
     """
     Procesar mensaje del chat y generar respuesta
     
@@ -24,19 +143,26 @@ async def process_chat_message(message: str, session_id: str = None) -> Dict[str
     Args:
         message: Mensaje del usuario
         session_id: ID de sesión (para futuras funcionalidades)
+        cliente: Identidad del cliente para el rate limit de LLM
         
     Returns:
-        Dict con response, intent y data_used
+        Dict con response, intent, data_used y source
     """
     
     logger.info(f"Procesando mensaje: {message[:100]}...")
     
     # Extraer entidades del mensaje
-    tienda, anio, mes = extraer_entidades(message)
-    necesita_bd = requiere_datos_bd(message)
+    with telemetry.span("extraer_entidades"):
+        tienda, anio, mes = extraer_entidades(message)
+        necesita_bd = requiere_datos_bd(message)
     
-    # Aplicar defaults si necesita BD
-    if necesita_bd:
+    # Completar y validar contra el catálogo: entidades inválidas no llegan a la BD
+    catalogo = await _obtener_catalogo()
+    consulta_datos = necesita_bd or tienda or anio or mes
+    
+    if consulta_datos:
+        if catalogo is not None:
+            anio, mes = catalogo.completar_periodo(anio, mes)
         if not anio:
             anio = DEFAULT_YEAR
         if not mes:
@@ -46,37 +172,58 @@ async def process_chat_message(message: str, session_id: str = None) -> Dict[str
     
     logger.info(f"Entidades: tienda={tienda}, año={anio}, mes={mes}, necesita_bd={necesita_bd}")
     
+    if consulta_datos and catalogo is not None:
+        intent = "tienda_especifica" if tienda else "resumen_tiendas"
+        telemetry.marcar_intent(intent)
+        valido, error = catalogo.validar_periodo(anio, mes)
+        if not valido:
+            return _sin_datos(intent, f"{error} Por favor verifica el periodo.")
+        
+        if tienda:
+            encontrada = catalogo.buscar_tienda(tienda)
+            if encontrada is None:
+                return _sin_datos(
+                    intent,
+                    f"No encontré la tienda '{tienda}'. Hay {len(catalogo.tiendas)} tiendas con datos; "
+                    f"por favor verifica el nombre."
+                )
+            tienda = encontrada
+    
     # === ROUTER DE INTENCIONES ===
     
     # INTENT 1: Tienda Específica
     if tienda:
-        return await _handle_tienda_especifica(message, tienda, anio, mes, mes_nombre)
+        return await _handle_tienda_especifica(message, tienda, anio, mes, mes_nombre, cliente)
     
     # INTENT 2: Consulta que requiere BD
-    elif necesita_bd or anio or mes:
-        return await _handle_resumen_tiendas(message, anio, mes, mes_nombre)
+    elif consulta_datos:
+        return await _handle_resumen_tiendas(message, anio, mes, mes_nombre, cliente)
     
     # INTENT 3: Pregunta General
     else:
-        return await _handle_pregunta_general(message)
+        return await _handle_pregunta_general(message, cliente)
 
 async def _handle_tienda_especifica(
     message: str, 
     tienda: str, 
     anio: int, 
     mes: int, 
-    mes_nombre: str
+    mes_nombre: str,
+    cliente: Optional[rate_limit.Cliente] = None
 ) -> Dict[str, Any]:
     """
     Manejar consulta de tienda específica (INTENT 1)
     """
     logger.info(f"INTENT 1: Consulta de {tienda}")
+    telemetry.marcar_intent("tienda_especifica")
     
     try:
         # Consultar datos de la tienda
-        datos = await query_tienda_datos(tienda, anio, mes)
+        async with admission.CHAT_DATOS.admitir():
+            datos = await query_tienda_datos(tienda, anio, mes)
         
         # Construir contexto
+        inicio_prompt = time.perf_counter()
         contexto = f"""
 Datos de la base de datos:
 - Tienda: {tienda}
@@ -92,16 +239,18 @@ Detalle por Unidad de Negocio:
             contexto += f"  • {u['unidad']}: {u['inventario']:,} inv, {u['ventas']:,} vta, {cob} días\n"
         
         contexto += "\nBenchmark retail: 28-90 días es óptimo."
+        telemetry.registrar_etapa("construir_prompt", time.perf_counter() - inicio_prompt)
         
         # Generar respuesta con IA
-        response_text = await generate_chat_response(
-            user_message=message,
-            context=contexto
+        response_text, fuente = await _responder(
+            message, contexto, cliente,
+            plantilla=lambda: _plantilla_tienda(tienda, mes_nombre, anio, datos)
         )
         
         return {
             "response": response_text,
             "intent": "tienda_especifica",
+            "source": fuente,
             "data_used": {
                 "tienda": tienda,
                 "year": anio,
@@ -116,30 +265,32 @@ Detalle por Unidad de Negocio:
         # No hay datos para esa tienda/periodo
         logger.warning(f"Datos no encontrados: {e}")
         
-        response_text = f"No encontré datos para {tienda} en {mes_nombre} {anio}. Los datos disponibles van de Enero 2023 a Mayo 2025. Por favor verifica el nombre de la tienda y el periodo."
-        
-        return {
-            "response": response_text,
-            "intent": "tienda_especifica",
-            "data_used": None
-        }
+        return _sin_datos(
+            "tienda_especifica",
+            f"No encontré datos para {tienda} en {mes_nombre} {anio}.{_rango_disponible()} "
+            f"Por favor verifica el nombre de la tienda y el periodo."
+        )
 
 async def _handle_resumen_tiendas(
     message: str,
     anio: int,
     mes: int,
-    mes_nombre: str
+    mes_nombre: str,
+    cliente: Optional[rate_limit.Cliente] = None
 ) -> Dict[str, Any]:
     """
     Manejar consulta agregada de todas las tiendas (INTENT 2)
     """
     logger.info(f"INTENT 2: Resumen de todas las tiendas")
+    telemetry.marcar_intent("resumen_tiendas")
     
     try:
         # Consultar todas las tiendas
-        tiendas = await query_todas_tiendas(anio, mes)
+        async with admission.CHAT_DATOS.admitir():
+            tiendas = await query_todas_tiendas(anio, mes)
         
         # Construir contexto
+        inicio_prompt = time.perf_counter()
         contexto = f"Resumen de tiendas ({mes_nombre} {anio}):\n\n"
         
         criticas = []
@@ -166,16 +317,20 @@ async def _handle_resumen_tiendas(
             contexto += f"\nTiendas críticas: {', '.join(criticas)}"
         if alertas:
             contexto += f"\nTiendas con alerta: {', '.join(alertas)}"
+        telemetry.registrar_etapa("construir_prompt", time.perf_counter() - inicio_prompt)
         
         # Generar respuesta con IA
-        response_text = await generate_chat_response(
-            user_message=message,
-            context=contexto
+        response_text, fuente = await _responder(
+            message, contexto, cliente,
+            plantilla=lambda: _plantilla_resumen(
+                mes_nombre, anio, len(tiendas), total_inv, total_vta, criticas, alertas
+            )
         )
         
         return {
             "response": response_text,
             "intent": "resumen_tiendas",
+            "source": fuente,
             "data_used": {
                 "year": anio,
                 "month": mes,
@@ -191,19 +346,17 @@ async def _handle_resumen_tiendas(
         # No hay datos para ese periodo
         logger.warning(f"Datos no encontrados: {e}")
         
-        response_text = f"No encontré datos para {mes_nombre} {anio}. Los datos disponibles van de Enero 2023 a Mayo 2025. Por favor verifica el periodo."
-        
-        return {
-            "response": response_text,
-            "intent": "resumen_tiendas",
-            "data_used": None
-        }
+        return _sin_datos(
+            "resumen_tiendas",
+            f"No encontré datos para {mes_nombre} {anio}.{_rango_disponible()} Por favor verifica el periodo."
+        )
 
-async def _handle_pregunta_general(message: str) -> Dict[str, Any]:
+async def _handle_pregunta_general(message: str, cliente: Optional[rate_limit.Cliente] = None) -> Dict[str, Any]:
     """
     Manejar pregunta general sin necesidad de BD (INTENT 3)
     """
     logger.info(f"INTENT 3: Pregunta general")
+    telemetry.marcar_intent("pregunta_general")
     
     contexto = """
 Contexto del problema de Calzando a México:
@@ -231,15 +384,15 @@ Contexto del problema de Calzando a México:
    - Más de 90 días: sobreinventario
 """
     
-    # Generar respuesta con IA
-    response_text = await generate_chat_response(
-        user_message=message,
-        context=contexto,
+    # Generar respuesta con IA (sin plantilla: excedido el límite y sin cache, 429)
+    response_text, fuente = await _responder(
+        message, contexto, cliente,
         system_role="Eres un consultor experto en retail y optimización de operaciones."
     )
     
     return {
         "response": response_text,
         "intent": "pregunta_general",
+        "source": fuente,
         "data_used": None
     }
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Servicio de consultas ad-hoc
+Traduce un ConsultaRequest al motor de consultas agregadas; el filtrado,
+orden y paginación corren en la fuente de datos y aquí solo se formatean
+las filas de la página pedida
+"""
+
+from typing import Any, Dict, List
+import numpy as np
+from app.models.dashboard import ConsultaRequest, ConsultaResponse
+from app.repositories.consulta import Condicion, Consulta
+from app.repositories.fuentes import get_fuente
+from app.services.catalogo_service import obtener_catalogo
+from app.utils import admission
+from app.utils.metrics_engine import dias_api, etiquetas_status, status_cobertura
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Medidas que se derivan en Python a partir de otra columna del resultado
+DERIVADAS = {"status": "cobertura"}
+
+def _periodo(texto: str) -> tuple:
+    anio, mes = texto.split("-")
+    return int(anio), int(mes)
+
+async def _validar_filtros(request: ConsultaRequest) -> None:
+    """
+    Validar tiendas y unidades contra el catálogo, sin consultar la base
+
+    Raises:
+        ValueError: Tienda o unidad desconocida
+    """
+    catalogo = await obtener_catalogo()
+    for tienda in request.filtros.tienda:
+        if not catalogo.tiene_tienda(tienda):
+            mensaje = f"No existe la tienda {tienda}"
+            sugerida = catalogo.buscar_tienda(tienda)
+            if sugerida:
+                mensaje += f". ¿Quisiste decir '{sugerida}'?"
+            raise ValueError(mensaje)
+    for unidad in request.filtros.unidad:
+        if not catalogo.tiene_unidad(unidad):
+            raise ValueError(f"No existe la unidad de negocio {unidad}. Disponibles: {', '.join(catalogo.unidades)}")
+
+def construir_consulta(request: ConsultaRequest) -> Consulta:
+    """
+    Consulta del motor para un request (pide una fila extra para saber si hay más)
+
+    Raises:
+        ValueError: Dimensiones, medidas u orden inválidos
+    """
+    medidas = []
+    for m in request.medidas:
+        m = DERIVADAS.get(m, m)
+        if m not in medidas:
+            medidas.append(m)
+
+    filtros = {
+        dimension: valores
+        for dimension, valores in (
+            ("tienda", request.filtros.tienda),
+            ("unidad", request.filtros.unidad),
+            ("anio", request.filtros.anio),
+            ("mes", request.filtros.mes)
+        )
+        if valores
+    }
+
+    consulta = Consulta(
+        dimensiones=list(request.dimensiones),
+        medidas=medidas,
+        filtros=filtros,
+        desde=_periodo(request.filtros.desde) if request.filtros.desde else None,
+        hasta=_periodo(request.filtros.hasta) if request.filtros.hasta else None,
+        condiciones=[Condicion(c.medida, c.operador, c.valor) for c in request.condiciones],
+        orden=list(request.orden),
+        limite=request.limite + 1,
+        offset=request.offset,
+        base=request.base
+    )
+    consulta.validar()
+    return consulta
+
+def _formatear(request: ConsultaRequest, consulta: Consulta, filas: List[tuple]) -> List[Dict[str, Any]]:
+    """Filas crudas -> dicts con las columnas pedidas, en el formato del resto de la API"""
+    columnas = {nombre: [f[i] for f in filas] for i, nombre in enumerate(consulta.columnas)}
+
+    if "cobertura" in columnas:
+        cobertura = np.array([np.inf if c is None else float(c) for c in columnas["cobertura"]], dtype=np.float64)
+        if "status" in request.medidas:
+            columnas["status"] = etiquetas_status(status_cobertura(cobertura))
+        columnas["cobertura"] = [dias_api(c) for c in cobertura]
+    for medida in ("inventario", "ventas"):
+        if medida in columnas:
+            columnas[medida] = [int(v or 0) for v in columnas[medida]]
+    if "sell_through" in columnas:
+        columnas["sell_through"] = [round(float(v or 0), 1) for v in columnas["sell_through"]]
+    for dimension in ("anio", "mes"):
+        if dimension in columnas:
+            columnas[dimension] = [int(v) for v in columnas[dimension]]
+
+    salida = list(request.dimensiones) + list(request.medidas)
+    return [{c: columnas[c][i] for c in salida} for i in range(len(filas))]
+
+def _consultar(consulta: Consulta) -> List[tuple]:
+    with get_fuente().sesion() as sesion:
+        return sesion.consultar(consulta)
+
+async def get_consulta(request: ConsultaRequest) -> ConsultaResponse:
+    """
+    Ejecutar un corte ad-hoc de inventario y ventas
+
+    Raises:
+        ValueError: Request inválido o entidades inexistentes
+    """
+    consulta = construir_consulta(request)
+    await _validar_filtros(request)
+
+    filas = await admission.en_hilo(_consultar, consulta)
+    hay_mas = len(filas) > request.limite
+    filas = filas[:request.limite]
+
+    return ConsultaResponse(
+        columnas=list(request.dimensiones) + list(request.medidas),
+        filas=_formatear(request, consulta, filas),
+        limite=request.limite,
+        offset=request.offset,
+        hay_mas=hay_mas
+    )
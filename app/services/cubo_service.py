@@ -0,0 +1,179 @@
+"""
+Servicio del cubo de inventario
+Carga INVENTARIO/VENTAS de toda la cadena a nivel tienda × unidad × periodo
+en un CuboInventario y lo mantiene en memoria para los cálculos vectorizados.
+Con CUBO_COMPARTIDO_PATH solo el proceso cargador consulta la fuente y
+publica el cubo; los workers mapean el snapshot publicado
+"""
+
+import asyncio
+import itertools
+import time
+from typing import Callable, Dict, List, Optional, Set
+from app.config import settings
+from app.repositories import cubo_compartido, huellas
+from app.repositories.fuentes import get_fuente
+from app.utils import admission, telemetry
+from app.utils.metrics_engine import CuboInventario
+import logging
+
+logger = logging.getLogger(__name__)
+
+_versiones = itertools.count(1)
+_cubo: Optional[CuboInventario] = None
+_cargado_en = 0.0  # Última carga completa: la de periodos no la pospone
+_lock_carga: Optional[asyncio.Lock] = None
+_suscriptores: List[Callable[[CuboInventario], None]] = []
+_es_cargador = False
+_identidad: Optional[cubo_compartido.Identidad] = None  # Snapshot mapeado por este worker
+_revisado_en = 0.0
+
+def modo_lector() -> bool:
+    """True si este proceso es un worker que mapea el cubo publicado por el cargador"""
+    return bool(settings.CUBO_COMPARTIDO_PATH) and not _es_cargador
+
+def ser_cargador() -> None:
+    """
+    Marcar este proceso como el cargador del cubo compartido
+
+    Cada carga desde la fuente se publica en CUBO_COMPARTIDO_PATH; las
+    versiones continúan desde la del último snapshot publicado
+    """
+    global _es_cargador, _versiones
+    _es_cargador = True
+    _versiones = itertools.count(cubo_compartido.leer_version(settings.CUBO_COMPARTIDO_PATH) + 1)
+
+def _get_lock() -> asyncio.Lock:
+    global _lock_carga
+    if _lock_carga is None:
+        _lock_carga = asyncio.Lock()
+    return _lock_carga
+
+def suscribir(callback: Callable[[CuboInventario], None]) -> None:
+    """
+    Registrar una función que se llama con cada cubo recién cargado
+
+    Se invoca en el event loop justo después del reemplazo; debe ser rápida.
+    Si el cubo ya está cargado, se llama de inmediato con él
+    """
+    _suscriptores.append(callback)
+    if _cubo is not None:
+        _notificar(callback, _cubo)
+
+def _notificar(callback: Callable[[CuboInventario], None], cubo: CuboInventario) -> None:
+    try:
+        callback(cubo)
+    except Exception as e:
+        logger.error(f"Error notificando cubo v{cubo.version} a {callback.__qualname__}: {str(e)}", exc_info=True)
+
+def cargar_cubo() -> CuboInventario:
+    """
+    Leer la cadena completa pre-agregada por tienda, unidad y periodo
+    desde la fuente de datos activa
+    """
+    with get_fuente().sesion() as sesion:
+        # Huellas antes que filas: un cambio entre ambas se detecta en la revisión siguiente
+        huellas_fuente = huellas.por_periodo(sesion.huellas())
+        filas = sesion.cubo()
+
+    with telemetry.span("construir_cubo"):
+        cubo = CuboInventario.desde_filas(filas, version=next(_versiones))
+        cubo.huellas = huellas_fuente
+
+    _publicar(cubo)
+    logger.info(
+        f"Cubo v{cubo.version} cargado: {len(cubo.tiendas)} tiendas, "
+        f"{len(cubo.unidades)} unidades, {len(cubo.periodos)} periodos"
+    )
+    return cubo
+
+def cargar_periodos(
+    base: CuboInventario,
+    periodos: Set[huellas.Periodo],
+    huellas_fuente: Dict[huellas.Periodo, huellas.Huella]
+) -> CuboInventario:
+    """Cubo nuevo con solo los periodos indicados releídos de la fuente"""
+    with get_fuente().sesion() as sesion:
+        filas = sesion.cubo(sorted(periodos))
+
+    with telemetry.span("construir_cubo"):
+        cubo = base.con_periodos(periodos, filas, huellas_fuente, version=next(_versiones))
+
+    _publicar(cubo)
+    logger.info(
+        f"Cubo v{cubo.version}: {len(periodos)} periodo(s) recargado(s) "
+        f"({', '.join(f'{a}-{m:02d}' for a, m in sorted(periodos))})"
+    )
+    return cubo
+
+def _publicar(cubo: CuboInventario) -> None:
+    if _es_cargador:
+        with telemetry.span("publicar_cubo"):
+            cubo_compartido.publicar(cubo, settings.CUBO_COMPARTIDO_PATH)
+
+def _reemplazar(cubo: CuboInventario, completo: bool = False) -> None:
+    global _cubo, _cargado_en
+    _cubo = cubo
+    if completo:
+        _cargado_en = time.monotonic()
+    for callback in _suscriptores:
+        _notificar(callback, cubo)
+
+async def _obtener_compartido(forzar: bool) -> CuboInventario:
+    """
+    Cubo del snapshot compartido; se vuelve a mapear solo si el cargador
+    publicó otra versión (revisado cada CUBO_COMPARTIDO_REVISION_SECONDS)
+    """
+    global _identidad, _revisado_en
+
+    if not forzar and _cubo is not None and time.monotonic() - _revisado_en < settings.CUBO_COMPARTIDO_REVISION_SECONDS:
+        return _cubo
+
+    async with _get_lock():
+        if not forzar and _cubo is not None and time.monotonic() - _revisado_en < settings.CUBO_COMPARTIDO_REVISION_SECONDS:
+            return _cubo
+        ruta = settings.CUBO_COMPARTIDO_PATH
+        if _cubo is None or cubo_compartido.identidad(ruta) != _identidad:
+            cubo, _identidad = await admission.en_hilo(cubo_compartido.abrir, ruta, settings.CUBO_COMPARTIDO_ESPERA_SECONDS)
+            logger.info(f"Cubo v{cubo.version} mapeado de {ruta}")
+            _reemplazar(cubo)
+        _revisado_en = time.monotonic()
+        return _cubo
+
+async def obtener_cubo(forzar: bool = False) -> CuboInventario:
+    """
+    Obtener el cubo en memoria, recargándolo si expiró CUBO_TTL_SECONDS
+
+    Solo una recarga corre a la vez; los demás requests esperan su resultado.
+    En un worker con cubo compartido no se consulta la fuente: se mapea la
+    última versión publicada por el cargador
+    """
+    if modo_lector():
+        return await _obtener_compartido(forzar)
+
+    if not forzar and _cubo is not None and time.monotonic() - _cargado_en < settings.CUBO_TTL_SECONDS:
+        return _cubo
+
+    async with _get_lock():
+        if not forzar and _cubo is not None and time.monotonic() - _cargado_en < settings.CUBO_TTL_SECONDS:
+            return _cubo
+        _reemplazar(await admission.en_hilo(cargar_cubo), completo=True)
+        return _cubo
+
+async def recargar_periodos(
+    periodos: Set[huellas.Periodo],
+    huellas_fuente: Dict[huellas.Periodo, huellas.Huella]
+) -> CuboInventario:
+    """
+    Reemplazar en el cubo solo los periodos que cambiaron en la fuente
+
+    Sin cubo cargado se hace la carga completa. No pospone la recarga
+    completa de cada CUBO_TTL_SECONDS: lo que las huellas no detectan se
+    corrige a más tardar ahí
+    """
+    async with _get_lock():
+        if _cubo is None:
+            _reemplazar(await admission.en_hilo(cargar_cubo), completo=True)
+        else:
+            _reemplazar(await admission.en_hilo(cargar_periodos, _cubo, periodos, huellas_fuente))
+        return _cubo
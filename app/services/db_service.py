@@ -1,353 +1,403 @@
-
-
-import ibm_db
-from typing import List, Dict, Any, Optional
-from app.config import settings, BENCHMARK_MIN_DIAS, BENCHMARK_MAX_DIAS, MES_MAP_INV
+import asyncio
+import numpy as np
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from app.config import settings, MES_MAP_INV
 from app.models.dashboard import (
     DashboardSummary,
     TiendaResumen,
     TiendaDetalle,
     UnidadNegocioDetalle,
     HistoricoResponse,
-    DatoHistorico
+    DatoHistorico,
+    DashboardBundle
 )
+from app.repositories.base import SesionDatos
+from app.repositories.fuentes import get_fuente
+from app.services import cambios_service, catalogo_service
+from app.utils import admission, cancelacion, codificacion, telemetry
+from app.utils.cache import CacheSWR
+from app.utils.cache_compartido import nivel as cache_compartido
+from app.utils.metrics_engine import calcular_kpis, cobertura_dias, dias_api, etiquetas_status
 import logging
 
 logger = logging.getLogger(__name__)
 
-# String de conexión global
-DSN = (
-    f"DATABASE={settings.DB2_DATABASE};"
-    f"HOSTNAME={settings.DB2_HOSTNAME};"
-    f"PORT={settings.DB2_PORT};"
-    f"PROTOCOL=TCPIP;"
-    f"UID={settings.DB2_UID};"
-    f"PWD={settings.DB2_PWD};"
-    f"SECURITY=SSL;"
+TAMANO_LOTE = telemetry.histograma(
+    "calzando_tienda_lote_tamano",
+    "Tiendas resueltas por cada consulta en lote del detalle",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)
 )
 
-def get_db_connection():
-    """Crear conexión a Db2"""
-    try:
-        conn = ibm_db.connect(DSN, "", "")
-        return conn
-    except Exception as e:
-        logger.error(f"Error conectando a Db2: {e}")
-        raise ConnectionError(f"No se pudo conectar a Db2: {str(e)}")
+codificacion.registrar(TiendaResumen, DatoHistorico, HistoricoResponse)
+
+def _version_vista(llave: Tuple) -> Optional[str]:
+    """Huella de los periodos de una vista: ("tiendas", año, mes) o ("historico", año, tienda)"""
+    if llave[0] == "tiendas":
+        return cambios_service.version(llave[1], llave[2])
+    return cambios_service.version(llave[1])
+
+# Agregado por tienda de un periodo e histórico por año: se sirven del cache y
+# las vistas más pedidas se recargan en segundo plano antes de expirar. Con
+# nivel compartido, las réplicas se reparten las cargas y las conservan al reiniciar
+cache_dashboard: CacheSWR = CacheSWR(
+    "dashboard",
+    max_elementos=settings.DASHBOARD_CACHE_MAX_ITEMS,
+    ttl=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    max_stale=settings.DASHBOARD_CACHE_STALE_SECONDS,
+    concurrencia=settings.DASHBOARD_REFRESCO_CONCURRENCIA,
+    top=settings.DASHBOARD_REFRESCO_TOP,
+    intervalo=settings.DASHBOARD_REFRESCO_INTERVALO_SECONDS,
+    compartido=cache_compartido,
+    version=_version_vista
+)
 
 def test_db_connection() -> bool:
-    """Probar conexión a Db2"""
+    """Probar conexión a la fuente de datos activa"""
     try:
-        conn = get_db_connection()
-        ibm_db.close(conn)
-        return True
-    except:
+        return get_fuente().probar()
+    except Exception as e:
+        logger.error(f"Fuente de datos {settings.DATA_BACKEND} no disponible: {str(e)}")
         return False
 
-def calcular_cobertura(inv_pzs: int, vta_pzs: int) -> float:
-    """Calcular días de cobertura"""
-    if vta_pzs is None or vta_pzs == 0:
-        return float('inf')
-    if inv_pzs is None:
-        return 0.0
-    return (inv_pzs / vta_pzs) * 30
-
-def determinar_status(cobertura: float) -> str:
-    """Determinar status según cobertura"""
-    if cobertura == float('inf'):
-        return "SIN VENTAS"
-    elif cobertura < BENCHMARK_MIN_DIAS:
-        return "CRÍTICO"
-    elif cobertura <= BENCHMARK_MAX_DIAS:
-        return "ÓPTIMO"
-    else:
-        return "SOBREINVENTARIO"
+def _columnas(filas: List[tuple], *indices: int) -> List[np.ndarray]:
+    """Columnas numéricas de las filas como arreglos (NULL -> 0)"""
+    return [
+        np.fromiter((f[i] or 0 for f in filas), dtype=np.float64, count=len(filas))
+        for i in indices
+    ]
 
-async def get_dashboard_summary(year: int, month: int) -> DashboardSummary:
+def _consultar_resumen_por_tienda(sesion: SesionDatos, year: int, month: int) -> List[TiendaResumen]:
     """
-    Obtener resumen general del dashboard
+    Agregado por tienda (inventario, ventas, cobertura y status) de un periodo
+
+    Es la base compartida de /summary, /tiendas y /bundle
     """
-    conn = get_db_connection()
+    filas = sesion.resumen_por_tienda(year, month)
     
-    try:
-        sql = f"""
-        SELECT 
-            I.TIENDA,
-            SUM(I.INV_PZS) as TOTAL_INV,
-            SUM(COALESCE(V.VTA_PZS, 0)) as TOTAL_VTA
-        FROM {settings.DB2_SCHEMA}.INVENTARIO I
-        LEFT JOIN {settings.DB2_SCHEMA}.VENTAS V 
-            ON I.TIENDA = V.TIENDA 
-            AND I.ANIO = V.ANIO 
-            AND I.MES = V.MES
-            AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
-        WHERE I.ANIO = ? AND I.MES = ?
-        GROUP BY I.TIENDA
-        """
-        
-        stmt = ibm_db.prepare(conn, sql)
-        ibm_db.execute(stmt, (year, month))
-        
-        total_tiendas = 0
-        criticas = 0
-        alertas = 0
-        optimas = 0
-        total_inv = 0
-        total_vta = 0
-        
-        row = ibm_db.fetch_tuple(stmt)
-        
-        if not row:
-            raise ValueError(f"No hay datos para {month}/{year}")
-        
-        while row:
-            tienda, inv, vta = row
-            total_tiendas += 1
-            total_inv += inv
-            total_vta += vta if vta else 0
-            
-            cobertura = calcular_cobertura(inv, vta)
-            status = determinar_status(cobertura)
-            
-            if status == "CRÍTICO":
-                criticas += 1
-            elif status in ["SOBREINVENTARIO", "SIN VENTAS"]:
-                alertas += 1
-            else:
-                optimas += 1
-            
-            row = ibm_db.fetch_tuple(stmt)
-        
-        cobertura_prom = calcular_cobertura(total_inv, total_vta)
-        mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
-        
-        return DashboardSummary(
-            total_tiendas=total_tiendas,
-            tiendas_criticas=criticas,
-            tiendas_alerta=alertas,
-            tiendas_optimas=optimas,
-            inventario_total=total_inv,
-            ventas_totales=total_vta,
-            cobertura_promedio=round(cobertura_prom, 1) if cobertura_prom != float('inf') else 0,
-            periodo=f"{mes_nombre} {year}"
-        )
+    if not filas:
+        raise ValueError(f"No hay datos para {month}/{year}")
+    
+    inv, vta = _columnas(filas, 1, 2)
+    kpis = calcular_kpis(inv, vta)
+    status = etiquetas_status(kpis.status)
+    
+    tiendas = []
+    for i, (tienda, inv_pzs, vta_pzs) in enumerate(filas):
+        tiendas.append(TiendaResumen(
+            tienda=tienda,
+            inventario=inv_pzs,
+            ventas=vta_pzs if vta_pzs else 0,
+            cobertura=dias_api(kpis.cobertura[i]),
+            status=status[i]
+        ))
     
-    finally:
-        ibm_db.close(conn)
+    return tiendas
 
-async def get_all_tiendas_resumen(year: int, month: int) -> List[TiendaResumen]:
+def _resumir_tiendas(tiendas: List[TiendaResumen], year: int, month: int) -> DashboardSummary:
     """
-    Obtener resumen de todas las tiendas
+    Reducir el agregado por tienda a los conteos del resumen general
     """
-    conn = get_db_connection()
+    criticas = 0
+    alertas = 0
+    optimas = 0
+    total_inv = 0
+    total_vta = 0
     
-    try:
-        sql = f"""
-        SELECT 
-            I.TIENDA,
-            SUM(I.INV_PZS) as TOTAL_INV,
-            SUM(COALESCE(V.VTA_PZS, 0)) as TOTAL_VTA
-        FROM {settings.DB2_SCHEMA}.INVENTARIO I
-        LEFT JOIN {settings.DB2_SCHEMA}.VENTAS V 
-            ON I.TIENDA = V.TIENDA 
-            AND I.ANIO = V.ANIO 
-            AND I.MES = V.MES
-            AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
-        WHERE I.ANIO = ? AND I.MES = ?
-        GROUP BY I.TIENDA
-        ORDER BY I.TIENDA
-        """
-        
-        stmt = ibm_db.prepare(conn, sql)
-        ibm_db.execute(stmt, (year, month))
-        
-        tiendas = []
-        row = ibm_db.fetch_tuple(stmt)
+    for t in tiendas:
+        total_inv += t.inventario
+        total_vta += t.ventas
         
-        if not row:
-            raise ValueError(f"No hay datos para {month}/{year}")
-        
-        while row:
-            tienda, inv, vta = row
-            vta = vta if vta else 0
-            cobertura = calcular_cobertura(inv, vta)
-            status = determinar_status(cobertura)
-            
-            tiendas.append(TiendaResumen(
-                tienda=tienda,
-                inventario=inv,
-                ventas=vta,
-                cobertura=round(cobertura, 1) if cobertura != float('inf') else 0,
-                status=status
-            ))
-            
-            row = ibm_db.fetch_tuple(stmt)
-        
-        return tiendas
+        if t.status == "CRÍTICO":
+            criticas += 1
+        elif t.status in ["SOBREINVENTARIO", "SIN VENTAS"]:
+            alertas += 1
+        else:
+            optimas += 1
     
-    finally:
-        ibm_db.close(conn)
+    cobertura_prom = cobertura_dias(total_inv, total_vta)
+    mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
+    
+    return DashboardSummary(
+        total_tiendas=len(tiendas),
+        tiendas_criticas=criticas,
+        tiendas_alerta=alertas,
+        tiendas_optimas=optimas,
+        inventario_total=total_inv,
+        ventas_totales=total_vta,
+        cobertura_promedio=dias_api(cobertura_prom),
+        periodo=f"{mes_nombre} {year}"
+    )
+
+async def _tiendas_resumen(year: int, month: int) -> List[TiendaResumen]:
+    """Agregado por tienda del periodo, desde el cache del dashboard"""
+    return await cache_dashboard.obtener(
+        ("tiendas", year, month),
+        lambda: admission.en_hilo(_all_tiendas_resumen, year, month)
+    )
+
+async def _historico_cacheado(year: int, tienda: Optional[str] = None) -> HistoricoResponse:
+    """Histórico del año, desde el cache del dashboard"""
+    return await cache_dashboard.obtener(
+        ("historico", year, tienda),
+        lambda: admission.en_hilo(_historico, year, tienda)
+    )
+
+@telemetry.cronometrar()
+async def get_dashboard_summary(year: int, month: int) -> DashboardSummary:
+    """
+    Obtener resumen general del dashboard
+    """
+    tiendas = await _tiendas_resumen(year, month)
+    return _resumir_tiendas(tiendas, year, month)
+
+@telemetry.cronometrar()
+async def get_all_tiendas_resumen(year: int, month: int) -> List[TiendaResumen]:
+    """
+    Obtener resumen de todas las tiendas
+    """
+    return await _tiendas_resumen(year, month)
+
+def _all_tiendas_resumen(year: int, month: int) -> List[TiendaResumen]:
+    with get_fuente().sesion() as sesion:
+        return _consultar_resumen_por_tienda(sesion, year, month)
+
+def _unidades_tiendas(tiendas: List[str], year: int, month: int) -> List[tuple]:
+    with get_fuente().sesion() as sesion:
+        return sesion.unidades_tiendas(tiendas, year, month)
+
+class CargadorTiendas:
+    """
+    Agrupa en lotes las consultas de detalle por tienda
+
+    Las llaves (tienda, año, mes) pedidas dentro de una ventana corta se
+    resuelven con una consulta WHERE TIENDA IN (...) por periodo y cada
+    llamador recibe sus filas del resultado compartido; una llave repetida
+    en el mismo lote se consulta una sola vez
 
+    Args:
+        ventana_ms: Espera desde la primera llave de un lote (0 = sin lotes)
+        max_lote: Tiendas por lote; al llenarse se despacha sin esperar
+    """
+
+    def __init__(self, ventana_ms: float, max_lote: int):
+        self.ventana = ventana_ms / 1000
+        self.max_lote = max(1, max_lote)
+        self._lotes: Dict[Tuple[int, int], Dict[str, asyncio.Future]] = {}
+        self._timers: Dict[Tuple[int, int], asyncio.TimerHandle] = {}
+        self._tareas: Set[asyncio.Task] = set()
+
+    async def cargar(self, tienda: str, year: int, month: int) -> List[tuple]:
+        """Filas (unidad, inventario, ventas) de una tienda en un periodo"""
+        if self.ventana <= 0:
+            filas = await admission.en_hilo(_unidades_tiendas, [tienda], year, month)
+            return [f[1:] for f in filas]
+
+        loop = asyncio.get_running_loop()
+        periodo = (year, month)
+        lote = self._lotes.setdefault(periodo, {})
+        futuro = lote.get(tienda)
+        if futuro is None:
+            futuro = loop.create_future()
+            lote[tienda] = futuro
+            if len(lote) >= self.max_lote:
+                self._despachar(periodo)
+            elif periodo not in self._timers:
+                self._timers[periodo] = loop.call_later(self.ventana, self._despachar, periodo)
+        # shield: si un llamador se cancela, los demás del lote siguen esperando el resultado
+        return await asyncio.shield(futuro)
+
+    def _despachar(self, periodo: Tuple[int, int]) -> None:
+        timer = self._timers.pop(periodo, None)
+        if timer is not None:
+            timer.cancel()
+        lote = self._lotes.pop(periodo, None)
+        if lote:
+            tarea = asyncio.ensure_future(self._resolver(periodo, lote))
+            self._tareas.add(tarea)
+            tarea.add_done_callback(self._tareas.discard)
+
+    async def _resolver(self, periodo: Tuple[int, int], lote: Dict[str, asyncio.Future]) -> None:
+        TAMANO_LOTE.observar(len(lote))
+        try:
+            # El lote es de varios requests: no lo detiene la cancelación del que lo abrió
+            with cancelacion.desacoplado():
+                filas = await admission.en_hilo(_unidades_tiendas, list(lote), *periodo)
+        except asyncio.CancelledError:
+            for futuro in lote.values():
+                futuro.cancel()
+            raise
+        except Exception as e:
+            for futuro in lote.values():
+                if not futuro.done():
+                    futuro.set_exception(e)
+                    # Evita "exception was never retrieved" si todos los llamadores se cancelaron
+                    futuro.add_done_callback(lambda f: f.exception())
+            return
+
+        # CHAR de Db2 regresa el nombre con relleno: se compara sin espacios en los extremos
+        por_tienda: Dict[str, List[tuple]] = {}
+        for tienda, *resto in filas:
+            por_tienda.setdefault(tienda.strip(), []).append(tuple(resto))
+        for tienda, futuro in lote.items():
+            if not futuro.done():
+                futuro.set_result(por_tienda.get(tienda.strip(), []))
+
+cargador_tiendas = CargadorTiendas(settings.TIENDA_LOTE_VENTANA_MS, settings.TIENDA_LOTE_MAX)
+
+@telemetry.cronometrar()
 async def get_tienda_detalle(tienda_nombre: str, year: int, month: int) -> TiendaDetalle:
     """
     Obtener detalle de una tienda específica con datos por unidad de negocio
+    
+    La existencia de la tienda en el periodo se valida contra el catálogo,
+    sin consultar la base; la consulta se agrupa con las de otras tiendas
+    del mismo periodo que lleguen dentro de la ventana del cargador
     """
-    conn = get_db_connection()
+    tienda_nombre = await catalogo_service.resolver_tienda(tienda_nombre, year, month)
+    filas = await cargador_tiendas.cargar(tienda_nombre, year, month)
+    if not filas:
+        raise ValueError(f"No hay datos para {tienda_nombre} en {month}/{year}")
+    return _armar_detalle(tienda_nombre, year, month, filas)
+
+def _armar_detalle(tienda_nombre: str, year: int, month: int, filas: List[tuple]) -> TiendaDetalle:
+    """Detalle a partir de las filas (unidad, inventario, ventas) de la tienda"""
+    inv, vta = _columnas(filas, 1, 2)
+    kpis = calcular_kpis(inv, vta)
     
-    try:
-        # Verificar que la tienda existe
-        sql_check = f"""
-        SELECT COUNT(*) FROM {settings.DB2_SCHEMA}.INVENTARIO 
-        WHERE TIENDA = ? AND ANIO = ? AND MES = ?
-        """
-        stmt = ibm_db.prepare(conn, sql_check)
-        ibm_db.execute(stmt, (tienda_nombre, year, month))
-        count = ibm_db.fetch_tuple(stmt)[0]
-        
-        if count == 0:
-            raise ValueError(f"No hay datos para {tienda_nombre} en {month}/{year}")
-        
-        # Obtener datos por unidad de negocio
-        sql = f"""
-        SELECT 
-            COALESCE(I.UNIDAD_NEGOCIO, V.UNIDAD_NEGOCIO) as UNIDAD_NEGOCIO,
-            COALESCE(I.INV_PZS, 0) as INV_PZS,
-            COALESCE(V.VTA_PZS, 0) as VTA_PZS
-        FROM {settings.DB2_SCHEMA}.INVENTARIO I
-        FULL OUTER JOIN {settings.DB2_SCHEMA}.VENTAS V 
-            ON I.TIENDA = V.TIENDA 
-            AND I.ANIO = V.ANIO 
-            AND I.MES = V.MES
-            AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
-        WHERE COALESCE(I.TIENDA, V.TIENDA) = ? 
-          AND COALESCE(I.ANIO, V.ANIO) = ? 
-          AND COALESCE(I.MES, V.MES) = ?
-        """
-        
-        stmt = ibm_db.prepare(conn, sql)
-        ibm_db.execute(stmt, (tienda_nombre, year, month))
-        
-        unidades = []
-        total_inv = 0
-        total_vta = 0
-        
-        row = ibm_db.fetch_tuple(stmt)
-        while row:
-            unidad, inv, vta = row
-            cobertura = calcular_cobertura(inv, vta)
-            
-            unidades.append(UnidadNegocioDetalle(
-                unidad=unidad,
-                inventario=inv,
-                ventas=vta,
-                cobertura=round(cobertura, 1) if cobertura != float('inf') else 0
-            ))
-            
-            total_inv += inv
-            total_vta += vta
-            
-            row = ibm_db.fetch_tuple(stmt)
-        
-        total_cobertura = calcular_cobertura(total_inv, total_vta)
-        mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
+    unidades = []
+    total_inv = 0
+    total_vta = 0
+    
+    for i, (unidad, inv_pzs, vta_pzs) in enumerate(filas):
+        unidades.append(UnidadNegocioDetalle(
+            unidad=unidad,
+            inventario=inv_pzs,
+            ventas=vta_pzs,
+            cobertura=dias_api(kpis.cobertura[i])
+        ))
         
-        return TiendaDetalle(
-            tienda=tienda_nombre,
-            periodo=f"{mes_nombre} {year}",
-            total_inventario=total_inv,
-            total_ventas=total_vta,
-            cobertura=round(total_cobertura, 1) if total_cobertura != float('inf') else 0,
-            detalle_unidades=unidades
-        )
+        total_inv += inv_pzs
+        total_vta += vta_pzs
+    
+    total_cobertura = cobertura_dias(total_inv, total_vta)
+    mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
+    
+    return TiendaDetalle(
+        tienda=tienda_nombre,
+        periodo=f"{mes_nombre} {year}",
+        total_inventario=total_inv,
+        total_ventas=total_vta,
+        cobertura=dias_api(total_cobertura),
+        detalle_unidades=unidades
+    )
+
+def _consultar_historico(sesion: SesionDatos, year: int, tienda: Optional[str] = None) -> HistoricoResponse:
+    """
+    Serie mensual de un año (de una tienda o agregada de la cadena)
+    """
+    filas = sesion.historico(year, tienda)
     
-    finally:
-        ibm_db.close(conn)
+    if not filas:
+        raise ValueError(f"No hay datos históricos para {year}" + (f" - {tienda}" if tienda else ""))
+    
+    inv, vta = _columnas(filas, 1, 2)
+    kpis = calcular_kpis(inv, vta)
+    
+    datos = []
+    for i, (mes, inv_pzs, vta_pzs) in enumerate(filas):
+        datos.append(DatoHistorico(
+            mes=mes,
+            inventario=inv_pzs,
+            ventas=vta_pzs,
+            cobertura=dias_api(kpis.cobertura[i])
+        ))
+    
+    return HistoricoResponse(
+        tienda=tienda,
+        year=year,
+        datos=datos
+    )
 
+@telemetry.cronometrar()
 async def get_historico(year: int, tienda: Optional[str] = None) -> HistoricoResponse:
     """
     Obtener datos históricos para gráficos
     """
-    conn = get_db_connection()
-    
-    try:
-        if tienda:
-            # Datos de una tienda específica
-            sql = f"""
-            SELECT 
-                I.MES,
-                SUM(I.INV_PZS) as TOTAL_INV,
-                SUM(COALESCE(V.VTA_PZS, 0)) as TOTAL_VTA
-            FROM {settings.DB2_SCHEMA}.INVENTARIO I
-            LEFT JOIN {settings.DB2_SCHEMA}.VENTAS V 
-                ON I.TIENDA = V.TIENDA 
-                AND I.ANIO = V.ANIO 
-                AND I.MES = V.MES
-                AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
-            WHERE I.TIENDA = ? AND I.ANIO = ?
-            GROUP BY I.MES
-            ORDER BY I.MES
-            """
-            stmt = ibm_db.prepare(conn, sql)
-            ibm_db.execute(stmt, (tienda, year))
-        else:
-            # Datos agregados de todas las tiendas
-            sql = f"""
-            SELECT 
-                I.MES,
-                SUM(I.INV_PZS) as TOTAL_INV,
-                SUM(COALESCE(V.VTA_PZS, 0)) as TOTAL_VTA
-            FROM {settings.DB2_SCHEMA}.INVENTARIO I
-            LEFT JOIN {settings.DB2_SCHEMA}.VENTAS V 
-                ON I.TIENDA = V.TIENDA 
-                AND I.ANIO = V.ANIO 
-                AND I.MES = V.MES
-                AND I.UNIDAD_NEGOCIO = V.UNIDAD_NEGOCIO
-            WHERE I.ANIO = ?
-            GROUP BY I.MES
-            ORDER BY I.MES
-            """
-            stmt = ibm_db.prepare(conn, sql)
-            ibm_db.execute(stmt, (year,))
-        
-        datos = []
-        row = ibm_db.fetch_tuple(stmt)
-        
-        if not row:
-            raise ValueError(f"No hay datos históricos para {year}" + (f" - {tienda}" if tienda else ""))
-        
-        while row:
-            mes, inv, vta = row
-            cobertura = calcular_cobertura(inv, vta)
-            
-            datos.append(DatoHistorico(
-                mes=mes,
-                inventario=inv,
-                ventas=vta,
-                cobertura=round(cobertura, 1) if cobertura != float('inf') else 0
-            ))
-            
-            row = ibm_db.fetch_tuple(stmt)
-        
-        return HistoricoResponse(
-            tienda=tienda,
-            year=year,
-            datos=datos
-        )
+    if tienda:
+        tienda = await catalogo_service.resolver_tienda(tienda)
+    return await _historico_cacheado(year, tienda)
+
+def _historico(year: int, tienda: Optional[str] = None) -> HistoricoResponse:
+    with get_fuente().sesion() as sesion:
+        return _consultar_historico(sesion, year, tienda)
+
+@telemetry.cronometrar()
+async def get_dashboard_bundle(year: int, month: int) -> DashboardBundle:
+    """
+    Obtener summary, tiendas e histórico del año en una sola respuesta
     
-    finally:
-        ibm_db.close(conn)
+    Comparte con /summary, /tiendas e /historico las entradas del cache;
+    el resumen se deriva del agregado por tienda
+    """
+    tiendas, historico = await asyncio.gather(
+        _tiendas_resumen(year, month),
+        _historico_cacheado(year)
+    )
+    return DashboardBundle(
+        summary=_resumir_tiendas(tiendas, year, month),
+        tiendas=tiendas,
+        historico=historico
+    )
+
+def _vistas_calientes() -> List[Tuple[tuple, Callable[[], Awaitable[Any]]]]:
+    """Vistas por defecto del dashboard: tiendas del último periodo e histórico de la cadena del último año"""
+    catalogo = catalogo_service.catalogo_actual()
+    if catalogo is None or catalogo.ultimo is None:
+        return []
+    year, month = catalogo.ultimo
+    return [
+        (("tiendas", year, month), lambda: admission.en_hilo(_all_tiendas_resumen, year, month)),
+        (("historico", year, None), lambda: admission.en_hilo(_historico, year, None))
+    ]
+
+cache_dashboard.precalentar(_vistas_calientes)
+
+def _caducar_periodos(periodos: Set[Tuple[int, int]]) -> None:
+    """Descartar las vistas de los meses que cambiaron y el histórico de sus años"""
+    anios = {anio for anio, _ in periodos}
+
+    def afectada(llave) -> bool:
+        if llave[0] == "tiendas":
+            return (llave[1], llave[2]) in periodos
+        return llave[0] == "historico" and llave[1] in anios
+
+    descartadas = cache_dashboard.caducar(afectada)
+    if descartadas:
+        logger.info(f"Cache del dashboard: {descartadas} vista(s) descartada(s) por cambios en la fuente")
+
+cambios_service.suscribir(_caducar_periodos)
+
+def iniciar() -> None:
+    """Arrancar la recarga anticipada del cache del dashboard"""
+    cache_dashboard.iniciar()
+
+async def detener() -> None:
+    await cache_dashboard.detener()
 
 async def query_tienda_datos(tienda: str, year: int, month: int) -> Dict[str, Any]:
     """
     Query auxiliar para el chat service
-    Retorna datos de una tienda en formato dict
+    Retorna datos de una tienda en formato dict, con el status calculado
+    por el motor sobre los totales sin redondear (el mismo del dashboard)
     """
     detalle = await get_tienda_detalle(tienda, year, month)
+    kpis = calcular_kpis(detalle.total_inventario, detalle.total_ventas)
     
     return {
         "total_inventario": detalle.total_inventario,
         "total_ventas": detalle.total_ventas,
         "total_cobertura_dias": detalle.cobertura,
+        "status": etiquetas_status(kpis.status)[0],
         "detalle_unidades": [
             {
                 "unidad": u.unidad,
@@ -0,0 +1,148 @@
+"""
+Servicio de pronóstico de desabasto
+Pronostica las ventas del siguiente mes de todas las series tienda × unidad
+sobre el cubo en memoria y proyecta cobertura y días hasta desabasto.
+Los resultados se guardan por versión del cubo
+"""
+
+from typing import Dict, Tuple
+import numpy as np
+from app.config import MES_MAP_INV, BENCHMARK_MIN_DIAS
+from app.models.dashboard import PronosticoTienda, PronosticoResponse
+from app.services import cubo_service
+from app.utils import telemetry
+from app.utils.metrics_engine import CuboInventario, status_cobertura, dias_api, top_k, STATUS_ETIQUETAS
+from app.utils.pronostico import pronosticar, dias_hasta_desabasto, dias_hasta_critico, indice_meses
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (versión, año, mes, método) -> arreglos por nivel
+_cache: Dict[Tuple[int, int, int, str], Dict[str, Dict[str, np.ndarray]]] = {}
+
+def _invalidar(cubo: CuboInventario) -> None:
+    _cache.clear()
+
+cubo_service.suscribir(_invalidar)
+
+def _siguiente_mes(anio: int, mes: int) -> Tuple[int, int]:
+    return (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+
+def _proyectar(inv: np.ndarray, demanda: np.ndarray, presente: np.ndarray) -> Dict[str, np.ndarray]:
+    desabasto = dias_hasta_desabasto(inv, demanda)
+    critico = dias_hasta_critico(desabasto)
+    return {
+        "inventario": inv,
+        "demanda": demanda,
+        "presente": presente,
+        "dias_desabasto": desabasto,
+        "dias_critico": critico,
+        "status": status_cobertura(desabasto),
+        # Cruza el mínimo antes de que termine el mes pronosticado
+        "critico_proximo_mes": presente & (critico < 30) & np.isfinite(desabasto)
+    }
+
+def calcular_pronostico(cubo: CuboInventario, year: int, month: int, metodo: str) -> Dict[str, Dict[str, np.ndarray]]:
+    """
+    Pronóstico del mes siguiente a (year, month) para tienda × unidad y tienda
+
+    Usa la historia hasta el periodo base, sobre el mes real de cada
+    periodo (los meses que faltan en el cubo cuentan como huecos); a nivel
+    tienda la demanda es la suma de los pronósticos de sus unidades
+    """
+    p = cubo.indice_periodo(year, month)
+    if p is None:
+        raise ValueError(f"No hay datos para {month}/{year}")
+
+    filas = len(cubo.tiendas) * len(cubo.unidades)
+    vta = cubo.vta.reshape(filas, -1)
+    inv = cubo.inv.reshape(filas, -1)
+    presente = (cubo.presente | (cubo.vta > 0)).reshape(filas, -1)
+
+    anio_obj, mes_obj = _siguiente_mes(year, month)
+    q = cubo.indice_periodo(anio_obj - 1, mes_obj)
+    if q is None:
+        estacional = np.zeros(filas)
+        estacional_presente = np.zeros(filas, dtype=bool)
+    else:
+        estacional = vta[:, q]
+        estacional_presente = presente[:, q]
+
+    demanda = pronosticar(
+        vta[:, :p + 1], presente[:, :p + 1], estacional, estacional_presente, metodo,
+        meses=indice_meses(cubo.periodos[:p + 1])
+    )
+
+    unidad = _proyectar(inv[:, p], demanda, presente[:, p])
+
+    inv_t, _, presente_t = cubo.por_tienda()
+    por_tienda = demanda.reshape(len(cubo.tiendas), len(cubo.unidades))
+    sin_pronostico = np.isnan(por_tienda).all(axis=1)
+    demanda_t = np.where(sin_pronostico, np.nan, np.nansum(por_tienda, axis=1))
+    tienda = _proyectar(inv_t[:, p], demanda_t, presente_t[:, p])
+
+    return {"tienda": tienda, "tienda_unidad": unidad}
+
+@telemetry.cronometrar()
+async def get_pronostico(
+    year: int,
+    month: int,
+    k: int = 20,
+    por_unidad: bool = False,
+    metodo: str = "combinado",
+    solo_criticos: bool = False
+) -> PronosticoResponse:
+    """
+    Tiendas (o tienda × unidad) que se quedarían sin inventario más pronto
+
+    Args:
+        year, month: Periodo base (último mes con datos a considerar)
+        k: Cuántas posiciones regresar
+        por_unidad: Si True, nivel tienda × unidad
+        metodo: ses, estacional o combinado
+        solo_criticos: Solo las que caerían en CRÍTICO durante el mes pronosticado
+    """
+    cubo = await cubo_service.obtener_cubo()
+    llave = (cubo.version, year, month, metodo)
+    resultado = _cache.get(llave)
+    if resultado is None:
+        with telemetry.span("calcular_pronostico"):
+            resultado = calcular_pronostico(cubo, year, month, metodo)
+        _cache[llave] = resultado
+
+    nivel = "tienda_unidad" if por_unidad else "tienda"
+    datos = resultado[nivel]
+    candidatos = datos["presente"] & np.isfinite(datos["dias_desabasto"])
+    if solo_criticos:
+        candidatos = candidatos & datos["critico_proximo_mes"]
+    elegidos = top_k(-datos["dias_desabasto"], k, candidatos)
+
+    pronosticos = []
+    for posicion, i in enumerate(elegidos, start=1):
+        if por_unidad:
+            t, u = divmod(int(i), len(cubo.unidades))
+            tienda, unidad = cubo.tiendas[t], cubo.unidades[u]
+        else:
+            tienda, unidad = cubo.tiendas[i], None
+        pronosticos.append(PronosticoTienda(
+            posicion=posicion,
+            tienda=tienda,
+            unidad=unidad,
+            inventario=int(datos["inventario"][i]),
+            ventas_pronostico=round(float(datos["demanda"][i]), 1),
+            cobertura_proyectada=dias_api(datos["dias_desabasto"][i]),
+            dias_hasta_critico=dias_api(datos["dias_critico"][i]),
+            status_proyectado=STATUS_ETIQUETAS[datos["status"][i]],
+            critico_proximo_mes=bool(datos["critico_proximo_mes"][i])
+        ))
+
+    anio_obj, mes_obj = _siguiente_mes(year, month)
+    return PronosticoResponse(
+        periodo_base=f"{MES_MAP_INV.get(month, f'Mes {month}')} {year}",
+        periodo_pronostico=f"{MES_MAP_INV.get(mes_obj, f'Mes {mes_obj}')} {anio_obj}",
+        metodo=metodo,
+        nivel=nivel,
+        benchmark_min_dias=BENCHMARK_MIN_DIAS,
+        total_criticos_proximo_mes=int(np.count_nonzero(datos["critico_proximo_mes"])),
+        pronosticos=pronosticos
+    )
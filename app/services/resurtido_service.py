@@ -0,0 +1,94 @@
+"""
+Servicio de prioridad de resurtido
+Calcula el top-k de tiendas (o tienda × unidad) más urgentes de resurtir
+sobre el cubo en memoria, sin ordenar la cadena completa
+"""
+
+import math
+from typing import Optional
+import numpy as np
+from app.config import MES_MAP_INV
+from app.models.dashboard import PrioridadResurtido, ResurtidoResponse
+from app.services.cubo_service import obtener_cubo
+from app.utils import telemetry
+from app.utils.metrics_engine import calcular_kpis, dias_api, score_resurtido, top_k, STATUS_ETIQUETAS
+import logging
+
+logger = logging.getLogger(__name__)
+
+TODAS_LAS_UNIDADES = "*"
+
+@telemetry.cronometrar()
+async def get_prioridad_resurtido(
+    year: int,
+    month: int,
+    k: int,
+    unidad: Optional[str] = None
+) -> ResurtidoResponse:
+    """
+    Top-k de prioridad de resurtido de un periodo
+
+    Args:
+        year: Año
+        month: Mes
+        k: Cuántas posiciones regresar
+        unidad: None = nivel tienda; "*" = tienda × unidad (todas);
+                nombre = tienda × unidad solo de esa unidad
+    """
+    cubo = await obtener_cubo()
+    p = cubo.indice_periodo(year, month)
+    if p is None:
+        raise ValueError(f"No hay datos para {month}/{year}")
+
+    if unidad is None:
+        inv_t, vta_t, presente_t = cubo.por_tienda()
+        inv = inv_t[:, p]
+        vta = vta_t[:, p]
+        candidatos = presente_t[:, p] & (vta > 0)
+        nivel = "tienda"
+    else:
+        if unidad == TODAS_LAS_UNIDADES:
+            columnas = slice(None)
+        else:
+            u = cubo.indice_unidad(unidad)
+            if u is None:
+                raise ValueError(f"La unidad de negocio '{unidad}' no existe")
+            columnas = slice(u, u + 1)
+        # Aplanado tienda-mayor: índice = tienda * n_unidades + unidad
+        inv = cubo.inv[:, columnas, p].ravel()
+        vta = cubo.vta[:, columnas, p].ravel()
+        candidatos = vta > 0
+        nivel = "tienda_unidad"
+
+    scores = score_resurtido(inv, vta)
+    elegidos = top_k(scores, k, candidatos)
+    kpis = calcular_kpis(inv[elegidos], vta[elegidos])
+
+    unidades_nivel = cubo.unidades if unidad in (None, TODAS_LAS_UNIDADES) else [unidad]
+    prioridades = []
+    for posicion, (i, cobertura, status) in enumerate(zip(elegidos, kpis.cobertura, kpis.status), start=1):
+        if nivel == "tienda":
+            tienda, nombre_unidad = cubo.tiendas[i], None
+        else:
+            t, u = divmod(int(i), len(unidades_nivel))
+            tienda, nombre_unidad = cubo.tiendas[t], unidades_nivel[u]
+        score = float(scores[i])
+        prioridades.append(PrioridadResurtido(
+            posicion=posicion,
+            tienda=tienda,
+            unidad=nombre_unidad,
+            inventario=int(inv[i]),
+            ventas=int(vta[i]),
+            cobertura=dias_api(cobertura),
+            status=STATUS_ETIQUETAS[status],
+            score=round(score, 2) if math.isfinite(score) else None
+        ))
+
+    mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
+    return ResurtidoResponse(
+        periodo=f"{mes_nombre} {year}",
+        nivel=nivel,
+        k=k,
+        total_candidatos=int(np.count_nonzero(candidatos)),
+        prioridades=prioridades
+    )
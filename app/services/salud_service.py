@@ -0,0 +1,194 @@
+"""
+Servicio de salud de la cadena
+Mantiene por periodo los conteos de tiendas por status, la banda "excelente"
+y la salud general. Cuando el cubo se recarga solo por algunos periodos
+(detección de cambios), solo se calculan los KPIs de esos periodos y se
+ajustan los conteos de sus celdas tienda × periodo que cambiaron; así cada
+lectura es O(1) y una recarga parcial no recorre el cubo completo
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config import MES_MAP_INV, EXCELENTE_MIN_DIAS, EXCELENTE_MAX_DIAS
+from app.models.dashboard import SaludResponse
+from app.services import cubo_service
+from app.utils import telemetry
+from app.utils.metrics import clasificar_salud
+from app.utils.metrics_engine import (
+    CuboInventario,
+    calcular_kpis,
+    STATUS_ETIQUETAS,
+    STATUS_CRITICO,
+    STATUS_OPTIMO,
+    STATUS_SOBREINVENTARIO,
+    STATUS_SIN_VENTAS
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+SIN_FILA = -1  # La tienda no tiene datos en el periodo
+_COL_EXCELENTE = len(STATUS_ETIQUETAS)  # Columna de conteos para la banda excelente
+
+class AgregadorSalud:
+    """
+    Conteos de salud por periodo
+
+    Guarda el status de cada tienda × periodo de la última carga; al recibir
+    un cubo nuevo compara contra él y solo ajusta los conteos de las celdas
+    que cambiaron. Si el cubo es una recarga parcial del último aplicado,
+    solo se clasifican los periodos releídos
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tiendas: List[str] = []
+        self._periodos: List[Tuple[int, int]] = []
+        self._indice_periodo: Dict[Tuple[int, int], int] = {}
+        self._status = np.full((0, 0), SIN_FILA, dtype=np.int8)
+        self._excelente = np.zeros((0, 0), dtype=bool)
+        # Una fila por periodo: un conteo por código de status + excelentes
+        self._conteos = np.zeros((0, _COL_EXCELENTE + 1), dtype=np.int64)
+        self.version = 0
+
+    def aplicar_cubo(self, cubo: CuboInventario) -> None:
+        """Actualizar los conteos con un cubo nuevo"""
+        columnas = None
+        if cubo.recargados is not None and self.version and cubo.base_version == self.version:
+            columnas = sorted(
+                i for i in (cubo.indice_periodo(*p) for p in cubo.recargados) if i is not None
+            )
+        inv_t, vta_t, presente = cubo.por_tienda() if columnas is None else cubo.por_tienda_en(columnas)
+        kpis = calcular_kpis(inv_t, vta_t)
+        status = np.where(presente, kpis.status, SIN_FILA).astype(np.int8)
+        excelente = (
+            presente
+            & (status == STATUS_OPTIMO)
+            & (kpis.cobertura >= EXCELENTE_MIN_DIAS)
+            & (kpis.cobertura <= EXCELENTE_MAX_DIAS)
+        )
+        self.actualizar(cubo.tiendas, cubo.periodos, status, excelente, cubo.version, columnas)
+
+    def actualizar(
+        self,
+        tiendas: List[str],
+        periodos: List[Tuple[int, int]],
+        status: np.ndarray,
+        excelente: np.ndarray,
+        version: int,
+        columnas: Optional[List[int]] = None
+    ) -> int:
+        """
+        Aplicar el status (tienda × periodo) más reciente
+
+        Args:
+            columnas: Si se indican, `status` y `excelente` traen solo esos
+                periodos; los demás conservan lo que ya se tenía
+
+        Returns:
+            Número de celdas que cambiaron
+        """
+        with self._lock:
+            viejo_status, viejo_excelente, conteos = self._alinear(tiendas, periodos)
+            if columnas is not None:
+                status_parcial, excelente_parcial = status, excelente
+                status, excelente = viejo_status.copy(), viejo_excelente.copy()
+                status[:, columnas] = status_parcial
+                excelente[:, columnas] = excelente_parcial
+
+            cambiados = (status != viejo_status) | (excelente != viejo_excelente)
+            t, p = np.nonzero(cambiados)
+            if t.size:
+                anterior = viejo_status[t, p]
+                nuevo = status[t, p]
+                con_fila = anterior != SIN_FILA
+                np.add.at(conteos, (p[con_fila], anterior[con_fila]), -1)
+                con_fila = nuevo != SIN_FILA
+                np.add.at(conteos, (p[con_fila], nuevo[con_fila]), 1)
+                np.add.at(
+                    conteos[:, _COL_EXCELENTE], p,
+                    excelente[t, p].astype(np.int64) - viejo_excelente[t, p]
+                )
+
+            self._tiendas = list(tiendas)
+            self._periodos = list(periodos)
+            self._indice_periodo = {periodo: i for i, periodo in enumerate(self._periodos)}
+            self._status = status.copy()
+            self._excelente = excelente.copy()
+            self._conteos = conteos
+            self.version = version
+
+        logger.info(f"Salud actualizada a v{version}: {t.size} celdas tienda × periodo cambiaron")
+        return int(t.size)
+
+    def _alinear(self, tiendas: List[str], periodos: List[Tuple[int, int]]):
+        """Estado anterior reacomodado a los ejes nuevos (tiendas/periodos nuevos sin fila)"""
+        if tiendas == self._tiendas and periodos == self._periodos:
+            return self._status, self._excelente, self._conteos.copy()
+
+        forma = (len(tiendas), len(periodos))
+        status = np.full(forma, SIN_FILA, dtype=np.int8)
+        excelente = np.zeros(forma, dtype=bool)
+        conteos = np.zeros((len(periodos), _COL_EXCELENTE + 1), dtype=np.int64)
+
+        indice_tienda = {t: i for i, t in enumerate(self._tiendas)}
+        pares_t = [(i, indice_tienda[t]) for i, t in enumerate(tiendas) if t in indice_tienda]
+        pares_p = [(i, self._indice_periodo[p]) for i, p in enumerate(periodos) if p in self._indice_periodo]
+        if pares_p:
+            nuevos_p, viejos_p = (np.array(x) for x in zip(*pares_p))
+            if pares_t:
+                nuevos_t, viejos_t = (np.array(x) for x in zip(*pares_t))
+                status[np.ix_(nuevos_t, nuevos_p)] = self._status[np.ix_(viejos_t, viejos_p)]
+                excelente[np.ix_(nuevos_t, nuevos_p)] = self._excelente[np.ix_(viejos_t, viejos_p)]
+            # Los conteos se recalculan de las tiendas que siguen existiendo
+            for codigo in range(len(STATUS_ETIQUETAS)):
+                conteos[:, codigo] = (status == codigo).sum(axis=0)
+            conteos[:, _COL_EXCELENTE] = excelente.sum(axis=0)
+        return status, excelente, conteos
+
+    def leer(self, anio: int, mes: int) -> Optional[np.ndarray]:
+        """Conteos del periodo (copia) o None si no hay datos"""
+        with self._lock:
+            p = self._indice_periodo.get((anio, mes))
+            return None if p is None else self._conteos[p].copy()
+
+agregador = AgregadorSalud()
+cubo_service.suscribir(agregador.aplicar_cubo)
+
+@telemetry.cronometrar()
+async def get_salud(year: int, month: int) -> SaludResponse:
+    """
+    Salud de la cadena en un periodo, leída de los conteos mantenidos
+
+    Args:
+        year: Año
+        month: Mes
+    """
+    cubo = await cubo_service.obtener_cubo()
+    if agregador.version != cubo.version:
+        agregador.aplicar_cubo(cubo)
+
+    conteos = agregador.leer(year, month)
+    if conteos is None:
+        raise ValueError(f"No hay datos para {month}/{year}")
+
+    total = int(conteos[:_COL_EXCELENTE].sum())
+    optimas = int(conteos[STATUS_OPTIMO])
+    pct_saludables = (optimas / total) * 100 if total else 0.0
+    salud, score = clasificar_salud(pct_saludables) if total else ("SIN DATOS", 0)
+
+    mes_nombre = MES_MAP_INV.get(month, f"Mes {month}")
+    return SaludResponse(
+        periodo=f"{mes_nombre} {year}",
+        salud_general=salud,
+        score=score,
+        tiendas_saludables_pct=round(pct_saludables, 1),
+        total_tiendas=total,
+        tiendas_criticas=int(conteos[STATUS_CRITICO]),
+        tiendas_optimas=optimas,
+        tiendas_excelentes=int(conteos[_COL_EXCELENTE]),
+        tiendas_alerta=int(conteos[STATUS_SOBREINVENTARIO] + conteos[STATUS_SIN_VENTAS]),
+        por_status={etiqueta: int(conteos[codigo]) for codigo, etiqueta in enumerate(STATUS_ETIQUETAS)},
+        version=agregador.version
+    )
@@ -0,0 +1,209 @@
+"""
+Servicio de variaciones
+Calcula variaciones mes a mes (MoM) y año contra año (YoY) de inventario,
+ventas y cobertura para toda la cadena en una sola pasada sobre el cubo
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+import numpy as np
+from app.config import MES_MAP_INV
+from app.models.dashboard import (
+    DeltaMetrica,
+    VariacionTienda,
+    VariacionesResponse,
+    Movimiento,
+    MovimientosResponse
+)
+from app.services.cubo_service import obtener_cubo
+from app.utils import telemetry
+from app.utils.metrics_engine import CuboInventario, cobertura_dias, variacion_porcentual, top_k
+import logging
+
+logger = logging.getLogger(__name__)
+
+METRICAS = ("inventario", "ventas", "cobertura")
+COMPARACIONES = ("mom", "yoy")
+DIRECCIONES = ("abs", "sube", "baja")
+
+def _nombre_periodo(anio: int, mes: int) -> str:
+    return f"{MES_MAP_INV.get(mes, f'Mes {mes}')} {anio}"
+
+def _periodo_anterior(anio: int, mes: int, comparacion: str) -> Tuple[int, int]:
+    if comparacion == "yoy":
+        return anio - 1, mes
+    return (anio - 1, 12) if mes == 1 else (anio, mes - 1)
+
+def _series(cubo: CuboInventario, por_unidad: bool):
+    """
+    Series (filas × periodo) de inventario, ventas, cobertura y presencia
+
+    Nivel tienda usa los agregados de por_tienda(); nivel tienda × unidad
+    aplana tienda-mayor (fila = tienda * n_unidades + unidad)
+    """
+    if por_unidad:
+        filas = len(cubo.tiendas) * len(cubo.unidades)
+        inv = cubo.inv.reshape(filas, -1)
+        vta = cubo.vta.reshape(filas, -1)
+        presente = (cubo.presente | (cubo.vta > 0)).reshape(filas, -1)
+    else:
+        inv, vta, presente = cubo.por_tienda()
+    return {
+        "inventario": inv,
+        "ventas": vta,
+        "cobertura": cobertura_dias(inv, vta)
+    }, presente
+
+def _comparar(
+    series: Dict[str, np.ndarray],
+    presente: np.ndarray,
+    p: int,
+    q: Optional[int]
+) -> Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    (actual, anterior, delta, delta_pct) por métrica entre las columnas p y q
+
+    Donde no hay periodo de referencia, la fila no estaba presente o algún
+    valor es infinito (cobertura sin ventas), anterior/delta/pct quedan en NaN
+    """
+    resultado = {}
+    for metrica, valores in series.items():
+        actual = valores[:, p]
+        if q is None:
+            anterior = np.full(actual.shape, np.nan)
+        else:
+            anterior = np.where(presente[:, q], valores[:, q], np.nan)
+        anterior = np.where(np.isfinite(anterior), anterior, np.nan)
+        delta = actual - anterior
+        delta[~np.isfinite(delta)] = np.nan
+        resultado[metrica] = (actual, anterior, delta, variacion_porcentual(actual, anterior))
+    return resultado
+
+def _redondear(valor: float) -> Optional[float]:
+    return round(float(valor), 1) if math.isfinite(valor) else None
+
+def _resolver(cubo: CuboInventario, year: int, month: int):
+    p = cubo.indice_periodo(year, month)
+    if p is None:
+        raise ValueError(f"No hay datos para {month}/{year}")
+    referencias = {}
+    for comparacion in COMPARACIONES:
+        periodo = _periodo_anterior(year, month, comparacion)
+        referencias[comparacion] = (periodo, cubo.indice_periodo(*periodo))
+    return p, referencias
+
+def _etiqueta_fila(cubo: CuboInventario, i: int, por_unidad: bool) -> Tuple[str, Optional[str]]:
+    if not por_unidad:
+        return cubo.tiendas[i], None
+    t, u = divmod(int(i), len(cubo.unidades))
+    return cubo.tiendas[t], cubo.unidades[u]
+
+@telemetry.cronometrar()
+async def get_variaciones(year: int, month: int, por_unidad: bool = False) -> VariacionesResponse:
+    """
+    Variaciones MoM y YoY de todas las tiendas (o tienda × unidad) de un periodo
+
+    Args:
+        year: Año
+        month: Mes
+        por_unidad: Si True, una fila por tienda × unidad de negocio
+    """
+    cubo = await obtener_cubo()
+    p, referencias = _resolver(cubo, year, month)
+    series, presente = _series(cubo, por_unidad)
+    comparados = {c: _comparar(series, presente, p, q) for c, (_, q) in referencias.items()}
+
+    variaciones = []
+    for i in np.flatnonzero(presente[:, p]):
+        deltas = {}
+        for metrica in METRICAS:
+            actual = series[metrica][i, p]
+            _, _, d_mom, pct_mom = (a[i] for a in comparados["mom"][metrica])
+            _, _, d_yoy, pct_yoy = (a[i] for a in comparados["yoy"][metrica])
+            deltas[metrica] = DeltaMetrica(
+                # Igual que en el resto de la API, cobertura sin ventas se expone como 0
+                actual=_redondear(actual) or 0,
+                mom=_redondear(d_mom),
+                mom_pct=_redondear(pct_mom),
+                yoy=_redondear(d_yoy),
+                yoy_pct=_redondear(pct_yoy)
+            )
+        tienda, unidad = _etiqueta_fila(cubo, i, por_unidad)
+        variaciones.append(VariacionTienda(tienda=tienda, unidad=unidad, **deltas))
+
+    return VariacionesResponse(
+        periodo=_nombre_periodo(year, month),
+        periodo_mom=_nombre_periodo(*referencias["mom"][0]) if referencias["mom"][1] is not None else None,
+        periodo_yoy=_nombre_periodo(*referencias["yoy"][0]) if referencias["yoy"][1] is not None else None,
+        nivel="tienda_unidad" if por_unidad else "tienda",
+        variaciones=variaciones
+    )
+
+@telemetry.cronometrar()
+async def get_mayores_movimientos(
+    year: int,
+    month: int,
+    metrica: str = "ventas",
+    comparacion: str = "mom",
+    k: int = 10,
+    direccion: str = "abs",
+    por_unidad: bool = False
+) -> MovimientosResponse:
+    """
+    Top-k de mayores variaciones porcentuales de una métrica
+
+    Args:
+        metrica: inventario, ventas o cobertura
+        comparacion: mom (mes anterior) o yoy (mismo mes del año anterior)
+        direccion: abs (mayor cambio en cualquier sentido), sube o baja
+        por_unidad: Si True, rankea tienda × unidad de negocio
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica inválida: {metrica}")
+    if comparacion not in COMPARACIONES:
+        raise ValueError(f"Comparación inválida: {comparacion}")
+    if direccion not in DIRECCIONES:
+        raise ValueError(f"Dirección inválida: {direccion}")
+
+    cubo = await obtener_cubo()
+    p, referencias = _resolver(cubo, year, month)
+    periodo_ref, q = referencias[comparacion]
+    if q is None:
+        raise ValueError(f"No hay datos de {_nombre_periodo(*periodo_ref)} para comparar")
+
+    series, presente = _series(cubo, por_unidad)
+    actual, anterior, delta, pct = _comparar({metrica: series[metrica]}, presente, p, q)[metrica]
+
+    candidatos = presente[:, p] & np.isfinite(pct)
+    if direccion == "abs":
+        orden = np.abs(pct)
+    elif direccion == "sube":
+        orden = pct
+        candidatos &= pct > 0
+    else:
+        orden = -pct
+        candidatos &= pct < 0
+    elegidos = top_k(np.nan_to_num(orden, nan=-np.inf), k, candidatos)
+
+    movimientos = []
+    for posicion, i in enumerate(elegidos, start=1):
+        tienda, unidad = _etiqueta_fila(cubo, i, por_unidad)
+        movimientos.append(Movimiento(
+            posicion=posicion,
+            tienda=tienda,
+            unidad=unidad,
+            actual=round(float(actual[i]), 1),
+            anterior=round(float(anterior[i]), 1),
+            delta=round(float(delta[i]), 1),
+            delta_pct=round(float(pct[i]), 1)
+        ))
+
+    return MovimientosResponse(
+        periodo=_nombre_periodo(year, month),
+        periodo_referencia=_nombre_periodo(*periodo_ref),
+        metrica=metrica,
+        comparacion=comparacion,
+        direccion=direccion,
+        k=k,
+        movimientos=movimientos
+    )
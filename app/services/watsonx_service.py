@@ -1,7 +1,11 @@
 
+import time
+from typing import Any, Dict, Optional, Tuple
 from ibm_watson_machine_learning.foundation_models import Model
 from ibm_watson_machine_learning.metanames import GenTextParamsMetaNames as GenParams
 from app.config import settings
+from app.utils import admission, cancelacion, telemetry
+from app.utils.llm_accounting import LlamadaLLM, contabilidad_llm
 import logging
 
 logger = logging.getLogger(__name__)
@@ -58,10 +62,75 @@ def test_watsonx_connection() -> bool:
     except:
         return False
 
+def _cortar_si_cancelado(token: Optional[cancelacion.TokenCancelacion], chunks) -> None:
+    """Cerrar el stream (y su conexión HTTP) si el request ya se canceló"""
+    if token is not None and token.cancelado:
+        cerrar = getattr(chunks, "close", None)
+        if cerrar is not None:
+            cerrar()
+        token.verificar("llm_generate")
+
+def _invocar_modelo(model, prompt: str) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+    """
+    Ejecutar la generación (llamada bloqueante del SDK)
+    
+    Si el request se cancela antes de empezar no se genera nada; en
+    streaming, la generación se corta en el siguiente fragmento
+    
+    Returns:
+        Tupla (resultado, ttft)
+        - resultado: results[0] de la respuesta o None si es inválida
+        - ttft: segundos al primer token (None si no es streaming)
+    
+    Raises:
+        Cancelado: El request se canceló
+    """
+    token = cancelacion.actual()
+    cancelacion.verificar("llm_generate")
+    
+    if not settings.WATSONX_STREAM:
+        response = model.generate(prompt=prompt)
+        if response and 'results' in response and len(response['results']) > 0:
+            return response['results'][0], None
+        logger.error(f"Respuesta inválida de watsonx.ai: {response}")
+        return None, None
+    
+    inicio = time.perf_counter()
+    ttft = None
+    partes = []
+    resultado: Dict[str, Any] = {}
+    
+    try:
+        chunks = model.generate_text_stream(prompt=prompt, raw_response=True)
+        for chunk in chunks:
+            _cortar_si_cancelado(token, chunks)
+            if ttft is None:
+                ttft = time.perf_counter() - inicio
+            r = chunk['results'][0]
+            partes.append(r.get('generated_text', ''))
+            resultado.update({k: v for k, v in r.items() if k != 'generated_text' and v is not None})
+    except TypeError:
+        # SDK sin raw_response: solo texto, sin conteo de tokens
+        chunks = model.generate_text_stream(prompt=prompt)
+        for texto in chunks:
+            _cortar_si_cancelado(token, chunks)
+            if ttft is None:
+                ttft = time.perf_counter() - inicio
+            partes.append(texto)
+    
+    resultado['generated_text'] = ''.join(partes)
+    return resultado, ttft
+
 async def generate_response(prompt: str) -> str:
     """
     Generar respuesta usando watsonx.ai
     
+    La llamada corre en el pool de la clase de carga chat_llm, limitada a
+    su parte de WATSONX_MAX_CONCURRENCY generaciones simultáneas (con cola
+    acotada), y queda contabilizada por intent (cola, primer token, total,
+    tokens y stop reason), también si falla ("error", "respuesta_invalida")
+    o se cancela ("cancelado")
+    
     Args:
         prompt: Prompt completo con contexto
         
@@ -70,19 +139,47 @@ async def generate_response(prompt: str) -> str:
     """
     try:
         model = get_watsonx_model()
+        intent = telemetry.etiquetas_actuales()["intent"] or "sin_intent"
         
         logger.info("Generando respuesta con watsonx.ai...")
         logger.debug(f"Prompt (primeros 200 chars): {prompt[:200]}...")
         
-        response = model.generate(prompt=prompt)
+        llegada = time.perf_counter()
+        async with admission.CHAT_LLM.admitir():
+            cola = time.perf_counter() - llegada
+            telemetry.registrar_etapa("llm_queue", cola)
+            
+            inicio = time.perf_counter()
+            resultado, ttft, stop_reason = None, None, "error"
+            try:
+                with telemetry.span("llm_generate"):
+                    resultado, ttft = await admission.en_hilo(_invocar_modelo, model, prompt)
+                stop_reason = resultado.get('stop_reason') if resultado is not None else "respuesta_invalida"
+            finally:
+                # Toda llamada cuenta, también las que fallan o se cancelan
+                token = cancelacion.actual()
+                if token is not None and token.cancelado:
+                    stop_reason = "cancelado"
+                contabilidad_llm.registrar(LlamadaLLM(
+                    intent=intent,
+                    model_id=settings.WATSONX_MODEL_ID,
+                    cola_s=cola,
+                    total_s=time.perf_counter() - inicio,
+                    ttft_s=ttft,
+                    tokens_entrada=resultado.get('input_token_count') if resultado else None,
+                    tokens_generados=resultado.get('generated_token_count') if resultado else None,
+                    stop_reason=stop_reason
+                ))
         
-        if response and 'results' in response and len(response['results']) > 0:
-            generated_text = response['results'][0]['generated_text'].strip()
-            logger.info(f"Respuesta generada ({len(generated_text)} chars)")
-            return generated_text
-        else:
-            logger.error(f"Respuesta inválida de watsonx.ai: {response}")
+        if resultado is None:
             raise ValueError("Respuesta inválida del modelo")
+        
+        generated_text = resultado['generated_text'].strip()
+        logger.info(f"Respuesta generada ({len(generated_text)} chars)")
+        return generated_text
+    
+    except admission.CargaRechazada:
+        raise
     
     except Exception as e:
         logger.error(f"Error generando respuesta: {e}")
@@ -104,6 +201,7 @@ async def generate_chat_response(
     Returns:
         Respuesta generada
     """
+    # La etapa construir_prompt la mide quien arma el contexto (chat_service)
     prompt = f"""{system_role}
 
 {context}
@@ -0,0 +1,214 @@
+"""
+Control de admisión por clase de carga
+Cada clase (chat con LLM, datos del chat, dashboard, health) tiene su propio
+límite de concurrencia, cola acotada con plazo y pool de hilos para el
+trabajo bloqueante, así una ráfaga de una clase no degrada a las demás
+"""
+
+import asyncio
+import contextvars
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Optional
+from app.config import settings
+from app.utils import telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+ESPERA_ADMISION = telemetry.histograma(
+    "calzando_admission_wait_seconds",
+    "Tiempo en cola antes de ser admitido",
+    ("clase",)
+)
+
+RECHAZOS = telemetry.contador(
+    "calzando_admission_rejected_total",
+    "Requests rechazados por control de admisión",
+    ("clase", "motivo")
+)
+
+EN_CURSO = telemetry.medidor(
+    "calzando_admission_in_flight",
+    "Requests admitidos en ejecución",
+    ("clase",)
+)
+
+EN_COLA = telemetry.medidor(
+    "calzando_admission_queued",
+    "Requests esperando admisión",
+    ("clase",)
+)
+
+_clase_actual: contextvars.ContextVar[Optional["ClaseCarga"]] = contextvars.ContextVar("clase_carga", default=None)
+
+class CargaRechazada(Exception):
+    """
+    La clase no pudo admitir el request
+
+    status_code es 429 si la cola estaba llena y 503 si venció el plazo
+    de espera; retry_after es la sugerencia en segundos para reintentar
+    """
+
+    def __init__(self, clase: str, status_code: int, retry_after: int, motivo: str):
+        self.clase = clase
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.motivo = motivo
+        super().__init__(f"Carga '{clase}' rechazada: {motivo}")
+
+class ClaseCarga:
+    """
+    Concurrencia acotada con cola y plazo de espera
+
+    Args:
+        nombre: Etiqueta de la clase (métricas y logs)
+        concurrencia: Requests admitidos a la vez
+        max_cola: Requests que pueden esperar; más allá se rechaza con 429
+        timeout_cola: Segundos máximos de espera; al vencer se rechaza con 503
+        hilos: Tamaño del pool para trabajo bloqueante (default: concurrencia)
+    """
+
+    def __init__(self, nombre: str, concurrencia: int, max_cola: int, timeout_cola: float, hilos: Optional[int] = None):
+        self.nombre = nombre
+        self.concurrencia = concurrencia
+        self.max_cola = max_cola
+        self.timeout_cola = timeout_cola
+        self.hilos = hilos or concurrencia
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._esperando = 0
+        self._activos = 0
+        self._servicio_s = 1.0  # Promedio móvil del tiempo de servicio
+
+    def _get_semaforo(self) -> asyncio.Semaphore:
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+        return self._semaforo
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix=f"carga-{self.nombre}")
+        return self._executor
+
+    def retry_after(self) -> int:
+        """Segundos estimados para que se desocupe un lugar"""
+        turnos = (self._esperando + 1) / self.concurrencia
+        return max(1, math.ceil(turnos * self._servicio_s))
+
+    def _rechazar(self, status_code: int, motivo: str) -> CargaRechazada:
+        RECHAZOS.inc(clase=self.nombre, motivo=motivo)
+        return CargaRechazada(self.nombre, status_code, self.retry_after(), motivo)
+
+    @asynccontextmanager
+    async def admitir(self):
+        """
+        Esperar turno en la clase
+
+        Raises:
+            CargaRechazada: Cola llena (429) o plazo de espera vencido (503)
+        """
+        semaforo = self._get_semaforo()
+        if semaforo.locked() and self._esperando >= self.max_cola:
+            raise self._rechazar(429, "cola_llena")
+
+        llegada = time.perf_counter()
+        self._esperando += 1
+        EN_COLA.set(self._esperando, clase=self.nombre)
+        try:
+            await asyncio.wait_for(semaforo.acquire(), timeout=self.timeout_cola)
+        except asyncio.TimeoutError:
+            raise self._rechazar(503, "plazo_vencido")
+        finally:
+            self._esperando -= 1
+            EN_COLA.set(self._esperando, clase=self.nombre)
+
+        espera = time.perf_counter() - llegada
+        ESPERA_ADMISION.observar(espera, clase=self.nombre)
+        telemetry.registrar_etapa(f"admision_{self.nombre}", espera)
+
+        self._activos += 1
+        EN_CURSO.set(self._activos, clase=self.nombre)
+        token = _clase_actual.set(self)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            _clase_actual.reset(token)
+            self._servicio_s = 0.8 * self._servicio_s + 0.2 * (time.perf_counter() - inicio)
+            self._activos -= 1
+            EN_CURSO.set(self._activos, clase=self.nombre)
+            semaforo.release()
+
+    async def ejecutar(self, funcion: Callable[..., Any], *args) -> Any:
+        """Correr una función bloqueante en el pool de la clase (con el contexto del request)"""
+        contexto = contextvars.copy_context()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), contexto.run, funcion, *args)
+
+    def cerrar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+async def en_hilo(funcion: Callable[..., Any], *args) -> Any:
+    """
+    Correr trabajo bloqueante fuera del event loop
+
+    Usa el pool de la clase en la que fue admitido el request; fuera de una
+    clase (tareas de fondo) usa el pool por defecto de asyncio
+    """
+    clase = _clase_actual.get()
+    if clase is None:
+        return await asyncio.to_thread(funcion, *args)
+    return await clase.ejecutar(funcion, *args)
+
+# La concurrencia hacia watsonx es del contenedor: cada worker aplica su parte
+CHAT_LLM = ClaseCarga(
+    "chat_llm",
+    concurrencia=int(settings.por_worker(settings.WATSONX_MAX_CONCURRENCY)),
+    max_cola=settings.ADMISSION_CHAT_LLM_QUEUE,
+    timeout_cola=settings.ADMISSION_CHAT_LLM_TIMEOUT_SECONDS
+)
+
+CHAT_DATOS = ClaseCarga(
+    "chat_datos",
+    concurrencia=settings.ADMISSION_CHAT_DATOS_CONCURRENCY,
+    max_cola=settings.ADMISSION_CHAT_DATOS_QUEUE,
+    timeout_cola=settings.ADMISSION_CHAT_DATOS_TIMEOUT_SECONDS
+)
+
+DASHBOARD = ClaseCarga(
+    "dashboard",
+    concurrencia=settings.ADMISSION_DASHBOARD_CONCURRENCY,
+    max_cola=settings.ADMISSION_DASHBOARD_QUEUE,
+    timeout_cola=settings.ADMISSION_DASHBOARD_TIMEOUT_SECONDS
+)
+
+# Health no se admite por ruta (un probe nunca se rechaza): solo aporta su pool
+# para las pruebas de Db2 y watsonx, que corren en paralelo y se comparten
+# entre los probes simultáneos (ver app/api/health.py)
+HEALTH = ClaseCarga("health", concurrencia=1, max_cola=0, timeout_cola=0.0, hilos=2)
+
+CLASES = (CHAT_LLM, CHAT_DATOS, DASHBOARD, HEALTH)
+
+def clase_para_ruta(path: str) -> Optional[ClaseCarga]:
+    """
+    Clase que admite un request completo según su ruta
+
+    El chat no se admite a nivel HTTP: su fase de datos y su fase de LLM se
+    admiten por separado (CHAT_DATOS y CHAT_LLM). Los streams de larga
+    duración, /metrics y /health no pasan por control de admisión: rechazar
+    un probe haría que el orquestador reinicie una réplica que solo está ocupada
+    """
+    if path.startswith("/api/alertas/stream"):
+        return None
+    if path.startswith("/api/dashboard") or path.startswith("/api/alertas"):
+        return DASHBOARD
+    return None
+
+def cerrar() -> None:
+    for clase in CLASES:
+        clase.cerrar()
@@ -0,0 +1,408 @@
+"""
+Cache en memoria con expiración
+LRU acotado por número de elementos, con TTL por elemento, y cache
+asíncrono stale-while-revalidate para vistas que se recargan en segundo plano.
+Ambos pueden tener detrás el nivel compartido entre réplicas
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Tuple, TypeVar
+from app.utils import cancelacion, telemetry
+from app.utils.cache_compartido import NivelCompartido
+import logging
+
+logger = logging.getLogger(__name__)
+
+V = TypeVar("V")
+
+CACHE_CONSULTAS = telemetry.contador(
+    "calzando_cache_requests_total",
+    "Consultas a caches en memoria",
+    ("cache", "resultado")
+)
+
+RECARGAS = telemetry.contador(
+    "calzando_cache_refresh_total",
+    "Cargas de caches stale-while-revalidate por origen",
+    ("cache", "origen", "resultado")
+)
+
+# Origen de una carga: un request sin valor, un valor vencido que se sirvió
+# viejo, una llave caliente por expirar, una vista precalentada o una llave
+# cuyos datos cambiaron en la fuente
+ORIGEN_SOLICITUD = "solicitud"
+ORIGEN_VENCIDO = "vencido"
+ORIGEN_ANTICIPADO = "anticipado"
+ORIGEN_PRECALENTADO = "precalentado"
+ORIGEN_CAMBIO = "cambio"
+
+Cargador = Callable[[], Awaitable[Any]]
+
+class CacheTTL(Generic[V]):
+    """
+    LRU con TTL, seguro entre hilos
+
+    Args:
+        nombre: Etiqueta para métricas
+        max_elementos: Al excederse se desaloja el menos usado
+        ttl: Segundos de vida de cada elemento
+    """
+
+    def __init__(self, nombre: str, max_elementos: int, ttl: float):
+        self.nombre = nombre
+        self.max_elementos = max_elementos
+        self.ttl = ttl
+        self._datos: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, llave: Hashable) -> Optional[V]:
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada is not None and entrada[1] < time.monotonic():
+                del self._datos[llave]
+                entrada = None
+            if entrada is None:
+                CACHE_CONSULTAS.inc(cache=self.nombre, resultado="miss")
+                return None
+            self._datos.move_to_end(llave)
+        CACHE_CONSULTAS.inc(cache=self.nombre, resultado="hit")
+        return entrada[0]
+
+    def guardar(self, llave: Hashable, valor: V, ttl: Optional[float] = None) -> None:
+        expira = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._datos[llave] = (valor, expira)
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self.max_elementos:
+                self._datos.popitem(last=False)
+
+    def invalidar(self, llave: Optional[Hashable] = None) -> None:
+        """Borrar una llave o, sin argumento, todo el cache"""
+        with self._lock:
+            if llave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(llave, None)
+
+    def __len__(self) -> int:
+        return len(self._datos)
+
+class CacheNiveles(Generic[V]):
+    """
+    LRU con TTL en memoria y, opcionalmente, el nivel compartido detrás
+
+    Lo que no está en memoria se busca en el nivel compartido y se trae con
+    el TTL que le queda; lo que se guarda va a los dos
+
+    Args:
+        nombre: Etiqueta para métricas y llaves del nivel compartido
+        max_elementos: Al excederse se desaloja el menos usado (en memoria)
+        ttl: Segundos de vida de cada elemento
+        compartido: Nivel compartido (None = solo memoria)
+    """
+
+    def __init__(self, nombre: str, max_elementos: int, ttl: float, compartido: Optional[NivelCompartido] = None):
+        self.nombre = nombre
+        self.ttl = ttl
+        self.compartido = compartido
+        self.local: CacheTTL[V] = CacheTTL(nombre, max_elementos, ttl)
+
+    async def obtener(self, llave: Hashable) -> Optional[V]:
+        valor = self.local.obtener(llave)
+        if valor is not None or self.compartido is None:
+            return valor
+        encontrado = await self.compartido.obtener(self.nombre, llave)
+        if encontrado is None:
+            return None
+        valor, cargado_en = encontrado
+        resto = self.ttl - (time.time() - cargado_en)
+        if resto <= 0:
+            return None
+        self.local.guardar(llave, valor, ttl=resto)
+        return valor
+
+    def guardar(self, llave: Hashable, valor: V) -> None:
+        self.local.guardar(llave, valor)
+        if self.compartido is not None:
+            self.compartido.guardar_en_segundo_plano(self.nombre, llave, valor, self.ttl)
+
+    def invalidar(self, llave: Optional[Hashable] = None) -> None:
+        """Borrar una llave o todo el cache en memoria (el compartido expira solo)"""
+        self.local.invalidar(llave)
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+class _EntradaSWR:
+    __slots__ = ("valor", "fresco_hasta", "vence", "cargar", "usos", "cargado_en")
+
+    def __init__(self, valor: Any, fresco_hasta: float, vence: float, cargar: Cargador, usos: float, cargado_en: float):
+        self.valor = valor
+        self.fresco_hasta = fresco_hasta
+        self.vence = vence
+        self.cargar = cargar
+        self.usos = usos
+        self.cargado_en = cargado_en  # Epoch: comparable con lo que cargaron otras réplicas
+
+class CacheSWR(Generic[V]):
+    """
+    Cache asíncrono stale-while-revalidate con recarga anticipada
+
+    Un valor es fresco durante `ttl`; después, y hasta `max_stale` segundos
+    más, se responde de inmediato con él mientras se recarga en segundo
+    plano. Solo un pedido sin ningún valor espera la carga, y los pedidos de
+    la misma llave comparten una sola. Cada `intervalo` se recargan antes de
+    expirar las `top` llaves más pedidas (los usos se reducen a la mitad en
+    cada ciclo) y las vistas registradas con `precalentar`. Las recargas en
+    segundo plano corren de a `concurrencia` a la vez
+
+    Con nivel compartido, antes de cargar se busca ahí la llave: sin valor
+    en memoria se toma lo que haya (aunque esté vencido), y una recarga se
+    ahorra si otra réplica ya la hizo. Lo que se carga se publica ahí
+
+    Args:
+        nombre: Etiqueta para métricas
+        max_elementos: Al excederse se desaloja el menos usado
+        ttl: Segundos que un valor es fresco (0 = sin cache)
+        max_stale: Segundos extra en que un valor vencido aún se sirve
+        concurrencia: Recargas en segundo plano simultáneas
+        top: Llaves más pedidas que se recargan antes de expirar
+        intervalo: Segundos entre ciclos de recarga anticipada
+        compartido: Nivel compartido (None = solo memoria)
+        version: Versión de los datos de una llave, que se agrega a su llave
+            en el nivel compartido para no tomar valores de antes de un
+            cambio; None = esa llave no usa el nivel compartido
+    """
+
+    def __init__(
+        self,
+        nombre: str,
+        max_elementos: int,
+        ttl: float,
+        max_stale: float,
+        concurrencia: int,
+        top: int,
+        intervalo: float,
+        compartido: Optional[NivelCompartido] = None,
+        version: Optional[Callable[[Hashable], Optional[str]]] = None
+    ):
+        self.nombre = nombre
+        self.max_elementos = max_elementos
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.concurrencia = max(1, concurrencia)
+        self.top = top
+        self.intervalo = intervalo
+        self.compartido = compartido
+        self.version = version
+        self._datos: "OrderedDict[Hashable, _EntradaSWR]" = OrderedDict()
+        self._en_curso: Dict[Hashable, asyncio.Task] = {}
+        self._precalentar: List[Callable[[], Iterable[Tuple[Hashable, Cargador]]]] = []
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._tarea: Optional[asyncio.Task] = None
+
+    async def obtener(self, llave: Hashable, cargar: Cargador) -> V:
+        """
+        Valor de la llave; `cargar` lo produce si no hay uno servible
+
+        Raises:
+            Exception: Lo que lance `cargar` cuando no hay valor que servir
+        """
+        if self.ttl <= 0:
+            return await cargar()
+
+        ahora = time.monotonic()
+        entrada = self._datos.get(llave)
+        if entrada is not None and entrada.vence < ahora:
+            del self._datos[llave]
+            entrada = None
+        if entrada is None:
+            CACHE_CONSULTAS.inc(cache=self.nombre, resultado="miss")
+            # shield: si este request se cancela, los demás siguen esperando la carga
+            return await asyncio.shield(self._recargar(llave, cargar, ORIGEN_SOLICITUD))
+
+        entrada.usos += 1
+        entrada.cargar = cargar
+        self._datos.move_to_end(llave)
+        if entrada.fresco_hasta < ahora:
+            CACHE_CONSULTAS.inc(cache=self.nombre, resultado="stale")
+            self._recargar(llave, cargar, ORIGEN_VENCIDO)
+        else:
+            CACHE_CONSULTAS.inc(cache=self.nombre, resultado="hit")
+        return entrada.valor
+
+    def precalentar(self, vistas: Callable[[], Iterable[Tuple[Hashable, Cargador]]]) -> None:
+        """Registrar vistas (llave, cargar) que se mantienen frescas aunque nadie las haya pedido"""
+        self._precalentar.append(vistas)
+
+    def invalidar(self, llave: Optional[Hashable] = None) -> None:
+        """Borrar una llave o, sin argumento, todo el cache"""
+        if llave is None:
+            self._datos.clear()
+        else:
+            self._datos.pop(llave, None)
+
+    def caducar(self, predicado: Callable[[Hashable], bool]) -> int:
+        """
+        Descartar las llaves cuyos datos cambiaron en la fuente
+
+        No se sirven viejas: las que se venían pidiendo se recargan de
+        inmediato y quien las pida espera esa carga. Una carga que ya estaba
+        en curso no guarda su resultado
+
+        Returns:
+            Llaves descartadas
+        """
+        for llave in [l for l in self._en_curso if predicado(l)]:
+            del self._en_curso[llave]
+        llaves = [l for l in self._datos if predicado(l)]
+        for llave in llaves:
+            entrada = self._datos.pop(llave)
+            if entrada.usos >= 1:
+                self._recargar(llave, entrada.cargar, ORIGEN_CAMBIO)
+        return len(llaves)
+
+    def iniciar(self) -> None:
+        if self.ttl <= 0 or self.intervalo <= 0 or self._tarea is not None:
+            return
+        self._tarea = asyncio.get_running_loop().create_task(self._ciclo())
+
+    async def detener(self) -> None:
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        for tarea in list(self._en_curso.values()):
+            tarea.cancel()
+
+    def _recargar(self, llave: Hashable, cargar: Cargador, origen: str) -> asyncio.Task:
+        tarea = self._en_curso.get(llave)
+        if tarea is None:
+            # La carga es de todos los que esperan la llave: no la detiene la cancelación de uno
+            with cancelacion.desacoplado():
+                tarea = asyncio.ensure_future(self._cargar(llave, cargar, origen))
+            self._en_curso[llave] = tarea
+            tarea.add_done_callback(lambda t: self._terminar(llave, t, origen))
+        return tarea
+
+    def _llave_compartida(self, llave: Hashable) -> Optional[Hashable]:
+        if self.compartido is None:
+            return None
+        if self.version is None:
+            return llave
+        # Se lee antes de cargar: lo cargado es al menos de esa versión
+        version = self.version(llave)
+        return (llave, version) if version is not None else None
+
+    async def _leer_compartido(self, llave: Hashable, llave_compartida: Hashable) -> Optional[Tuple[Any, float]]:
+        encontrado = await self.compartido.obtener(self.nombre, llave_compartida)
+        if encontrado is None:
+            return None
+        edad = time.time() - encontrado[1]
+        if edad >= self.ttl + self.max_stale:
+            return None
+        local = self._datos.get(llave)
+        if local is None:
+            return encontrado
+        # Recarga de un valor que ya se tiene: sirve si otra réplica lo recargó después
+        if edad < self.ttl and encontrado[1] > local.cargado_en:
+            return encontrado
+        return None
+
+    async def _cargar(self, llave: Hashable, cargar: Cargador, origen: str) -> V:
+        llave_compartida = self._llave_compartida(llave)
+        encontrado = None
+        try:
+            if llave_compartida is not None:
+                encontrado = await self._leer_compartido(llave, llave_compartida)
+            if encontrado is not None:
+                valor, cargado_en = encontrado
+            else:
+                if origen == ORIGEN_SOLICITUD:
+                    valor = await cargar()
+                else:
+                    if self._semaforo is None:
+                        self._semaforo = asyncio.Semaphore(self.concurrencia)
+                    async with self._semaforo:
+                        valor = await cargar()
+                cargado_en = time.time()
+        except Exception:
+            RECARGAS.inc(cache=self.nombre, origen=origen, resultado="error")
+            raise
+
+        if self._en_curso.get(llave) is not asyncio.current_task():
+            # Se caducó mientras cargaba: el valor puede ser de antes del cambio
+            RECARGAS.inc(cache=self.nombre, origen=origen, resultado="descartada")
+            return valor
+
+        if encontrado is None and llave_compartida is not None:
+            self.compartido.guardar_en_segundo_plano(
+                self.nombre, llave_compartida, valor, self.ttl + self.max_stale, cargado_en
+            )
+
+        # Lo tomado del nivel compartido ya gastó parte de su vida
+        edad = max(0.0, time.time() - cargado_en)
+        ahora = time.monotonic()
+        anterior = self._datos.get(llave)
+        self._datos[llave] = _EntradaSWR(
+            valor,
+            fresco_hasta=ahora + self.ttl - edad,
+            vence=ahora + self.ttl + self.max_stale - edad,
+            cargar=cargar,
+            usos=anterior.usos if anterior is not None else float(origen in (ORIGEN_SOLICITUD, ORIGEN_CAMBIO)),
+            cargado_en=cargado_en
+        )
+        self._datos.move_to_end(llave)
+        while len(self._datos) > self.max_elementos:
+            self._datos.popitem(last=False)
+        RECARGAS.inc(cache=self.nombre, origen=origen, resultado="compartido" if encontrado is not None else "ok")
+        return valor
+
+    def _terminar(self, llave: Hashable, tarea: asyncio.Task, origen: str) -> None:
+        if self._en_curso.get(llave) is tarea:
+            del self._en_curso[llave]
+        if tarea.cancelled():
+            return
+        # Recuperar la excepción evita "exception was never retrieved" si nadie esperaba
+        error = tarea.exception()
+        if error is not None and origen != ORIGEN_SOLICITUD:
+            logger.warning(f"Cache {self.nombre}: no se pudo recargar {llave!r} ({origen}): {error}")
+
+    async def _ciclo(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                self._revisar()
+            except Exception as e:
+                logger.error(f"Error en la recarga anticipada del cache {self.nombre}: {str(e)}", exc_info=True)
+
+    def _revisar(self) -> None:
+        """Recargar lo que dejaría de estar fresco antes del ciclo siguiente"""
+        limite = time.monotonic() + 2 * self.intervalo
+
+        for vistas in self._precalentar:
+            for llave, cargar in vistas():
+                entrada = self._datos.get(llave)
+                if entrada is None or entrada.fresco_hasta <= limite:
+                    self._recargar(llave, cargar, ORIGEN_PRECALENTADO)
+
+        calientes = sorted(
+            ((llave, e) for llave, e in self._datos.items() if e.usos >= 1),
+            key=lambda par: par[1].usos,
+            reverse=True
+        )[:self.top]
+        for llave, entrada in calientes:
+            if entrada.fresco_hasta <= limite:
+                self._recargar(llave, entrada.cargar, ORIGEN_ANTICIPADO)
+
+        for entrada in self._datos.values():
+            entrada.usos /= 2
+
+    def __len__(self) -> int:
+        return len(self._datos)
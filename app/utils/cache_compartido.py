@@ -0,0 +1,165 @@
+"""
+Nivel compartido de los caches
+Un servidor con protocolo Redis que leen y escriben todas las réplicas: lo
+que calcula una lo aprovechan las demás, y sobrevive a reinicios y a
+escalar. Los valores van con la codificación binaria de `codificacion`.
+Es opcional (CACHE_COMPARTIDO_URL) y nunca detiene un request: si el
+servidor falla, los caches siguen solo en memoria un rato antes de
+volver a intentarlo
+"""
+
+import asyncio
+import struct
+import time
+from typing import Any, Hashable, Optional, Set, Tuple
+from app.config import settings
+from app.utils import cancelacion, codificacion, telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+OPERACIONES = telemetry.contador(
+    "calzando_cache_compartido_total",
+    "Operaciones contra el nivel compartido de los caches",
+    ("cache", "operacion", "resultado")
+)
+
+TAMANO = telemetry.histograma(
+    "calzando_cache_compartido_bytes",
+    "Tamaño codificado de los valores guardados en el nivel compartido",
+    ("cache",),
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144)
+)
+
+# Antes del valor codificado: cuándo se cargó (epoch), para que cada réplica
+# calcule cuánto le queda fresco
+_ENCABEZADO = struct.Struct("<d")
+
+def _texto(llave: Hashable) -> str:
+    if isinstance(llave, tuple):
+        return ":".join(_texto(parte) for parte in llave)
+    return str(llave)
+
+class NivelCompartido:
+    """
+    Cliente del nivel compartido (requiere el paquete `redis`)
+
+    Args:
+        url: Servidor con protocolo Redis (redis://host:puerto/db)
+        prefijo: Antepuesto a todas las llaves
+        timeout: Segundos máximos por operación
+        pausa: Segundos sin usar el servidor después de un error
+    """
+
+    def __init__(self, url: str, prefijo: str, timeout: float, pausa: float):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("CACHE_COMPARTIDO_URL requiere el paquete 'redis'") from e
+        self.prefijo = prefijo
+        self.pausa = pausa
+        self._cliente = redis_asyncio.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self._pausado_hasta = 0.0
+        self._escrituras: Set[asyncio.Task] = set()
+
+    def clave(self, cache: str, llave: Hashable) -> str:
+        # La versión de la app y el esquema de los modelos separan lo que otra
+        # versión guardó con un formato distinto
+        return f"{self.prefijo}{settings.APP_VERSION}:{codificacion.esquema()}:{cache}:{_texto(llave)}"
+
+    def _disponible(self, cache: str, operacion: str) -> bool:
+        if time.monotonic() < self._pausado_hasta:
+            OPERACIONES.inc(cache=cache, operacion=operacion, resultado="pausa")
+            return False
+        return True
+
+    def _fallo(self, cache: str, operacion: str, error: Exception) -> None:
+        OPERACIONES.inc(cache=cache, operacion=operacion, resultado="error")
+        if time.monotonic() >= self._pausado_hasta:
+            logger.warning(f"Cache compartido no disponible, solo memoria por {self.pausa:.0f}s: {str(error)}")
+        self._pausado_hasta = time.monotonic() + self.pausa
+
+    async def obtener(self, cache: str, llave: Hashable) -> Optional[Tuple[Any, float]]:
+        """
+        Returns:
+            Tupla (valor, cargado_en epoch) o None si no está o no se pudo leer
+        """
+        if not self._disponible(cache, "get"):
+            return None
+        try:
+            datos = await self._cliente.get(self.clave(cache, llave))
+        except Exception as e:
+            self._fallo(cache, "get", e)
+            return None
+        if datos is None:
+            OPERACIONES.inc(cache=cache, operacion="get", resultado="miss")
+            return None
+        try:
+            cargado_en, = _ENCABEZADO.unpack_from(datos)
+            valor = codificacion.decodificar(datos[_ENCABEZADO.size:])
+        except (struct.error, codificacion.ErrorCodificacion) as e:
+            OPERACIONES.inc(cache=cache, operacion="get", resultado="invalido")
+            logger.warning(f"Cache compartido {cache}: valor ilegible en {llave!r}: {str(e)}")
+            return None
+        OPERACIONES.inc(cache=cache, operacion="get", resultado="hit")
+        return valor, cargado_en
+
+    async def guardar(
+        self,
+        cache: str,
+        llave: Hashable,
+        valor: Any,
+        ttl: float,
+        cargado_en: Optional[float] = None
+    ) -> None:
+        """Guardar `valor`; el servidor lo borra a los `ttl` segundos"""
+        if ttl <= 0 or not self._disponible(cache, "set"):
+            return
+        try:
+            datos = _ENCABEZADO.pack(time.time() if cargado_en is None else cargado_en) + codificacion.codificar(valor)
+        except codificacion.ErrorCodificacion as e:
+            OPERACIONES.inc(cache=cache, operacion="set", resultado="invalido")
+            logger.warning(f"Cache compartido {cache}: no se puede codificar {llave!r}: {str(e)}")
+            return
+        try:
+            await self._cliente.set(self.clave(cache, llave), datos, px=max(1, int(ttl * 1000)))
+        except Exception as e:
+            self._fallo(cache, "set", e)
+            return
+        TAMANO.observar(len(datos), cache=cache)
+        OPERACIONES.inc(cache=cache, operacion="set", resultado="ok")
+
+    def guardar_en_segundo_plano(self, *args, **kwargs) -> None:
+        """`guardar` sin que el request espere al servidor"""
+        if time.monotonic() < self._pausado_hasta:
+            return
+        # La escritura no depende del request que la originó
+        with cancelacion.desacoplado():
+            tarea = asyncio.ensure_future(self.guardar(*args, **kwargs))
+        self._escrituras.add(tarea)
+        tarea.add_done_callback(self._escrituras.discard)
+
+    async def cerrar(self) -> None:
+        if self._escrituras:
+            await asyncio.wait(list(self._escrituras), timeout=1.0)
+        try:
+            await self._cliente.aclose()
+        except Exception as e:
+            logger.warning(f"Error cerrando el cache compartido: {str(e)}")
+
+def _crear_nivel() -> Optional[NivelCompartido]:
+    if not settings.CACHE_COMPARTIDO_URL:
+        return None
+    return NivelCompartido(
+        settings.CACHE_COMPARTIDO_URL,
+        prefijo=settings.CACHE_COMPARTIDO_PREFIJO,
+        timeout=settings.CACHE_COMPARTIDO_TIMEOUT_MS / 1000,
+        pausa=settings.CACHE_COMPARTIDO_PAUSA_SECONDS
+    )
+
+nivel = _crear_nivel()
+
+async def cerrar() -> None:
+    """Terminar las escrituras pendientes y cerrar las conexiones"""
+    if nivel is not None:
+        await nivel.cerrar()
@@ -0,0 +1,265 @@
+"""
+Plazos y cancelación de requests
+Cada request supervisado corre en su propia tarea con un token de
+cancelación. Si el cliente se desconecta o vence el plazo del endpoint, la
+tarea se cancela y el token se marca; el trabajo bloqueante que corre en
+hilos (sentencias SQL, generación del LLM) lo revisa para soltar la
+conexión y el hilo en cuanto puede, en lugar de terminar para nadie
+"""
+
+import asyncio
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.utils import telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+REQUESTS_CANCELADOS = telemetry.contador(
+    "calzando_request_cancelled_total",
+    "Requests cancelados antes de terminar",
+    ("endpoint", "motivo")
+)
+
+TRABAJO_CANCELADO = telemetry.contador(
+    "calzando_work_cancelled_total",
+    "Trabajo en hilos detenido por la cancelación de su request",
+    ("etapa",)
+)
+
+MOTIVO_DESCONEXION = "desconexion"
+MOTIVO_PLAZO = "plazo"
+
+class Cancelado(Exception):
+    """El request dueño del trabajo se canceló (desconexión del cliente o plazo vencido)"""
+
+    def __init__(self, motivo: str, etapa: str):
+        self.motivo = motivo
+        self.etapa = etapa
+        super().__init__(f"Trabajo cancelado en {etapa}: {motivo}")
+
+class TokenCancelacion:
+    """
+    Señal compartida entre el request y sus hilos de trabajo
+
+    Args:
+        plazo: Segundos que tiene el request (None = sin plazo)
+    """
+
+    def __init__(self, plazo: Optional[float]):
+        loop = asyncio.get_running_loop()
+        self.plazo = plazo
+        self.limite = loop.time() + plazo if plazo else None
+        self.motivo: Optional[str] = None
+        self._loop = loop
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+        self._al_cancelar: List[Callable[[], None]] = []
+
+    @property
+    def cancelado(self) -> bool:
+        return self._evento.is_set()
+
+    def cancelar(self, motivo: str) -> None:
+        with self._lock:
+            if self._evento.is_set():
+                return
+            self.motivo = motivo
+            self._evento.set()
+            callbacks = list(self._al_cancelar)
+            # Con el lock tomado: quien se desregistra espera a que terminen
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.warning(f"Error en callback de cancelación: {e}")
+
+    def al_cancelar(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Registrar una acción a ejecutar al cancelarse (ej. interrumpir una sentencia)
+
+        Returns:
+            Función para desregistrarla
+        """
+        with self._lock:
+            if self._evento.is_set():
+                callback()
+            else:
+                self._al_cancelar.append(callback)
+
+        def quitar():
+            with self._lock:
+                if callback in self._al_cancelar:
+                    self._al_cancelar.remove(callback)
+        return quitar
+
+    def restante(self) -> Optional[float]:
+        """Segundos que le quedan al plazo (None = sin plazo)"""
+        if self.limite is None:
+            return None
+        return max(0.0, self.limite - self._loop.time())
+
+    def verificar(self, etapa: str) -> None:
+        """
+        Raises:
+            Cancelado: El request ya se canceló
+        """
+        if self._evento.is_set():
+            TRABAJO_CANCELADO.inc(etapa=etapa)
+            raise Cancelado(self.motivo, etapa)
+
+_token: ContextVar[Optional[TokenCancelacion]] = ContextVar("token_cancelacion", default=None)
+
+def actual() -> Optional[TokenCancelacion]:
+    """Token del request en curso (None fuera de un request supervisado)"""
+    return _token.get()
+
+def verificar(etapa: str) -> None:
+    """Punto de cancelación: lanza Cancelado si el request en curso ya se canceló"""
+    token = _token.get()
+    if token is not None:
+        token.verificar(etapa)
+
+def restante() -> Optional[float]:
+    """Segundos de plazo que le quedan al request en curso (None = sin plazo)"""
+    token = _token.get()
+    return token.restante() if token is not None else None
+
+@contextmanager
+def desacoplado():
+    """
+    Trabajo cuyo resultado espera más de un request (ej. un lote de
+    consultas): no lo detiene la cancelación del request que lo disparó
+    """
+    reset = _token.set(None)
+    try:
+        yield
+    finally:
+        _token.reset(reset)
+
+def _excepciones_plazo() -> List[Tuple[str, float]]:
+    """PLAZOS_ENDPOINT ("ruta=segundos,...") ordenado del prefijo más largo al más corto"""
+    plazos = []
+    for entrada in settings.PLAZOS_ENDPOINT.split(","):
+        ruta, _, segundos = entrada.partition("=")
+        if ruta.strip() and segundos.strip():
+            plazos.append((ruta.strip(), float(segundos)))
+    return sorted(plazos, key=lambda p: len(p[0]), reverse=True)
+
+_PLAZOS = _excepciones_plazo()
+
+def supervisar_ruta(path: str) -> bool:
+    """Los streams de larga duración no se supervisan; tampoco docs ni /metrics"""
+    if path.startswith("/api/alertas/stream"):
+        return False
+    return path.startswith("/api/") or path.startswith("/health")
+
+def plazo_para_ruta(path: str) -> Optional[float]:
+    """Plazo en segundos del endpoint (None = solo se detecta la desconexión)"""
+    for prefijo, segundos in _PLAZOS:
+        if path.startswith(prefijo):
+            return segundos or None
+    if path.startswith("/api/chat"):
+        plazo = settings.PLAZO_CHAT_SECONDS
+    elif path.startswith("/health"):
+        plazo = settings.PLAZO_HEALTH_SECONDS
+    else:
+        plazo = settings.PLAZO_DASHBOARD_SECONDS
+    return plazo or None
+
+class MiddlewareCancelacion:
+    """
+    Middleware ASGI que cancela el request si el cliente se va o vence el plazo
+
+    Lee el canal del cliente en paralelo a la aplicación (reenviándole cada
+    mensaje) para enterarse de `http.disconnect` mientras el handler trabaja.
+    Al vencer el plazo responde 504 si aún no se empezó a responder; una
+    respuesta ya iniciada (streaming) sigue hasta terminar
+
+    Args:
+        app: Aplicación ASGI interna
+        endpoint: Nombre del endpoint para las métricas a partir del scope
+    """
+
+    def __init__(self, app, endpoint: Callable[[Dict], str]):
+        self.app = app
+        self.endpoint = endpoint
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not supervisar_ruta(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        plazo = plazo_para_ruta(scope["path"])
+        token = TokenCancelacion(plazo)
+        mensajes: asyncio.Queue = asyncio.Queue()
+        estado = {"iniciada": False, "completa": False}
+
+        async def escuchar():
+            while True:
+                mensaje = await receive()
+                mensajes.put_nowait(mensaje)
+                if mensaje["type"] == "http.disconnect":
+                    return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado["iniciada"] = True
+            elif mensaje["type"] == "http.response.body" and not mensaje.get("more_body", False):
+                estado["completa"] = True
+            await send(mensaje)
+
+        reset = _token.set(token)
+        try:
+            tarea = asyncio.ensure_future(self.app(scope, mensajes.get, enviar))
+        finally:
+            _token.reset(reset)
+        escucha = asyncio.ensure_future(escuchar())
+
+        motivo = None
+        try:
+            while not tarea.done():
+                pendientes = {tarea} if escucha.done() else {tarea, escucha}
+                espera = None if estado["iniciada"] else token.restante()
+                hechas, _ = await asyncio.wait(pendientes, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+                if tarea in hechas:
+                    break
+                if escucha in hechas:
+                    # Después de responder, el servidor también avisa desconexión
+                    if not estado["completa"]:
+                        motivo = MOTIVO_DESCONEXION
+                        break
+                    continue
+                if not hechas and not estado["iniciada"]:
+                    motivo = MOTIVO_PLAZO
+                    break
+
+            if motivo is None:
+                await tarea
+                return
+
+            token.cancelar(motivo)
+            tarea.cancel()
+            try:
+                await tarea
+            except (asyncio.CancelledError, Exception):
+                pass
+            endpoint = self.endpoint(scope)
+            REQUESTS_CANCELADOS.inc(endpoint=endpoint, motivo=motivo)
+            logger.info(f"Request cancelado ({motivo}): {scope['method']} {endpoint}")
+
+            if motivo == MOTIVO_PLAZO and not estado["iniciada"]:
+                respuesta = JSONResponse(
+                    status_code=504,
+                    content={"detail": f"La solicitud excedió su plazo de {plazo:g} s"}
+                )
+                await respuesta(scope, mensajes.get, send)
+        finally:
+            escucha.cancel()
+            if not tarea.done():
+                token.cancelar(MOTIVO_DESCONEXION)
+                tarea.cancel()
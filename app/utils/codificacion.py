@@ -0,0 +1,227 @@
+"""
+Codificación binaria compacta de valores cacheados
+Enteros como varint, flotantes de 8 bytes, textos UTF-8 y modelos pydantic
+registrados por posición de campo (sin nombres). Una lista de modelos del
+mismo tipo se escribe como tabla: el tipo una vez y luego solo los valores.
+Arriba de unos cientos de bytes se comprime con zlib si conviene
+"""
+
+import hashlib
+import struct
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+
+FORMATO = 1
+_COMPRIMIDO = 0x01
+_MIN_COMPRIMIR = 256
+
+_NULO, _FALSO, _VERDADERO, _ENTERO, _FLOTANTE, _TEXTO, _BYTES, _LISTA, _TUPLA, _DICT, _MODELO, _TABLA = range(12)
+
+_FLOAT = struct.Struct("<d")
+
+_modelos: List[Type[BaseModel]] = []
+_indices: Dict[Type[BaseModel], int] = {}
+_campos: List[Tuple[str, ...]] = []
+_esquema = ""
+
+class ErrorCodificacion(ValueError):
+    """El valor no se puede codificar o los bytes no son de este formato"""
+
+def registrar(*modelos: Type[BaseModel]) -> None:
+    """
+    Registrar modelos pydantic que se pueden codificar
+
+    Los campos se guardan por posición: si un modelo cambia, cambia también
+    `esquema()` y lo guardado con la definición anterior deja de leerse
+    """
+    global _esquema
+    for modelo in modelos:
+        if modelo in _indices:
+            continue
+        _indices[modelo] = len(_modelos)
+        _modelos.append(modelo)
+        _campos.append(tuple(modelo.model_fields))
+    digest = hashlib.sha1(str(FORMATO).encode())
+    for modelo, campos in zip(_modelos, _campos):
+        digest.update(f"{modelo.__module__}.{modelo.__qualname__}({','.join(campos)})".encode())
+    _esquema = digest.hexdigest()[:8]
+
+def esquema() -> str:
+    """Huella del formato y de los modelos registrados"""
+    return _esquema
+
+def _varint(salida: bytearray, n: int) -> None:
+    while n > 0x7F:
+        salida.append((n & 0x7F) | 0x80)
+        n >>= 7
+    salida.append(n)
+
+def _escribir(salida: bytearray, valor: Any) -> None:
+    if valor is None:
+        salida.append(_NULO)
+    elif valor is True:
+        salida.append(_VERDADERO)
+    elif valor is False:
+        salida.append(_FALSO)
+    elif isinstance(valor, str):
+        datos = valor.encode("utf-8")
+        salida.append(_TEXTO)
+        _varint(salida, len(datos))
+        salida += datos
+    elif isinstance(valor, int):
+        salida.append(_ENTERO)
+        _varint(salida, valor * 2 if valor >= 0 else -valor * 2 - 1)  # zigzag
+    elif isinstance(valor, float):
+        salida.append(_FLOTANTE)
+        salida += _FLOAT.pack(valor)
+    elif isinstance(valor, BaseModel):
+        indice = _indice(valor)
+        salida.append(_MODELO)
+        _varint(salida, indice)
+        for campo in _campos[indice]:
+            _escribir(salida, getattr(valor, campo))
+    elif isinstance(valor, (list, tuple)):
+        indice = _tabla(valor)
+        if indice is not None:
+            salida.append(_TABLA)
+            _varint(salida, indice)
+            _varint(salida, len(valor))
+            for fila in valor:
+                for campo in _campos[indice]:
+                    _escribir(salida, getattr(fila, campo))
+            return
+        salida.append(_LISTA if isinstance(valor, list) else _TUPLA)
+        _varint(salida, len(valor))
+        for elemento in valor:
+            _escribir(salida, elemento)
+    elif isinstance(valor, dict):
+        salida.append(_DICT)
+        _varint(salida, len(valor))
+        for llave, elemento in valor.items():
+            _escribir(salida, llave)
+            _escribir(salida, elemento)
+    elif isinstance(valor, (bytes, bytearray, memoryview)):
+        datos = bytes(valor)
+        salida.append(_BYTES)
+        _varint(salida, len(datos))
+        salida += datos
+    elif hasattr(valor, "__index__"):
+        # Enteros de NumPy
+        _escribir(salida, valor.__index__())
+    else:
+        raise ErrorCodificacion(f"Tipo no soportado: {type(valor).__name__}")
+
+def _indice(modelo: BaseModel) -> int:
+    indice = _indices.get(type(modelo))
+    if indice is None:
+        raise ErrorCodificacion(f"Modelo no registrado: {type(modelo).__name__}")
+    return indice
+
+def _tabla(valores) -> Optional[int]:
+    """Índice del modelo si es una lista no vacía de un solo modelo"""
+    if not valores or not isinstance(valores, list) or not isinstance(valores[0], BaseModel):
+        return None
+    tipo = type(valores[0])
+    if any(type(v) is not tipo for v in valores):
+        return None
+    return _indice(valores[0])
+
+def codificar(valor: Any) -> bytes:
+    """
+    Raises:
+        ErrorCodificacion: Tipo no soportado o modelo no registrado
+    """
+    cuerpo = bytearray()
+    _escribir(cuerpo, valor)
+    banderas = 0
+    if len(cuerpo) >= _MIN_COMPRIMIR:
+        comprimido = zlib.compress(cuerpo, 1)
+        if len(comprimido) < len(cuerpo):
+            cuerpo, banderas = comprimido, _COMPRIMIDO
+    return bytes((FORMATO, banderas)) + bytes(cuerpo)
+
+class _Lector:
+    __slots__ = ("datos", "pos")
+
+    def __init__(self, datos: bytes):
+        self.datos = datos
+        self.pos = 0
+
+    def byte(self) -> int:
+        b = self.datos[self.pos]
+        self.pos += 1
+        return b
+
+    def varint(self) -> int:
+        n = desplazamiento = 0
+        while True:
+            b = self.byte()
+            n |= (b & 0x7F) << desplazamiento
+            if b < 0x80:
+                return n
+            desplazamiento += 7
+
+    def bytes(self, n: int) -> bytes:
+        fin = self.pos + n
+        if fin > len(self.datos):
+            raise ErrorCodificacion("Datos truncados")
+        datos = self.datos[self.pos:fin]
+        self.pos = fin
+        return datos
+
+    def modelo(self, indice: int) -> BaseModel:
+        if indice >= len(_modelos):
+            raise ErrorCodificacion(f"Modelo {indice} no registrado")
+        # Ya se validó al construirlo antes de codificarlo
+        return _modelos[indice].model_construct(**{campo: self.valor() for campo in _campos[indice]})
+
+    def valor(self) -> Any:
+        tipo = self.byte()
+        if tipo == _NULO:
+            return None
+        if tipo == _VERDADERO:
+            return True
+        if tipo == _FALSO:
+            return False
+        if tipo == _ENTERO:
+            n = self.varint()
+            return n >> 1 if not n & 1 else -((n + 1) >> 1)
+        if tipo == _FLOTANTE:
+            return _FLOAT.unpack(self.bytes(_FLOAT.size))[0]
+        if tipo == _TEXTO:
+            return self.bytes(self.varint()).decode("utf-8")
+        if tipo == _BYTES:
+            return self.bytes(self.varint())
+        if tipo in (_LISTA, _TUPLA):
+            elementos = [self.valor() for _ in range(self.varint())]
+            return elementos if tipo == _LISTA else tuple(elementos)
+        if tipo == _DICT:
+            return {self.valor(): self.valor() for _ in range(self.varint())}
+        if tipo == _MODELO:
+            return self.modelo(self.varint())
+        if tipo == _TABLA:
+            indice = self.varint()
+            return [self.modelo(indice) for _ in range(self.varint())]
+        raise ErrorCodificacion(f"Tipo {tipo} desconocido")
+
+def decodificar(datos: bytes) -> Any:
+    """
+    Raises:
+        ErrorCodificacion: Los bytes no son de este formato o están dañados
+    """
+    if len(datos) < 2 or datos[0] != FORMATO:
+        raise ErrorCodificacion("Formato desconocido")
+    cuerpo = datos[2:]
+    try:
+        if datos[1] & _COMPRIMIDO:
+            cuerpo = zlib.decompress(cuerpo)
+        lector = _Lector(cuerpo)
+        valor = lector.valor()
+    except (IndexError, UnicodeDecodeError, struct.error, zlib.error) as e:
+        raise ErrorCodificacion(f"Datos dañados: {e}") from e
+    if lector.pos != len(cuerpo):
+        raise ErrorCodificacion("Sobran bytes")
+    return valor
+
+registrar()
@@ -5,7 +5,7 @@ Extrae entidades (tienda, año, mes) de los mensajes del usuario
 
 import re
 from typing import Tuple, Optional
-from app.config import MES_MAP
+from app.config import MES_MAP, MES_MAP_INV
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,7 +20,7 @@ def extraer_entidades(texto: str) -> Tuple[Optional[str], Optional[int], Optiona
     Returns:
         Tupla (tienda, año, mes)
         - tienda: "Tienda X" o None
-        - año: 2023-2025 o None
+        - año: 2000-2099 o None (se valida contra el catálogo después)
         - mes: 1-12 o None
     """
     texto_low = texto.lower()
@@ -72,8 +72,8 @@ def extraer_entidades(texto: str) -> Tuple[Optional[str], Optional[int], Optiona
     
     # === EXTRACCIÓN DE AÑO ===
     if not anio:
-        # Buscar años 2023-2025
-        anio_match = re.search(r'(202[3-5])', texto)
+        # Buscar años de cuatro dígitos (20xx)
+        anio_match = re.search(r'\b(20\d{2})\b', texto)
         if anio_match:
             anio = int(anio_match.group(1))
             logger.debug(f"Año detectado: {anio}")
@@ -201,13 +201,20 @@ def normalizar_nombre_tienda(tienda_input: str) -> str:
         return f"Tienda {num}"
     return tienda_input
 
-def validar_periodo(anio: Optional[int], mes: Optional[int]) -> Tuple[bool, str]:
+def validar_periodo(
+    anio: Optional[int],
+    mes: Optional[int],
+    primero: Tuple[int, int],
+    ultimo: Tuple[int, int]
+) -> Tuple[bool, str]:
     """
-    Validar si un periodo es válido según los datos disponibles
+    Validar si un periodo está dentro del rango de datos disponibles
     
     Args:
-        anio: Año (2023-2025)
+        anio: Año
         mes: Mes (1-12)
+        primero: Primer periodo (año, mes) con datos
+        ultimo: Último periodo (año, mes) con datos
         
     Returns:
         Tupla (es_valido, mensaje_error)
@@ -215,16 +222,20 @@ def validar_periodo(anio: Optional[int], mes: Optional[int]) -> Tuple[bool, str]
     if anio is None or mes is None:
         return True, ""  # Si no se especifica, se usarán defaults
     
-    # Validar rango de año
-    if anio < 2023 or anio > 2025:
-        return False, f"El año {anio} está fuera del rango disponible (2023-2025)"
-    
     # Validar rango de mes
     if mes < 1 or mes > 12:
         return False, f"El mes {mes} no es válido (debe estar entre 1 y 12)"
     
-    # Validar que no sea futuro (después de Mayo 2025)
-    if anio == 2025 and mes > 5:
-        return False, f"No hay datos disponibles para {mes}/2025. Los datos llegan hasta Mayo 2025."
+    rango = (
+        f"{MES_MAP_INV[primero[1]]} {primero[0]} a {MES_MAP_INV[ultimo[1]]} {ultimo[0]}"
+    )
+    
+    # Validar rango de año
+    if anio < primero[0] or anio > ultimo[0]:
+        return False, f"El año {anio} está fuera del rango disponible ({primero[0]}-{ultimo[0]})."
+    
+    # Validar que no sea anterior al primero ni posterior al último periodo
+    if (anio, mes) < primero or (anio, mes) > ultimo:
+        return False, f"No hay datos disponibles para {mes}/{anio}. Los datos disponibles van de {rango}."
     
-    return True, ""
\ No newline at end of file
+    return True, ""
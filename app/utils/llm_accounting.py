@@ -0,0 +1,146 @@
+"""
+Contabilidad de llamadas al LLM
+Registra cola, tiempo al primer token, latencia total, tokens y stop reason
+por intent y modelo, y genera el reporte agregado con percentiles
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from app.utils import telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+COLA_LLM = telemetry.histograma(
+    "calzando_llm_queue_seconds",
+    "Espera en cola antes de invocar al modelo",
+    ("intent", "model")
+)
+
+TTFT_LLM = telemetry.histograma(
+    "calzando_llm_time_to_first_token_seconds",
+    "Tiempo al primer token (solo generación en streaming)",
+    ("intent", "model")
+)
+
+DURACION_LLM = telemetry.histograma(
+    "calzando_llm_duration_seconds",
+    "Duración total de la generación",
+    ("intent", "model")
+)
+
+TOKENS_LLM = telemetry.contador(
+    "calzando_llm_tokens_total",
+    "Tokens procesados por el modelo",
+    ("intent", "model", "direction")
+)
+
+STOP_REASON_LLM = telemetry.contador(
+    "calzando_llm_stop_reason_total",
+    "Generaciones por motivo de paro",
+    ("intent", "model", "reason")
+)
+
+@dataclass
+class LlamadaLLM:
+    """Medición de una llamada a watsonx.ai"""
+    intent: str
+    model_id: str
+    cola_s: float
+    total_s: float
+    ttft_s: Optional[float] = None
+    tokens_entrada: Optional[int] = None
+    tokens_generados: Optional[int] = None
+    stop_reason: Optional[str] = None
+
+    @property
+    def tokens_por_segundo(self) -> Optional[float]:
+        if not self.tokens_generados or self.total_s <= 0:
+            return None
+        return self.tokens_generados / self.total_s
+
+class _SerieLLM:
+    """Acumulados y reservorios de un par (intent, modelo)"""
+
+    def __init__(self):
+        self.llamadas = 0
+        self.tokens_entrada = 0
+        self.tokens_generados = 0
+        self.segundos_generando = 0.0
+        self.stop_reasons: Dict[str, int] = {}
+        self.total = telemetry.Reservorio()
+        self.cola = telemetry.Reservorio()
+        self.ttft = telemetry.Reservorio()
+        self.tokens_por_segundo = telemetry.Reservorio()
+
+class ContabilidadLLM:
+    """Registro de llamadas al LLM agrupadas por (intent, modelo)"""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str], _SerieLLM] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, llamada: LlamadaLLM) -> None:
+        etiquetas = {"intent": llamada.intent, "model": llamada.model_id}
+        COLA_LLM.observar(llamada.cola_s, **etiquetas)
+        DURACION_LLM.observar(llamada.total_s, **etiquetas)
+        if llamada.ttft_s is not None:
+            TTFT_LLM.observar(llamada.ttft_s, **etiquetas)
+        if llamada.tokens_entrada is not None:
+            TOKENS_LLM.inc(llamada.tokens_entrada, direction="input", **etiquetas)
+        if llamada.tokens_generados is not None:
+            TOKENS_LLM.inc(llamada.tokens_generados, direction="generated", **etiquetas)
+        STOP_REASON_LLM.inc(reason=llamada.stop_reason or "desconocido", **etiquetas)
+
+        with self._lock:
+            serie = self._series.setdefault((llamada.intent, llamada.model_id), _SerieLLM())
+            serie.llamadas += 1
+            serie.tokens_entrada += llamada.tokens_entrada or 0
+            serie.tokens_generados += llamada.tokens_generados or 0
+            serie.segundos_generando += llamada.total_s
+            motivo = llamada.stop_reason or "desconocido"
+            serie.stop_reasons[motivo] = serie.stop_reasons.get(motivo, 0) + 1
+
+        serie.total.agregar(llamada.total_s)
+        serie.cola.agregar(llamada.cola_s)
+        if llamada.ttft_s is not None:
+            serie.ttft.agregar(llamada.ttft_s)
+        if llamada.tokens_por_segundo is not None:
+            serie.tokens_por_segundo.agregar(llamada.tokens_por_segundo)
+
+        logger.info(
+            f"LLM intent={llamada.intent} cola={llamada.cola_s * 1000:.0f}ms "
+            f"total={llamada.total_s * 1000:.0f}ms tokens={llamada.tokens_entrada}/{llamada.tokens_generados} "
+            f"stop={llamada.stop_reason}"
+        )
+
+    def reporte(self) -> Dict[str, Any]:
+        """Percentiles (ms), tokens y throughput por intent y modelo"""
+        with self._lock:
+            series = list(self._series.items())
+
+        reporte = []
+        for (intent, model_id), serie in series:
+            tps = serie.tokens_por_segundo.valores()
+            reporte.append({
+                "intent": intent,
+                "model_id": model_id,
+                "llamadas": serie.llamadas,
+                "latencia_ms": telemetry.resumen_percentiles(serie.total.valores(), escala=1000),
+                "cola_ms": telemetry.resumen_percentiles(serie.cola.valores(), escala=1000),
+                "ttft_ms": telemetry.resumen_percentiles(serie.ttft.valores(), escala=1000),
+                "tokens_entrada": serie.tokens_entrada,
+                "tokens_generados": serie.tokens_generados,
+                "tokens_entrada_promedio": round(serie.tokens_entrada / serie.llamadas, 1),
+                "tokens_generados_promedio": round(serie.tokens_generados / serie.llamadas, 1),
+                "tokens_por_segundo": telemetry.resumen_percentiles(tps),
+                "tokens_por_segundo_agregado": round(serie.tokens_generados / serie.segundos_generando, 2)
+                if serie.segundos_generando > 0 else None,
+                "stop_reasons": dict(serie.stop_reasons)
+            })
+
+        reporte.sort(key=lambda r: r["llamadas"], reverse=True)
+        return {"series": reporte}
+
+contabilidad_llm = ContabilidadLLM()
@@ -0,0 +1,131 @@
+"""
+Monitor de lag del event loop
+Mide el retraso de planificación del loop y, en modo debug, registra el
+stack del código que lo bloqueó más allá del umbral
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+from app.utils import telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+LAG_LOOP = telemetry.histograma(
+    "calzando_event_loop_lag_seconds",
+    "Retraso de planificación del event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+
+LAG_LOOP_ACTUAL = telemetry.medidor(
+    "calzando_event_loop_lag_last_seconds",
+    "Último retraso de planificación medido"
+)
+
+BLOQUEOS_LOOP = telemetry.contador(
+    "calzando_event_loop_blocked_total",
+    "Veces que el loop estuvo bloqueado más allá del umbral"
+)
+
+# Prefijo de los archivos de la app, para resaltar sus frames en el stack
+_RAIZ_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class MonitorLoop:
+    """
+    Muestreador de lag del event loop
+
+    Una corrutina duerme `intervalo` segundos y mide cuánto tarde despierta.
+    En modo debug un hilo vigía revisa el latido de esa corrutina: si el loop
+    lleva más de `umbral` segundos sin atenderla, captura el stack del hilo
+    del loop, que apunta a la llamada bloqueante
+
+    Args:
+        intervalo: Segundos entre muestras
+        umbral: Lag (segundos) a partir del cual se considera bloqueo
+        debug: Si True, arranca el hilo vigía que registra stacks
+    """
+
+    def __init__(self, intervalo: float, umbral: float, debug: bool = False):
+        self.intervalo = intervalo
+        self.umbral = umbral
+        self.debug = debug
+        self._tarea: Optional[asyncio.Task] = None
+        self._vigia: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self._latido = time.monotonic()
+        self._hilo_loop: Optional[int] = None
+
+    def iniciar(self) -> None:
+        """Arrancar el muestreo en el loop actual"""
+        if self._tarea is not None:
+            return
+        self._hilo_loop = threading.get_ident()
+        self._latido = time.monotonic()
+        self._detener.clear()
+        self._tarea = asyncio.get_running_loop().create_task(self._muestrear())
+
+        if self.debug:
+            self._vigia = threading.Thread(target=self._vigilar, name="loop-monitor", daemon=True)
+            self._vigia.start()
+
+        logger.info(
+            f"Monitor de loop iniciado (intervalo={self.intervalo * 1000:.0f}ms, "
+            f"umbral={self.umbral * 1000:.0f}ms, debug={self.debug})"
+        )
+
+    async def detener(self) -> None:
+        """Detener muestreo y vigía"""
+        self._detener.set()
+        if self._tarea is not None:
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+            self._tarea = None
+        if self._vigia is not None:
+            self._vigia.join(timeout=1)
+            self._vigia = None
+
+    async def _muestrear(self) -> None:
+        while True:
+            esperado = time.monotonic() + self.intervalo
+            await asyncio.sleep(self.intervalo)
+            ahora = time.monotonic()
+            self._latido = ahora
+
+            lag = max(0.0, ahora - esperado)
+            LAG_LOOP.observar(lag)
+            LAG_LOOP_ACTUAL.set(lag)
+            if lag >= self.umbral:
+                BLOQUEOS_LOOP.inc()
+                if not self.debug:
+                    logger.warning(f"Event loop bloqueado {lag * 1000:.0f}ms")
+
+    def _vigilar(self) -> None:
+        """Hilo vigía: registra el stack del loop mientras está bloqueado"""
+        reportado = None
+        while not self._detener.wait(self.umbral / 2):
+            latido = self._latido
+            bloqueado = time.monotonic() - latido - self.intervalo
+            if bloqueado < self.umbral or reportado == latido:
+                continue
+
+            # Un solo reporte por bloqueo (mismo latido)
+            reportado = latido
+            frame = sys._current_frames().get(self._hilo_loop)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            propios = [f for f in stack if f.filename.startswith(_RAIZ_APP)]
+            origen = propios[-1] if propios else stack[-1]
+            logger.warning(
+                f"Event loop bloqueado >{bloqueado * 1000:.0f}ms en "
+                f"{origen.filename}:{origen.lineno} ({origen.name})\n"
+                + "".join(traceback.format_list(stack))
+            )
@@ -3,11 +3,20 @@ Utilidades para cálculo de métricas de negocio
 """
 
 from typing import Dict, List, Tuple
-from app.config import BENCHMARK_MIN_DIAS, BENCHMARK_MAX_DIAS
+from app.config import BENCHMARK_MIN_DIAS, BENCHMARK_MAX_DIAS, EXCELENTE_MIN_DIAS, EXCELENTE_MAX_DIAS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# (porcentaje mínimo de tiendas óptimas, salud, score), de mayor a menor
+NIVELES_SALUD = (
+    (80, "EXCELENTE", 5),
+    (60, "BUENA", 4),
+    (40, "REGULAR", 3),
+    (20, "DEFICIENTE", 2),
+    (0, "CRÍTICA", 1)
+)
+
 def calcular_cobertura_dias(inventario: int, ventas: int, dias_mes: int = 30) -> float:
     """
     Calcular días de cobertura de inventario
@@ -135,13 +144,17 @@ def clasificar_tiendas_por_performance(
             clasificacion["alerta"].append(nombre)
         elif status == "ÓPTIMO":
             # Considerar "excelentes" las que están más cerca del punto medio (59 días)
-            if 40 <= cobertura <= 70:
+            if es_excelente(cobertura):
                 clasificacion["excelentes"].append(nombre)
             else:
                 clasificacion["optimas"].append(nombre)
     
     return clasificacion
 
+def es_excelente(cobertura_dias: float) -> bool:
+    """Una tienda ÓPTIMA es "excelente" si su cobertura cae en la banda EXCELENTE_MIN/MAX_DIAS"""
+    return EXCELENTE_MIN_DIAS <= cobertura_dias <= EXCELENTE_MAX_DIAS
+
 def calcular_variacion_porcentual(valor_actual: float, valor_anterior: float) -> float:
     """
     Calcular variación porcentual entre dos valores
@@ -231,6 +244,21 @@ def calcular_prioridad_resurtido(
     
     return resultado
 
+def clasificar_salud(pct_saludables: float) -> Tuple[str, int]:
+    """
+    Salud general y score (1-5) según el porcentaje de tiendas óptimas
+    
+    Args:
+        pct_saludables: Porcentaje de tiendas con status ÓPTIMO
+        
+    Returns:
+        Tupla (salud, score)
+    """
+    for minimo, salud, score in NIVELES_SALUD:
+        if pct_saludables >= minimo:
+            return salud, score
+    return NIVELES_SALUD[-1][1], NIVELES_SALUD[-1][2]
+
 def calcular_salud_general(tiendas: List[Dict]) -> Dict[str, any]:
     """
     Calcular indicadores de salud general del negocio
@@ -258,21 +286,7 @@ def calcular_salud_general(tiendas: List[Dict]) -> Dict[str, any]:
     pct_saludables = (optimas / total_tiendas) * 100
     
     # Determinar salud general
-    if pct_saludables >= 80:
-        salud = "EXCELENTE"
-        score = 5
-    elif pct_saludables >= 60:
-        salud = "BUENA"
-        score = 4
-    elif pct_saludables >= 40:
-        salud = "REGULAR"
-        score = 3
-    elif pct_saludables >= 20:
-        salud = "DEFICIENTE"
-        score = 2
-    else:
-        salud = "CRÍTICA"
-        score = 1
+    salud, score = clasificar_salud(pct_saludables)
     
     return {
         "salud_general": salud,
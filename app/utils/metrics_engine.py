@@ -0,0 +1,344 @@
+"""
+Motor vectorizado de métricas
+Calcula cobertura, status, riesgo de desabasto, rotación y sell-through sobre
+arreglos NumPy (tienda × unidad × periodo) en una sola pasada, con las mismas
+reglas que app/utils/metrics.py
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import BENCHMARK_MIN_DIAS, BENCHMARK_MAX_DIAS
+
+# Códigos de status (índices de STATUS_ETIQUETAS)
+STATUS_SIN_VENTAS = 0
+STATUS_CRITICO = 1
+STATUS_OPTIMO = 2
+STATUS_SOBREINVENTARIO = 3
+STATUS_ETIQUETAS = ("SIN VENTAS", "CRÍTICO", "ÓPTIMO", "SOBREINVENTARIO")
+
+# Códigos de riesgo de desabasto (índices de RIESGO_ETIQUETAS)
+RIESGO_BAJO = 0
+RIESGO_MEDIO = 1
+RIESGO_ALTO = 2
+RIESGO_ETIQUETAS = ("BAJO", "MEDIO", "ALTO")
+
+UMBRAL_RIESGO_ALTO = 14
+
+def cobertura_dias(inventario, ventas, dias_mes: int = 30) -> np.ndarray:
+    """
+    Días de cobertura: (inventario / ventas) * días del mes
+
+    Donde no hay ventas el resultado es inf (igual que calcular_cobertura_dias)
+    """
+    inv = np.asarray(inventario, dtype=np.float64)
+    vta = np.asarray(ventas, dtype=np.float64)
+    con_ventas = vta != 0
+    cobertura = np.full(np.broadcast(inv, vta).shape, np.inf)
+    np.divide(inv * dias_mes, vta, out=cobertura, where=con_ventas)
+    return cobertura
+
+def status_cobertura(cobertura) -> np.ndarray:
+    """Código de status por elemento (ver STATUS_ETIQUETAS)"""
+    cob = np.asarray(cobertura, dtype=np.float64)
+    status = np.full(cob.shape, STATUS_SOBREINVENTARIO, dtype=np.int8)
+    status[cob <= BENCHMARK_MAX_DIAS] = STATUS_OPTIMO
+    status[cob < BENCHMARK_MIN_DIAS] = STATUS_CRITICO
+    status[np.isinf(cob)] = STATUS_SIN_VENTAS
+    return status
+
+def riesgo_desabasto(cobertura) -> np.ndarray:
+    """Código de riesgo por elemento (ver RIESGO_ETIQUETAS)"""
+    cob = np.asarray(cobertura, dtype=np.float64)
+    riesgo = np.full(cob.shape, RIESGO_BAJO, dtype=np.int8)
+    riesgo[cob < BENCHMARK_MIN_DIAS] = RIESGO_MEDIO
+    riesgo[cob < UMBRAL_RIESGO_ALTO] = RIESGO_ALTO
+    return riesgo
+
+def rotacion_mensual(cobertura) -> np.ndarray:
+    """Rotación mensual aproximada: 30 / cobertura (0 sin ventas o sin inventario)"""
+    cob = np.asarray(cobertura, dtype=np.float64)
+    rotacion = np.zeros(cob.shape)
+    valida = np.isfinite(cob) & (cob > 0)
+    np.divide(30.0, cob, out=rotacion, where=valida)
+    return rotacion
+
+def sell_through(ventas, inventario) -> np.ndarray:
+    """Porcentaje de inventario vendido (0 sin inventario)"""
+    vta = np.asarray(ventas, dtype=np.float64)
+    inv = np.asarray(inventario, dtype=np.float64)
+    resultado = np.zeros(np.broadcast(vta, inv).shape)
+    np.divide(vta * 100, inv, out=resultado, where=inv != 0)
+    return resultado
+
+def score_resurtido(inventario, ventas) -> np.ndarray:
+    """
+    Score de prioridad de resurtido: ventas / cobertura (mayor = más urgente)
+
+    Sin ventas el score es 0 (no hay demanda que cubrir); con ventas y sin
+    inventario es inf (ya está en desabasto)
+    """
+    inv = np.asarray(inventario, dtype=np.float64)
+    vta = np.asarray(ventas, dtype=np.float64)
+    cobertura = cobertura_dias(inv, vta)
+    score = np.zeros(cobertura.shape)
+    con_ventas = np.isfinite(cobertura)
+    np.divide(vta, cobertura, out=score, where=con_ventas & (cobertura > 0))
+    score[con_ventas & (cobertura <= 0)] = np.inf
+    return score
+
+def variacion_porcentual(actual, anterior) -> np.ndarray:
+    """
+    Variación porcentual ((actual - anterior) / anterior) * 100
+
+    A diferencia de calcular_variacion_porcentual, donde no se puede calcular
+    (anterior 0, faltante o valores infinitos) el resultado es NaN y no 0,
+    para no esconder cambios desde cero al rankear
+    """
+    act = np.asarray(actual, dtype=np.float64)
+    ant = np.asarray(anterior, dtype=np.float64)
+    resultado = np.full(np.broadcast(act, ant).shape, np.nan)
+    validos = np.isfinite(act) & np.isfinite(ant) & (ant != 0)
+    np.divide((act - ant) * 100, ant, out=resultado, where=validos)
+    return resultado
+
+def transiciones_status(status: np.ndarray, presente: np.ndarray, consecutivo: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Celdas (fila, periodo) cuyo status cambió respecto al periodo anterior
+
+    Args:
+        status: Códigos (filas, periodos)
+        presente: Máscara (filas, periodos) de celdas con datos
+        consecutivo: Máscara (periodos,) de periodos cuyo anterior en el eje
+                     es el mes inmediato anterior
+
+    Returns:
+        Tupla (filas, periodos) de índices; el periodo anterior es periodo - 1
+    """
+    cambio = (
+        presente[:, 1:] & presente[:, :-1]
+        & (status[:, 1:] != status[:, :-1])
+        & consecutivo[1:]
+    )
+    filas, periodos = np.nonzero(cambio)
+    return filas, periodos + 1
+
+def top_k(valores: np.ndarray, k: int, candidatos: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Índices de los k valores más altos, ordenados de mayor a menor
+
+    Usa selección parcial (argpartition, O(n)) y solo ordena los k elegidos
+
+    Args:
+        valores: Arreglo 1-D
+        k: Cuántos elementos regresar
+        candidatos: Máscara opcional de elementos elegibles
+    """
+    indices = np.arange(valores.size) if candidatos is None else np.flatnonzero(candidatos)
+    if indices.size == 0 or k <= 0:
+        return indices[:0]
+    sub = valores[indices]
+    if k < sub.size:
+        parcial = np.argpartition(-sub, k - 1)[:k]
+    else:
+        parcial = np.arange(sub.size)
+    orden = parcial[np.argsort(-sub[parcial], kind="stable")]
+    return indices[orden]
+
+def etiquetas_status(codigos) -> List[str]:
+    """Convertir códigos de status a sus etiquetas"""
+    return [STATUS_ETIQUETAS[c] for c in np.asarray(codigos).ravel()]
+
+def dias_api(cobertura: float) -> float:
+    """Cobertura como la expone la API: 1 decimal y 0 cuando no hay ventas"""
+    return round(float(cobertura), 1) if math.isfinite(cobertura) else 0
+
+@dataclass
+class KPIs:
+    """KPIs calculados sobre arreglos de la misma forma"""
+    cobertura: np.ndarray
+    status: np.ndarray
+    riesgo: np.ndarray
+    rotacion: np.ndarray
+    sell_through: np.ndarray
+
+    @property
+    def dentro_benchmark(self) -> np.ndarray:
+        return (self.cobertura >= BENCHMARK_MIN_DIAS) & (self.cobertura <= BENCHMARK_MAX_DIAS)
+
+def calcular_kpis(inventario, ventas, dias_mes: int = 30) -> KPIs:
+    """Calcular todos los KPIs en una pasada"""
+    cobertura = cobertura_dias(inventario, ventas, dias_mes)
+    return KPIs(
+        cobertura=cobertura,
+        status=status_cobertura(cobertura),
+        riesgo=riesgo_desabasto(cobertura),
+        rotacion=rotacion_mensual(cobertura),
+        sell_through=sell_through(ventas, inventario)
+    )
+
+@dataclass
+class CuboInventario:
+    """
+    Inventario y ventas de toda la cadena como arreglos densos
+
+    Ejes: tienda × unidad de negocio × periodo (año, mes). `presente` marca
+    las celdas con fila en INVENTARIO; los agregados por tienda solo suman
+    esas celdas, igual que el LEFT JOIN de los dashboards. `huellas` guarda
+    la huella de la fuente con la que se cargó cada periodo
+    """
+    tiendas: List[str]
+    unidades: List[str]
+    periodos: List[Tuple[int, int]]
+    inv: np.ndarray
+    vta: np.ndarray
+    presente: np.ndarray
+    version: int = 0
+    huellas: Dict[Tuple[int, int], tuple] = field(default_factory=dict, repr=False)
+    # Recarga parcial: versión del cubo del que sale y periodos releídos (None = carga completa)
+    base_version: Optional[int] = None
+    recargados: Optional[FrozenSet[Tuple[int, int]]] = field(default=None, repr=False)
+    _indice_tienda: Dict[str, int] = field(default_factory=dict, repr=False)
+    _indice_unidad: Dict[str, int] = field(default_factory=dict, repr=False)
+    _indice_periodo: Dict[Tuple[int, int], int] = field(default_factory=dict, repr=False)
+    _por_tienda: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self._indice_tienda = {t: i for i, t in enumerate(self.tiendas)}
+        self._indice_unidad = {u: i for i, u in enumerate(self.unidades)}
+        self._indice_periodo = {p: i for i, p in enumerate(self.periodos)}
+
+    @classmethod
+    def desde_filas(cls, filas: Iterable[Sequence], version: int = 0) -> "CuboInventario":
+        """
+        Construir el cubo desde filas (tienda, unidad, año, mes, inv, vta, en_inventario)
+        """
+        filas = list(filas)
+        tiendas = sorted({f[0] for f in filas})
+        unidades = sorted({f[1] for f in filas})
+        periodos = sorted({(int(f[2]), int(f[3])) for f in filas})
+
+        it = {t: i for i, t in enumerate(tiendas)}
+        iu = {u: i for i, u in enumerate(unidades)}
+        ip = {p: i for i, p in enumerate(periodos)}
+
+        forma = (len(tiendas), len(unidades), len(periodos))
+        inv = np.zeros(forma)
+        vta = np.zeros(forma)
+        presente = np.zeros(forma, dtype=bool)
+
+        if filas:
+            t_idx = np.fromiter((it[f[0]] for f in filas), dtype=np.int64, count=len(filas))
+            u_idx = np.fromiter((iu[f[1]] for f in filas), dtype=np.int64, count=len(filas))
+            p_idx = np.fromiter((ip[(int(f[2]), int(f[3]))] for f in filas), dtype=np.int64, count=len(filas))
+            inv[t_idx, u_idx, p_idx] = np.fromiter((f[4] or 0 for f in filas), dtype=np.float64, count=len(filas))
+            vta[t_idx, u_idx, p_idx] = np.fromiter((f[5] or 0 for f in filas), dtype=np.float64, count=len(filas))
+            presente[t_idx, u_idx, p_idx] = np.fromiter((bool(f[6]) for f in filas), dtype=bool, count=len(filas))
+
+        return cls(tiendas=tiendas, unidades=unidades, periodos=periodos,
+                   inv=inv, vta=vta, presente=presente, version=version)
+
+    def con_periodos(
+        self,
+        periodos: Iterable[Tuple[int, int]],
+        filas: Iterable[Sequence],
+        huellas: Dict[Tuple[int, int], tuple],
+        version: int
+    ) -> "CuboInventario":
+        """
+        Cubo nuevo con los periodos indicados reemplazados por `filas`
+
+        Los demás periodos se copian tal cual; un periodo sin filas se
+        elimina. Tiendas y unidades que quedan sin datos en ningún periodo
+        salen de los ejes
+
+        Args:
+            periodos: Periodos que se recargaron
+            filas: Filas (tienda, unidad, año, mes, inv, vta, en_inventario) de esos periodos
+            huellas: Huellas de la fuente de esos periodos
+            version: Versión del cubo nuevo
+        """
+        reemplazados = set(periodos)
+        nuevo = CuboInventario.desde_filas(filas)
+        conservados = [i for i, p in enumerate(self.periodos) if p not in reemplazados]
+
+        # Tiendas y unidades con algún dato en los periodos que se conservan
+        viejos = (self.presente | (self.inv != 0) | (self.vta != 0))[:, :, conservados]
+        tiendas = sorted({self.tiendas[i] for i in np.flatnonzero(viejos.any(axis=(1, 2)))} | set(nuevo.tiendas))
+        unidades = sorted({self.unidades[i] for i in np.flatnonzero(viejos.any(axis=(0, 2)))} | set(nuevo.unidades))
+        periodos_finales = sorted({self.periodos[i] for i in conservados} | set(nuevo.periodos))
+
+        it = {t: i for i, t in enumerate(tiendas)}
+        iu = {u: i for i, u in enumerate(unidades)}
+        ip = {p: i for i, p in enumerate(periodos_finales)}
+        forma = (len(tiendas), len(unidades), len(periodos_finales))
+        inv = np.zeros(forma)
+        vta = np.zeros(forma)
+        presente = np.zeros(forma, dtype=bool)
+
+        for origen, indices_periodo in ((self, conservados), (nuevo, range(len(nuevo.periodos)))):
+            indices_periodo = list(indices_periodo)
+            t_origen = [i for i, t in enumerate(origen.tiendas) if t in it]
+            u_origen = [i for i, u in enumerate(origen.unidades) if u in iu]
+            if not (t_origen and u_origen and indices_periodo):
+                continue
+            destino = np.ix_(
+                [it[origen.tiendas[i]] for i in t_origen],
+                [iu[origen.unidades[i]] for i in u_origen],
+                [ip[origen.periodos[i]] for i in indices_periodo]
+            )
+            fuente = np.ix_(t_origen, u_origen, indices_periodo)
+            inv[destino] = origen.inv[fuente]
+            vta[destino] = origen.vta[fuente]
+            presente[destino] = origen.presente[fuente]
+
+        huellas_finales = {p: h for p, h in self.huellas.items() if p not in reemplazados}
+        huellas_finales.update({p: h for p, h in huellas.items() if p in reemplazados})
+        return CuboInventario(
+            tiendas=tiendas, unidades=unidades, periodos=periodos_finales,
+            inv=inv, vta=vta, presente=presente, version=version,
+            huellas=dict(sorted(huellas_finales.items())),
+            base_version=self.version, recargados=frozenset(reemplazados)
+        )
+
+    def indice_tienda(self, tienda: str) -> Optional[int]:
+        return self._indice_tienda.get(tienda)
+
+    def indice_unidad(self, unidad: str) -> Optional[int]:
+        return self._indice_unidad.get(unidad)
+
+    def indice_periodo(self, anio: int, mes: int) -> Optional[int]:
+        return self._indice_periodo.get((anio, mes))
+
+    def por_tienda(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Agregados tienda × periodo (inv, vta, presente), calculados una vez
+        """
+        if self._por_tienda is None:
+            inv_t = np.where(self.presente, self.inv, 0).sum(axis=1)
+            vta_t = np.where(self.presente, self.vta, 0).sum(axis=1)
+            presente_t = self.presente.any(axis=1)
+            self._por_tienda = (inv_t, vta_t, presente_t)
+        return self._por_tienda
+
+    def por_tienda_en(self, indices: Sequence[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Agregados tienda × periodo (inv, vta, presente) solo de los periodos
+        en `indices`, sin calcular los del cubo completo
+        """
+        if self._por_tienda is not None:
+            return tuple(agregado[:, indices] for agregado in self._por_tienda)
+        presente = self.presente[:, :, indices]
+        inv_t = np.where(presente, self.inv[:, :, indices], 0).sum(axis=1)
+        vta_t = np.where(presente, self.vta[:, :, indices], 0).sum(axis=1)
+        return inv_t, vta_t, presente.any(axis=1)
+
+    def kpis_tienda_unidad(self) -> KPIs:
+        """KPIs de cada tienda × unidad × periodo"""
+        return calcular_kpis(self.inv, self.vta)
+
+    def kpis_tienda(self) -> KPIs:
+        """KPIs de cada tienda × periodo"""
+        inv_t, vta_t, _ = self.por_tienda()
+        return calcular_kpis(inv_t, vta_t)
@@ -0,0 +1,111 @@
+"""
+Pronóstico vectorizado de ventas
+Modelos simples y robustos (suavizamiento exponencial y naive estacional)
+aplicados a todas las series (filas × periodo) a la vez con NumPy
+"""
+
+import numpy as np
+from typing import Optional
+from app.config import BENCHMARK_MIN_DIAS
+
+METODOS = ("ses", "estacional", "combinado")
+ALFA_DEFAULT = 0.3
+
+def indice_meses(periodos) -> np.ndarray:
+    """Índice de mes real (año × 12 + mes - 1) de cada periodo (año, mes)"""
+    return np.array([anio * 12 + mes - 1 for anio, mes in periodos], dtype=np.int64)
+
+def suavizamiento_exponencial(
+    valores: np.ndarray,
+    presente: np.ndarray,
+    alfa: float = ALFA_DEFAULT,
+    meses: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Nivel final de suavizamiento exponencial simple de cada fila
+
+    El nivel arranca en la primera observación de cada serie. Los meses sin
+    dato (de la fila o que faltan en el eje) no se saltan: una observación
+    que llega g meses después de la anterior pesa 1 - (1 - alfa) ** g, como
+    si el nivel hubiera envejecido esos g meses; con meses consecutivos es
+    el SES de siempre
+
+    Args:
+        valores: Arreglo (filas, periodos)
+        presente: Máscara (filas, periodos) de periodos con dato
+        alfa: Peso de la observación más reciente
+        meses: Índice de mes real de cada columna (ver `indice_meses`);
+            sin él las columnas se toman como meses consecutivos
+
+    Returns:
+        Nivel por fila (NaN si la serie no tiene datos)
+    """
+    if meses is None:
+        meses = np.arange(valores.shape[1])
+    nivel = np.full(valores.shape[0], np.nan)
+    ultimo = np.zeros(valores.shape[0], dtype=np.int64)
+    for j in range(valores.shape[1]):
+        x = valores[:, j]
+        con_dato = presente[:, j]
+        peso = 1 - (1 - alfa) ** (meses[j] - ultimo)
+        nuevo = np.where(np.isnan(nivel), x, peso * x + (1 - peso) * nivel)
+        nivel = np.where(con_dato, nuevo, nivel)
+        ultimo = np.where(con_dato, meses[j], ultimo)
+    return nivel
+
+def pronosticar(
+    valores: np.ndarray,
+    presente: np.ndarray,
+    estacional: np.ndarray,
+    estacional_presente: np.ndarray,
+    metodo: str = "combinado",
+    alfa: float = ALFA_DEFAULT,
+    meses: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """
+    Pronóstico del siguiente periodo para cada fila
+
+    Args:
+        valores, presente: Historia (filas, periodos) hasta el periodo base
+        estacional, estacional_presente: Valor de cada fila 12 meses antes
+            del periodo pronosticado (naive estacional)
+        metodo: "ses", "estacional" o "combinado" (promedio de ambos donde
+            hay dato estacional, SES donde no)
+        meses: Índice de mes real de cada columna de la historia
+
+    Returns:
+        Pronóstico por fila (NaN si no hay con qué pronosticar)
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de pronóstico inválido: {metodo}")
+
+    if metodo == "estacional":
+        return np.where(estacional_presente, estacional, np.nan)
+
+    nivel = suavizamiento_exponencial(valores, presente, alfa, meses)
+    if metodo == "ses":
+        return nivel
+
+    combinado = np.where(estacional_presente & ~np.isnan(nivel), (nivel + estacional) / 2, nivel)
+    return np.where(np.isnan(combinado) & estacional_presente, estacional, combinado)
+
+def dias_hasta_desabasto(inventario, demanda_mensual, dias_mes: int = 30) -> np.ndarray:
+    """
+    Días hasta agotar el inventario a la demanda pronosticada (sin resurtir)
+
+    inf donde no hay demanda pronosticada
+    """
+    inv = np.asarray(inventario, dtype=np.float64)
+    demanda = np.asarray(demanda_mensual, dtype=np.float64)
+    dias = np.full(np.broadcast(inv, demanda).shape, np.inf)
+    np.divide(inv * dias_mes, demanda, out=dias, where=np.nan_to_num(demanda) > 0)
+    return dias
+
+def dias_hasta_critico(dias_desabasto) -> np.ndarray:
+    """
+    Días hasta que la cobertura cae bajo BENCHMARK_MIN_DIAS
+
+    Con demanda diaria constante la cobertura baja un día por día, así que
+    es la cobertura actual menos el mínimo (0 si ya está en crítico)
+    """
+    return np.maximum(np.asarray(dias_desabasto, dtype=np.float64) - BENCHMARK_MIN_DIAS, 0)
@@ -0,0 +1,231 @@
+"""
+Rate limiting por cliente con cubetas de tokens
+Una cubeta por (cliente, tipo de request): chat con LLM y solo datos, y
+otra más amplia por IP de origen que se cobra siempre. El cliente es la IP
+salvo que presente una identidad firmada por el servidor. El estado vive
+en memoria del proceso o, opcionalmente, en Redis para que todas las
+réplicas compartan el mismo límite
+"""
+
+import hashlib
+import hmac
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from fastapi import Request
+from app.config import settings
+from app.utils import telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+
+DECISIONES = telemetry.contador(
+    "calzando_rate_limit_total",
+    "Decisiones del rate limiter",
+    ("cubeta", "resultado")
+)
+
+CUBETA_LLM = "chat_llm"
+CUBETA_DATOS = "datos"
+
+@dataclass(frozen=True)
+class Cliente:
+    """Llave de la cubeta del cliente e IP de origen (para la cubeta por IP)"""
+    clave: str
+    ip: str
+
+    def __str__(self) -> str:
+        return self.clave
+
+ANONIMO = Cliente(clave="anonimo", ip="anonimo")
+
+@dataclass(frozen=True)
+class Cubeta:
+    """Tasa de recarga (tokens/segundo) y capacidad máxima (ráfaga)"""
+    tasa: float
+    capacidad: float
+
+class LimiteExcedido(Exception):
+    """El cliente agotó su cubeta; retry_after en segundos"""
+
+    def __init__(self, cubeta: str, retry_after: int):
+        self.cubeta = cubeta
+        self.retry_after = retry_after
+        super().__init__(f"Límite de '{cubeta}' excedido")
+
+def _recargar(tokens: float, ultimo: float, ahora: float, cubeta: Cubeta) -> float:
+    return min(cubeta.capacidad, tokens + max(0.0, ahora - ultimo) * cubeta.tasa)
+
+class LimitadorMemoria:
+    """
+    Cubetas en memoria del proceso
+
+    Guarda como máximo `max_claves` clientes; los inactivos más antiguos se
+    desalojan (su cubeta vuelve a empezar llena). Con varios workers cada uno
+    tiene sus cubetas, así que aplica solo su parte de la tasa y de la ráfaga
+    (WEB_CONCURRENCY); un cliente no pasa del límite aunque sus requests se
+    repartan entre todos
+    """
+
+    def __init__(self, max_claves: int = 10000):
+        self.max_claves = max_claves
+        self._estado: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def consumir(self, clave: str, cubeta: Cubeta, costo: float = 1.0) -> Tuple[bool, float]:
+        cubeta = Cubeta(
+            tasa=settings.por_worker(cubeta.tasa, minimo=0.0),
+            capacidad=settings.por_worker(cubeta.capacidad, minimo=costo)
+        )
+        ahora = time.monotonic()
+        tokens, ultimo = self._estado.get(clave, (cubeta.capacidad, ahora))
+        tokens = _recargar(tokens, ultimo, ahora, cubeta)
+
+        if tokens >= costo:
+            tokens -= costo
+            permitido, espera = True, 0.0
+        else:
+            permitido, espera = False, (costo - tokens) / cubeta.tasa
+
+        self._estado[clave] = (tokens, ahora)
+        self._estado.move_to_end(clave)
+        while len(self._estado) > self.max_claves:
+            self._estado.popitem(last=False)
+        return permitido, espera
+
+# Cubeta atómica en Redis: recarga, consume y expira en un solo paso
+_SCRIPT_REDIS = """
+local tasa = tonumber(ARGV[1])
+local capacidad = tonumber(ARGV[2])
+local costo = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local ahora = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local datos = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(datos[1]) or capacidad
+local ts = tonumber(datos[2]) or ahora
+tokens = math.min(capacidad, tokens + math.max(0, ahora - ts) * tasa)
+local permitido = 0
+local espera = 0
+if tokens >= costo then
+    tokens = tokens - costo
+    permitido = 1
+else
+    espera = (costo - tokens) / tasa
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(ahora))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacidad / tasa) + 1)
+return {permitido, tostring(espera)}
+"""
+
+class LimitadorRedis:
+    """
+    Cubetas compartidas en Redis (requiere el paquete `redis`)
+
+    Si Redis no responde, decide con un limitador local para no tumbar la
+    API por una dependencia opcional
+    """
+
+    def __init__(self, url: str, prefijo: str = "calzando:rl:"):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requiere el paquete 'redis'") from e
+        self.prefijo = prefijo
+        self._cliente = redis_asyncio.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        self._script = self._cliente.register_script(_SCRIPT_REDIS)
+        self._respaldo = LimitadorMemoria()
+
+    async def consumir(self, clave: str, cubeta: Cubeta, costo: float = 1.0) -> Tuple[bool, float]:
+        try:
+            permitido, espera = await self._script(
+                keys=[self.prefijo + clave],
+                args=[cubeta.tasa, cubeta.capacidad, costo]
+            )
+            return bool(int(permitido)), float(espera)
+        except Exception as e:
+            logger.warning(f"Rate limit en Redis no disponible, usando memoria local: {str(e)}")
+            return await self._respaldo.consumir(clave, cubeta, costo)
+
+CUBETAS: Dict[str, Cubeta] = {
+    CUBETA_LLM: Cubeta(
+        tasa=settings.RATE_LIMIT_LLM_PER_MINUTE / 60,
+        capacidad=settings.RATE_LIMIT_LLM_BURST
+    ),
+    CUBETA_DATOS: Cubeta(
+        tasa=settings.RATE_LIMIT_DATOS_PER_MINUTE / 60,
+        capacidad=settings.RATE_LIMIT_DATOS_BURST
+    )
+}
+
+# Por IP: la comparten todos los clientes detrás de ella (ej. un bot que firma
+# la identidad de cada usuario, o una oficina detrás de un NAT)
+CUBETAS_IP: Dict[str, Cubeta] = {
+    nombre: Cubeta(
+        tasa=cubeta.tasa * settings.RATE_LIMIT_IP_MULTIPLICADOR,
+        capacidad=cubeta.capacidad * settings.RATE_LIMIT_IP_MULTIPLICADOR
+    )
+    for nombre, cubeta in CUBETAS.items()
+}
+
+def _validar_cubetas() -> None:
+    # Con tasa 0 la cubeta nunca se recarga y el tiempo de espera no existe
+    for nombre, cubeta in {**CUBETAS, **{f"{n} por IP": c for n, c in CUBETAS_IP.items()}}.items():
+        if cubeta.tasa <= 0 or cubeta.capacidad < 1:
+            raise RuntimeError(
+                f"Rate limit '{nombre}' inválido: RATE_LIMIT_*_PER_MINUTE, RATE_LIMIT_*_BURST y "
+                f"RATE_LIMIT_IP_MULTIPLICADOR deben ser mayores que 0 (RATE_LIMIT_ENABLED=false para desactivarlo)"
+            )
+
+def _crear_limitador():
+    if settings.RATE_LIMIT_ENABLED:
+        _validar_cubetas()
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        return LimitadorRedis(settings.RATE_LIMIT_REDIS_URL)
+    if settings.RATE_LIMIT_ENABLED and settings.WEB_CONCURRENCY > 1:
+        logger.info(
+            f"Rate limit en memoria con {settings.WEB_CONCURRENCY} workers: cada uno aplica "
+            f"1/{settings.WEB_CONCURRENCY} del límite (RATE_LIMIT_BACKEND=redis para un límite exacto)"
+        )
+    return LimitadorMemoria()
+
+limitador = _crear_limitador()
+
+async def permitir(cliente: Cliente, cubeta: str) -> Tuple[bool, int]:
+    """
+    Consumir un token de la cubeta por IP y de la del cliente
+
+    Returns:
+        Tupla (permitido, retry_after en segundos)
+    """
+    if not settings.RATE_LIMIT_ENABLED:
+        return True, 0
+    permitido, espera = await limitador.consumir(f"{cubeta}:red:{cliente.ip}", CUBETAS_IP[cubeta])
+    if not permitido:
+        DECISIONES.inc(cubeta=cubeta, resultado="excedido_ip")
+        return False, max(1, math.ceil(espera))
+    permitido, espera = await limitador.consumir(f"{cubeta}:{cliente.clave}", CUBETAS[cubeta])
+    DECISIONES.inc(cubeta=cubeta, resultado="permitido" if permitido else "excedido")
+    return permitido, (0 if permitido else max(1, math.ceil(espera)))
+
+def firmar_cliente(cliente_id: str) -> str:
+    """Firma que acompaña a X-Client-Id (HMAC-SHA256 con RATE_LIMIT_CLIENT_SECRET)"""
+    return hmac.new(settings.RATE_LIMIT_CLIENT_SECRET.encode(), cliente_id.encode(), hashlib.sha256).hexdigest()
+
+def clave_cliente(request: Request) -> Cliente:
+    """
+    Identidad del cliente para el rate limit
+
+    La IP de origen, salvo que el request traiga X-Client-Id con su firma en
+    X-Client-Signature (ej. el bot de Telegram, que conoce el secreto y firma
+    la identidad de cada usuario). Headers y session_id sin firma los elige
+    el cliente, así que no cuentan: cambiarlos no da una cubeta nueva
+    """
+    ip = request.client.host if request.client else "anonimo"
+    cliente_id = request.headers.get("x-client-id")
+    firma = request.headers.get("x-client-signature")
+    if settings.RATE_LIMIT_CLIENT_SECRET and cliente_id and firma:
+        if hmac.compare_digest(firma.lower(), firmar_cliente(cliente_id)):
+            return Cliente(clave=f"id:{cliente_id}", ip=ip)
+        DECISIONES.inc(cubeta="identidad", resultado="firma_invalida")
+    return Cliente(clave=f"ip:{ip}", ip=ip)
@@ -0,0 +1,188 @@
+"""
+Perfilador de sentencias SQL
+Mide prepare/execute/fetch y filas por sentencia, mantiene histogramas por
+statement id y envía las sentencias lentas a un log estructurado. Las que
+fallan o se cancelan se registran igual, con su resultado
+"""
+
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from app.utils import cancelacion, telemetry
+import logging
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("app.sql.slow")
+
+FASES = ("prepare", "execute", "fetch")
+
+DURACION_SQL = telemetry.histograma(
+    "calzando_sql_duration_seconds",
+    "Duración de las sentencias SQL por fase (prepare, execute, fetch, total)",
+    ("statement", "phase")
+)
+
+SENTENCIAS_SQL = telemetry.contador(
+    "calzando_sql_statements_total",
+    "Sentencias ejecutadas por resultado (ok, error, cancelada)",
+    ("statement", "resultado")
+)
+
+FILAS_SQL = telemetry.histograma(
+    "calzando_sql_rows",
+    "Filas leídas por sentencia",
+    ("statement",),
+    buckets=(0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+)
+
+@dataclass
+class PerfilSentencia:
+    """Medición de una ejecución de sentencia"""
+    statement_id: str
+    params: tuple
+    inicio: str = field(default_factory=lambda: datetime.now().isoformat())
+    prepare_ms: float = 0.0
+    execute_ms: float = 0.0
+    fetch_ms: float = 0.0
+    filas: int = 0
+    resultado: str = "ok"  # ok, error o cancelada
+    error: Optional[str] = None
+    sql: Optional[str] = None
+    explain: Optional[List[Dict[str, Any]]] = None
+
+    @property
+    def total_ms(self) -> float:
+        return self.prepare_ms + self.execute_ms + self.fetch_ms
+
+    @contextmanager
+    def fase(self, nombre: str):
+        """Medir una fase (prepare, execute o fetch)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            setattr(self, f"{nombre}_ms", getattr(self, f"{nombre}_ms") + ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        datos = asdict(self)
+        datos["params"] = [str(p) for p in self.params]
+        datos["total_ms"] = round(self.total_ms, 2)
+        for fase in FASES:
+            datos[f"{fase}_ms"] = round(datos[f"{fase}_ms"], 2)
+        return datos
+
+class PerfiladorSQL:
+    """
+    Perfilador de sentencias
+    
+    Args:
+        umbral_lento_ms: Sentencias con total mayor a este umbral van al slow log
+        capturar_explain: Si True, se pide el plan de las sentencias lentas
+        max_lentas: Sentencias lentas recientes que se conservan en memoria
+    """
+
+    def __init__(self, umbral_lento_ms: float, capturar_explain: bool = False, max_lentas: int = 100):
+        self.umbral_lento_ms = umbral_lento_ms
+        self.capturar_explain = capturar_explain
+        self._lentas = deque(maxlen=max_lentas)
+        self._reservorios: Dict[str, telemetry.Reservorio] = {}
+        self._conteos: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(
+        self,
+        statement_id: str,
+        params: tuple,
+        sql: Optional[str] = None,
+        explain: Optional[Callable[[], Optional[List[Dict[str, Any]]]]] = None
+    ):
+        """
+        Medir una ejecución; el bloque usa perfil.fase(...) y fija perfil.filas
+
+        Si el bloque lanza una excepción la ejecución se registra igual, como
+        "cancelada" (request cancelado o hilo interrumpido) o "error" (fallo
+        de la base o timeout de la sentencia), y la excepción sigue su curso
+        
+        Args:
+            statement_id: Identificador estable de la sentencia
+            params: Parámetros de la ejecución
+            sql: Texto de la sentencia (se incluye en el slow log)
+            explain: Callback que obtiene el plan si la sentencia resulta lenta
+        """
+        perfil = PerfilSentencia(statement_id=statement_id, params=tuple(params))
+        try:
+            yield perfil
+        except BaseException as e:
+            token = cancelacion.actual()
+            cancelada = isinstance(e, cancelacion.Cancelado) or (token is not None and token.cancelado)
+            perfil.resultado = "cancelada" if cancelada else "error"
+            perfil.error = f"{type(e).__name__}: {str(e)}"[:500]
+            raise
+        finally:
+            self.registrar(perfil, sql=sql, explain=explain)
+
+    def registrar(
+        self,
+        perfil: PerfilSentencia,
+        sql: Optional[str] = None,
+        explain: Optional[Callable[[], Optional[List[Dict[str, Any]]]]] = None
+    ) -> None:
+        """Registrar una medición en histogramas, resumen y slow log"""
+        sid = perfil.statement_id
+        for fase in FASES:
+            DURACION_SQL.observar(getattr(perfil, f"{fase}_ms") / 1000, statement=sid, phase=fase)
+        DURACION_SQL.observar(perfil.total_ms / 1000, statement=sid, phase="total")
+        FILAS_SQL.observar(perfil.filas, statement=sid)
+        SENTENCIAS_SQL.inc(statement=sid, resultado=perfil.resultado)
+
+        with self._lock:
+            reservorio = self._reservorios.setdefault(sid, telemetry.Reservorio(500))
+            conteo = self._conteos.setdefault(
+                sid, {"ejecuciones": 0, "lentas": 0, "filas": 0, "errores": 0, "canceladas": 0}
+            )
+            conteo["ejecuciones"] += 1
+            conteo["filas"] += perfil.filas
+            if perfil.resultado == "error":
+                conteo["errores"] += 1
+            elif perfil.resultado == "cancelada":
+                conteo["canceladas"] += 1
+        reservorio.agregar(perfil.total_ms)
+
+        if perfil.total_ms < self.umbral_lento_ms:
+            return
+
+        with self._lock:
+            conteo["lentas"] += 1
+        if sql:
+            perfil.sql = " ".join(sql.split())
+        # Una sentencia cancelada tiene su conexión interrumpida: no se pide el plan
+        if self.capturar_explain and explain is not None and perfil.resultado != "cancelada":
+            perfil.explain = explain()
+
+        registro = perfil.to_dict()
+        self._lentas.append(registro)
+        slow_logger.warning(json.dumps({"evento": "slow_query", **registro}, ensure_ascii=False))
+
+    def resumen(self) -> Dict[str, Any]:
+        """Estadísticas por sentencia y sentencias lentas recientes"""
+        with self._lock:
+            conteos = {sid: dict(c) for sid, c in self._conteos.items()}
+            reservorios = dict(self._reservorios)
+        sentencias = {}
+        for sid, conteo in conteos.items():
+            sentencias[sid] = {
+                **conteo,
+                "latencia_ms": telemetry.resumen_percentiles(reservorios[sid].valores())
+            }
+        return {
+            "umbral_lento_ms": self.umbral_lento_ms,
+            "sentencias": sentencias,
+            "lentas_recientes": list(self._lentas)
+        }
@@ -0,0 +1,289 @@
+"""
+Telemetría en proceso
+Histogramas y contadores exportables en formato Prometheus, spans de
+latencia por etapa y desglose por request para el header Server-Timing
+"""
+
+import time
+import math
+import threading
+import functools
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+BUCKETS_DEFAULT = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Tuple[str, ...], extra: str = "") -> str:
+    """Formatear etiquetas como {a="x",b="y"} escapando comillas y saltos"""
+    partes = []
+    for nombre, valor in zip(nombres, valores):
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+class _Metrica:
+    """Base de las métricas: nombre, descripción y etiquetas fijas"""
+    tipo = ""
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.nombre} {self.descripcion}",
+            f"# TYPE {self.nombre} {self.tipo}"
+        ]
+
+class Contador(_Metrica):
+    """Contador monotónico"""
+    tipo = "counter"
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, descripcion, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def render(self) -> List[str]:
+        lineas = super().render()
+        with self._lock:
+            for clave, valor in self._valores.items():
+                lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+class Medidor(_Metrica):
+    """Valor instantáneo (gauge)"""
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, descripcion: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, descripcion, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, valor: float, **etiquetas) -> None:
+        with self._lock:
+            self._valores[self._clave(etiquetas)] = valor
+
+    def render(self) -> List[str]:
+        lineas = super().render()
+        with self._lock:
+            for clave, valor in self._valores.items():
+                lineas.append(f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {valor}")
+        return lineas
+
+class Histograma(_Metrica):
+    """Histograma acumulativo con buckets fijos"""
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nombre: str,
+        descripcion: str,
+        etiquetas: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_DEFAULT
+    ):
+        super().__init__(nombre, descripcion, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [conteos por bucket..., +Inf], suma
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observar(self, valor: float, **etiquetas) -> None:
+        clave = self._clave(etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[clave] = serie
+            conteos, suma = serie
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    conteos[i] += 1
+                    break
+            else:
+                conteos[-1] += 1
+            suma[0] += valor
+
+    def series(self) -> Dict[Tuple[str, ...], Tuple[List[int], float]]:
+        """Copia de los conteos (no acumulados) y la suma de cada serie"""
+        with self._lock:
+            return {clave: (list(conteos), suma[0]) for clave, (conteos, suma) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lineas = super().render()
+        for clave, (conteos, suma) in self.series().items():
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                le = "+Inf" if limite == float("inf") else repr(limite)
+                etiquetas = _formatear_etiquetas(self.etiquetas, clave, f'le="{le}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            lineas.append(f"{self.nombre}_sum{_formatear_etiquetas(self.etiquetas, clave)} {suma}")
+            lineas.append(f"{self.nombre}_count{_formatear_etiquetas(self.etiquetas, clave)} {acumulado}")
+        return lineas
+
+class Registro:
+    """Registro global de métricas (idempotente por nombre)"""
+
+    def __init__(self):
+        self._metricas: Dict[str, _Metrica] = {}
+        self._lock = threading.Lock()
+
+    def obtener_o_crear(self, clase, nombre: str, *args, **kwargs):
+        with self._lock:
+            metrica = self._metricas.get(nombre)
+            if metrica is None:
+                metrica = clase(nombre, *args, **kwargs)
+                self._metricas[nombre] = metrica
+            return metrica
+
+    def render(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.render())
+        return "\n".join(lineas) + "\n"
+
+REGISTRO = Registro()
+
+def contador(nombre: str, descripcion: str, etiquetas: Sequence[str] = ()) -> Contador:
+    return REGISTRO.obtener_o_crear(Contador, nombre, descripcion, etiquetas)
+
+def medidor(nombre: str, descripcion: str, etiquetas: Sequence[str] = ()) -> Medidor:
+    return REGISTRO.obtener_o_crear(Medidor, nombre, descripcion, etiquetas)
+
+def histograma(
+    nombre: str,
+    descripcion: str,
+    etiquetas: Sequence[str] = (),
+    buckets: Sequence[float] = BUCKETS_DEFAULT
+) -> Histograma:
+    return REGISTRO.obtener_o_crear(Histograma, nombre, descripcion, etiquetas, buckets=buckets)
+
+class Reservorio:
+    """Ventana de las últimas N observaciones para calcular percentiles exactos"""
+
+    def __init__(self, tamano: int = 1000):
+        self._valores = deque(maxlen=tamano)
+        self._lock = threading.Lock()
+
+    def agregar(self, valor: float) -> None:
+        with self._lock:
+            self._valores.append(valor)
+
+    def valores(self) -> List[float]:
+        with self._lock:
+            return list(self._valores)
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+def percentil(valores: Sequence[float], p: float) -> Optional[float]:
+    """Percentil p (0-100) por rango más cercano; None si no hay valores"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    rango = max(1, math.ceil(p / 100 * len(ordenados)))
+    return ordenados[rango - 1]
+
+def resumen_percentiles(valores: Sequence[float], escala: float = 1.0) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 de una serie (multiplicados por escala, ej. 1000 para ms)"""
+    resumen = {}
+    for p in (50, 95, 99):
+        valor = percentil(valores, p)
+        resumen[f"p{p}"] = round(valor * escala, 2) if valor is not None else None
+    return resumen
+
+# === SPANS POR REQUEST ===
+
+DURACION_ETAPA = histograma(
+    "calzando_stage_duration_seconds",
+    "Duración de cada etapa del hot path",
+    ("stage", "endpoint", "intent")
+)
+
+# Estado del request en curso: etiquetas (endpoint, intent) y tiempos por etapa.
+# Son objetos mutables para que lo que marca el handler sea visible en el middleware.
+_etiquetas_request: ContextVar[Optional[Dict[str, str]]] = ContextVar("etiquetas_request", default=None)
+_tiempos_request: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("tiempos_request", default=None)
+
+def iniciar_request(endpoint: str) -> List[Tuple[str, float]]:
+    """
+    Preparar el contexto de telemetría de un request
+
+    Returns:
+        Lista donde se acumulan (etapa, segundos) para Server-Timing
+    """
+    tiempos: List[Tuple[str, float]] = []
+    _etiquetas_request.set({"endpoint": endpoint, "intent": ""})
+    _tiempos_request.set(tiempos)
+    return tiempos
+
+def marcar_intent(intent: str) -> None:
+    """Etiquetar las etapas siguientes del request con la intención detectada"""
+    etiquetas = _etiquetas_request.get()
+    if etiquetas is not None:
+        etiquetas["intent"] = intent
+
+def etiquetas_actuales() -> Dict[str, str]:
+    """Endpoint e intent del request en curso ("" fuera de un request)"""
+    etiquetas = _etiquetas_request.get()
+    return dict(etiquetas) if etiquetas else {"endpoint": "", "intent": ""}
+
+def registrar_etapa(etapa: str, duracion: float) -> None:
+    """Registrar la duración de una etapa en el histograma y en Server-Timing"""
+    etiquetas = etiquetas_actuales()
+    DURACION_ETAPA.observar(duracion, stage=etapa, **etiquetas)
+    tiempos = _tiempos_request.get()
+    if tiempos is not None:
+        tiempos.append((etapa, duracion))
+
+@contextmanager
+def span(etapa: str):
+    """Medir el bloque como una etapa del request"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar_etapa(etapa, time.perf_counter() - inicio)
+
+def cronometrar(etapa: Optional[str] = None):
+    """Decorador que mide una función async como etapa (por default, su nombre)"""
+    def decorador(func):
+        nombre = etapa or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(nombre):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+def server_timing(tiempos: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """
+    Construir el valor del header Server-Timing
+
+    Las etapas repetidas (ej. varias queries) se suman en una sola entrada
+    """
+    acumulado: Dict[str, float] = {}
+    for etapa, duracion in tiempos:
+        acumulado[etapa] = acumulado.get(etapa, 0.0) + duracion
+    partes = [f"{etapa};dur={duracion * 1000:.1f}" for etapa, duracion in acumulado.items()]
+    if total is not None:
+        partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
@@ -0,0 +1,84 @@
+"""
+Captura de tráfico
+Registra trazas de requests (endpoint, parámetros, mensaje de chat, tiempos
+y sesión) en un archivo JSONL para reproducirlas después con benchmarks.replay
+"""
+
+import json
+import queue
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Traza del request en curso; el handler puede anotarle datos del cuerpo
+_traza_actual: ContextVar[Optional[Dict[str, Any]]] = ContextVar("traza_actual", default=None)
+
+def anotar(**datos) -> None:
+    """Agregar datos a la traza del request en curso (no-op si no se captura)"""
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza.update({k: v for k, v in datos.items() if v is not None})
+
+class CapturaTrafico:
+    """
+    Escritor de trazas en segundo plano
+
+    Las trazas se encolan desde el loop y un hilo las escribe, para no
+    bloquear el request con I/O de disco
+
+    Args:
+        ruta: Archivo JSONL de salida (se agrega al final)
+        max_pendientes: Trazas en cola antes de descartar
+    """
+
+    def __init__(self, ruta: str, max_pendientes: int = 10000):
+        self.ruta = ruta
+        self._cola: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_pendientes)
+        self._hilo: Optional[threading.Thread] = None
+        self.descartadas = 0
+
+    def iniciar_traza(self, metodo: str, endpoint: str, path: str, query: str, session_id: Optional[str]) -> Dict[str, Any]:
+        """Crear la traza del request y dejarla disponible para anotar()"""
+        traza = {
+            "ts": time.time(),
+            "method": metodo,
+            "endpoint": endpoint,
+            "path": path,
+            "query": query,
+            "session_id": session_id
+        }
+        _traza_actual.set(traza)
+        return traza
+
+    def registrar(self, traza: Dict[str, Any]) -> None:
+        self._asegurar_hilo()
+        try:
+            self._cola.put_nowait(traza)
+        except queue.Full:
+            self.descartadas += 1
+
+    def cerrar(self) -> None:
+        if self._hilo is not None:
+            self._cola.put(None)
+            self._hilo.join(timeout=5)
+            self._hilo = None
+
+    def _asegurar_hilo(self) -> None:
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._escribir, name="traffic-capture", daemon=True)
+            self._hilo.start()
+            logger.info(f"Capturando tráfico en {self.ruta}")
+
+    def _escribir(self) -> None:
+        with open(self.ruta, "a", encoding="utf-8") as f:
+            while True:
+                traza = self._cola.get()
+                if traza is None:
+                    break
+                f.write(json.dumps(traza, ensure_ascii=False) + "\n")
+                if self._cola.empty():
+                    f.flush()
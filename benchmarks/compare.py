@@ -0,0 +1,44 @@
+"""
+Comparar dos corridas de benchmark guardadas en JSON
+
+Uso:
+    python -m benchmarks.compare benchmarks/results/base.json benchmarks/results/nuevo.json
+"""
+
+import argparse
+import json
+from typing import Optional
+
+def _delta(antes: Optional[float], despues: Optional[float]) -> str:
+    if antes in (None, 0) or despues is None:
+        return "   n/a"
+    return f"{(despues - antes) / antes * 100:+6.1f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparar resultados de benchmarks")
+    parser.add_argument("base")
+    parser.add_argument("nuevo")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.nuevo, encoding="utf-8") as f:
+        nuevo = json.load(f)
+
+    print(f"base:  {args.base} ({base.get('commit')})")
+    print(f"nuevo: {args.nuevo} ({nuevo.get('commit')})\n")
+    print(f"{'escenario':<20}{'métrica':<16}{'base':>12}{'nuevo':>12}{'delta':>10}")
+
+    for nombre, r_nuevo in nuevo.get("resultados", {}).items():
+        r_base = base.get("resultados", {}).get(nombre)
+        if r_base is None:
+            print(f"{nombre:<20}(sin referencia en base)")
+            continue
+        filas = [("throughput_rps", r_base.get("throughput_rps"), r_nuevo.get("throughput_rps"))]
+        for p in ("p50", "p95", "p99"):
+            filas.append((f"{p}_ms", r_base["latencia_ms"].get(p), r_nuevo["latencia_ms"].get(p)))
+        for metrica, antes, despues in filas:
+            print(f"{nombre:<20}{metrica:<16}{str(antes):>12}{str(despues):>12}{_delta(antes, despues):>10}")
+
+if __name__ == "__main__":
+    main()
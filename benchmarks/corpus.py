@@ -0,0 +1,63 @@
+"""
+Corpus para micro-benchmarks
+Preguntas reales de gerentes (en español) y listas sintéticas de tiendas
+"""
+
+import random
+from typing import Dict, List
+
+PREGUNTAS = [
+    "¿Cuál es el inventario de diciembre 2023?",
+    "Dame un resumen de todas las tiendas",
+    "¿Cómo está la tienda 5 en mayo 2025?",
+    "dame el inventario de la tienda 12 en marzo",
+    "¿Qué tiendas están en estado crítico este mes?",
+    "¿Cuántas piezas vendió la tienda 3 en 05/2024?",
+    "Muéstrame el ranking de las mejores tiendas de abril 2024",
+    "¿Cuál es la cobertura de la tienda 17?",
+    "¿Qué es la cobertura de inventario?",
+    "¿Cómo puedo reducir el sobreinventario en bodega?",
+    "Explica qué significa sell-through",
+    "¿Por qué tenemos tanta rotación de personal?",
+    "¿Qué me recomiendas hacer con la tienda 8?",
+    "Dame el histórico de ventas de la tienda 2 en 2024",
+    "¿Cuál fue la tendencia de ventas en el mes 11 de 2023?",
+    "¿Hay problemas de desabasto en la tienda 14?",
+    "Compara las ventas de enero contra febrero 2025",
+    "lista de tiendas con alerta de sobreinventario",
+    "¿Cuántos días de cobertura tenemos en la tienda 9 en agosto 2024?",
+    "hola, ¿qué puedes hacer?",
+    "¿Cuál es la diferencia entre rotación y cobertura?",
+    "Necesito el reporte de octubre 2023 de todas las tiendas",
+    "¿Cuáles tiendas tienen mayor venta en noviembre?",
+    "¿Qué sugerencia tienes para el surtido de la tienda 1?",
+    "¿La tienda 6 tiene stock suficiente para julio 2024?",
+    "Visualiza la situación general de la cadena",
+    "¿Qué indicador debo revisar primero?",
+    "Dime el estado de la tienda 11 en septiembre 2023",
+    "¿Cómo ha sido la evolución del inventario este año?",
+    "¿Cuántas tiendas críticas hay en junio 2024?"
+]
+
+STATUS = ["CRÍTICO", "ÓPTIMO", "SOBREINVENTARIO", "SIN VENTAS"]
+
+def generar_tiendas(n: int, semilla: int = 42) -> List[Dict]:
+    """Lista de tiendas como la arma chat_service (dicts con cobertura y status)"""
+    rnd = random.Random(semilla)
+    tiendas = []
+    for i in range(1, n + 1):
+        ventas = rnd.randint(0, 5000)
+        if ventas == 0 or rnd.random() < 0.02:
+            cobertura = float("inf")
+            status = "SIN VENTAS"
+        else:
+            cobertura = round(rnd.lognormvariate(3.9, 0.6), 1)
+            status = "CRÍTICO" if cobertura < 28 else "ÓPTIMO" if cobertura <= 90 else "SOBREINVENTARIO"
+        tiendas.append({
+            "tienda": f"Tienda {i}",
+            "inventario": int(ventas * (cobertura if cobertura != float("inf") else 40) / 30),
+            "ventas": ventas,
+            "cobertura_dias": cobertura,
+            "status": status
+        })
+    return tiendas
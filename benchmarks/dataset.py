@@ -0,0 +1,85 @@
+"""
+Generador del dataset sintético INVENTARIO/VENTAS
+Produce una base SQLite con el mismo esquema que Db2 para las pruebas locales
+"""
+
+import random
+import sqlite3
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+UNIDADES_DEFAULT = ["Dama", "Caballero", "Niños", "Deportivo", "Accesorios"]
+
+@dataclass
+class ConfigDataset:
+    """Tamaño y forma del dataset sintético"""
+    tiendas: int = 17
+    unidades: List[str] = field(default_factory=lambda: UNIDADES_DEFAULT[:3])
+    desde: Tuple[int, int] = (2023, 1)
+    hasta: Tuple[int, int] = (2025, 5)
+    pct_sin_ventas: float = 0.03  # Filas de inventario sin fila en VENTAS
+    pct_sin_inventario: float = 0.01  # Filas de VENTAS sin fila en INVENTARIO
+    semilla: int = 42
+
+def periodos(desde: Tuple[int, int], hasta: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Lista de (año, mes) entre dos periodos inclusive"""
+    anio, mes = desde
+    resultado = []
+    while (anio, mes) <= hasta:
+        resultado.append((anio, mes))
+        mes += 1
+        if mes > 12:
+            anio, mes = anio + 1, 1
+    return resultado
+
+def generar_dataset(ruta: str, config: ConfigDataset) -> int:
+    """
+    Crear la base SQLite con INVENTARIO y VENTAS
+
+    Returns:
+        Número de filas de inventario generadas
+    """
+    rnd = random.Random(config.semilla)
+    conn = sqlite3.connect(ruta)
+    conn.executescript("""
+    DROP TABLE IF EXISTS INVENTARIO;
+    DROP TABLE IF EXISTS VENTAS;
+    CREATE TABLE INVENTARIO (
+        TIENDA TEXT NOT NULL, UNIDAD_NEGOCIO TEXT NOT NULL,
+        ANIO INTEGER NOT NULL, MES INTEGER NOT NULL, INV_PZS INTEGER
+    );
+    CREATE TABLE VENTAS (
+        TIENDA TEXT NOT NULL, UNIDAD_NEGOCIO TEXT NOT NULL,
+        ANIO INTEGER NOT NULL, MES INTEGER NOT NULL, VTA_PZS INTEGER
+    );
+    """)
+
+    lista_periodos = periodos(config.desde, config.hasta)
+    inventario = []
+    ventas = []
+    for t in range(1, config.tiendas + 1):
+        tienda = f"Tienda {t}"
+        escala = rnd.lognormvariate(7.0, 0.5)
+        for unidad in config.unidades:
+            peso = rnd.uniform(0.3, 1.5)
+            for anio, mes in lista_periodos:
+                # Estacionalidad: picos en diciembre y regreso a clases
+                estacion = 1.0 + 0.35 * (mes == 12) + 0.2 * (mes in (7, 8))
+                vta = max(0, int(rnd.gauss(escala * peso * estacion, escala * peso * 0.25)))
+                cobertura = rnd.lognormvariate(3.9, 0.6)  # ~50 días, con colas
+                inv = max(0, int(vta * cobertura / 30))
+
+                if rnd.random() >= config.pct_sin_inventario:
+                    inventario.append((tienda, unidad, anio, mes, inv))
+                if rnd.random() >= config.pct_sin_ventas:
+                    ventas.append((tienda, unidad, anio, mes, vta))
+
+    conn.executemany("INSERT INTO INVENTARIO VALUES (?, ?, ?, ?, ?)", inventario)
+    conn.executemany("INSERT INTO VENTAS VALUES (?, ?, ?, ?, ?)", ventas)
+    conn.executescript("""
+    CREATE INDEX IX_INV ON INVENTARIO (ANIO, MES, TIENDA, UNIDAD_NEGOCIO);
+    CREATE INDEX IX_VTA ON VENTAS (ANIO, MES, TIENDA, UNIDAD_NEGOCIO);
+    """)
+    conn.commit()
+    conn.close()
+    return len(inventario)
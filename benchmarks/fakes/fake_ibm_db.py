@@ -0,0 +1,114 @@
+"""
+Sustituto en proceso de ibm_db
+Implementa la parte de la API que usa db_service sobre SQLite, con latencia
+de red simulada por conexión y por sentencia
+"""
+
+import random
+import re
+import sqlite3
+import time
+import zlib
+from typing import Optional
+
+# Configuración del sustituto (la fija el harness antes de usarlo)
+RUTA_BD: Optional[str] = None
+ESQUEMA = "PTJ13762"
+LATENCIA_CONEXION_MS = 0.0
+LATENCIA_SENTENCIA_MS = 0.0
+_rnd = random.Random(7)
+
+SQL_ATTR_QUERY_TIMEOUT = 0
+
+def configurar(ruta_bd: str, esquema: str, latencia_conexion_ms: float = 0.0, latencia_sentencia_ms: float = 0.0) -> None:
+    global RUTA_BD, ESQUEMA, LATENCIA_CONEXION_MS, LATENCIA_SENTENCIA_MS
+    RUTA_BD = ruta_bd
+    ESQUEMA = esquema
+    LATENCIA_CONEXION_MS = latencia_conexion_ms
+    LATENCIA_SENTENCIA_MS = latencia_sentencia_ms
+
+_PAGINACION_DB2 = re.compile(r"(?:\s+OFFSET\s+(\d+)\s+ROWS)?(?:\s+FETCH\s+FIRST\s+(\d+)\s+ROWS\s+ONLY)?\s*$", re.IGNORECASE)
+
+def _traducir(sql: str) -> str:
+    """Paginación Db2 (OFFSET n ROWS / FETCH FIRST m ROWS ONLY) a LIMIT/OFFSET de SQLite"""
+    m = _PAGINACION_DB2.search(sql)
+    if not m or not (m.group(1) or m.group(2)):
+        return sql
+    return f"{sql[:m.start()]} LIMIT {m.group(2) or -1} OFFSET {m.group(1) or 0}"
+
+def _hash4(texto, algoritmo=0):
+    """HASH4 de Db2: Adler-32 (0) o CRC32 (1) como INTEGER con signo"""
+    if texto is None:
+        return None
+    datos = texto.encode("utf-8")
+    valor = zlib.crc32(datos) if algoritmo == 1 else zlib.adler32(datos)
+    return valor - (1 << 32) if valor >= 1 << 31 else valor
+
+def _mod(a, b):
+    """MOD de Db2 con enteros: el resultado lleva el signo del dividendo (el de SQLite es REAL)"""
+    if a is None or b is None:
+        return None
+    resto = abs(a) % abs(b)
+    return resto if a >= 0 else -resto
+
+def _dormir(media_ms: float) -> None:
+    if media_ms > 0:
+        time.sleep(_rnd.expovariate(1 / media_ms) / 1000)
+
+class _Conexion:
+    def __init__(self):
+        self.sqlite = sqlite3.connect(":memory:", check_same_thread=False)
+        self.sqlite.execute(f"ATTACH DATABASE ? AS {ESQUEMA}", (RUTA_BD,))
+        self.sqlite.create_function("HASH4", 2, _hash4, deterministic=True)
+        self.sqlite.create_function("MOD", 2, _mod, deterministic=True)
+
+class _Sentencia:
+    def __init__(self, conn: _Conexion, sql: str):
+        self.conn = conn
+        self.sql = sql
+        self.cursor = None
+
+def connect(dsn, usuario, password):
+    if RUTA_BD is None:
+        raise Exception("fake_ibm_db sin configurar")
+    _dormir(LATENCIA_CONEXION_MS)
+    return _Conexion()
+
+def pconnect(dsn, usuario, password):
+    return connect(dsn, usuario, password)
+
+def close(conn):
+    conn.sqlite.close()
+    return True
+
+def prepare(conn, sql, options=None):
+    return _Sentencia(conn, sql)
+
+def execute(stmt, params=()):
+    _dormir(LATENCIA_SENTENCIA_MS)
+    stmt.cursor = stmt.conn.sqlite.execute(_traducir(stmt.sql), tuple(params or ()))
+    return True
+
+def exec_immediate(conn, sql, options=None):
+    stmt = _Sentencia(conn, sql)
+    execute(stmt)
+    return stmt
+
+def fetch_tuple(stmt):
+    row = stmt.cursor.fetchone()
+    return row if row is not None else False
+
+def fetch_assoc(stmt):
+    row = stmt.cursor.fetchone()
+    if row is None:
+        return False
+    columnas = [d[0] for d in stmt.cursor.description]
+    return dict(zip(columnas, row))
+
+def free_stmt(stmt):
+    if stmt.cursor is not None:
+        stmt.cursor.close()
+    return True
+
+def set_option(recurso, opciones, tipo):
+    return True
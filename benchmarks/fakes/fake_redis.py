@@ -0,0 +1,216 @@
+"""
+Sustituto local de un servidor Redis
+Habla RESP2 sobre TCP con los comandos que usa el cache compartido (GET,
+SET con EX/PX, DEL, ...) y guarda todo en memoria. Corre en un hilo propio
+con su event loop, así sobrevive a reinicios de la app dentro del mismo
+proceso; como proceso aparte lo pueden compartir varias réplicas
+
+Uso:
+    python -m benchmarks.fakes.fake_redis --puerto 6379
+"""
+
+import argparse
+import asyncio
+import fnmatch
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+class ServidorRedis:
+    """
+    Servidor RESP2 en memoria
+
+    Args:
+        host: Interfaz donde escucha
+        puerto: 0 = uno libre (ver `url` después de iniciar)
+        latencia_ms: Espera antes de cada respuesta (red simulada)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", puerto: int = 0, latencia_ms: float = 0.0):
+        self.host = host
+        self.puerto = puerto
+        self.latencia_ms = latencia_ms
+        self.comandos: Counter = Counter()  # Comandos recibidos por nombre
+        self._datos: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._servidor: Optional[asyncio.AbstractServer] = None
+        self._hilo: Optional[threading.Thread] = None
+        self._listo = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.puerto}/0"
+
+    def iniciar(self) -> str:
+        """Arrancar en un hilo daemon; devuelve la URL"""
+        self._hilo = threading.Thread(target=self._correr, name="fake-redis", daemon=True)
+        self._hilo.start()
+        self._listo.wait()
+        return self.url
+
+    def detener(self) -> None:
+        """Cerrar el servidor y las conexiones abiertas (los clientes ven la caída)"""
+        if self._loop is None or self._hilo is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+        self._loop = self._hilo = None
+
+    def vaciar(self) -> None:
+        self._datos.clear()
+
+    def _correr(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._servidor = self._loop.run_until_complete(
+            asyncio.start_server(self._atender, self.host, self.puerto)
+        )
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+        self._listo.set()
+        self._loop.run_forever()
+
+        self._servidor.close()
+        pendientes = asyncio.all_tasks(self._loop)
+        for tarea in pendientes:
+            tarea.cancel()
+        self._loop.run_until_complete(asyncio.gather(*pendientes, return_exceptions=True))
+        self._loop.close()
+
+    async def _atender(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                comando = await _leer_comando(lector)
+                if comando is None:
+                    break
+                if self.latencia_ms > 0:
+                    await asyncio.sleep(self.latencia_ms / 1000)
+                escritor.write(self._ejecutar(comando))
+                await escritor.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError: el servidor se detiene con conexiones abiertas
+            pass
+        finally:
+            escritor.close()
+
+    def _vigente(self, llave: bytes) -> Optional[bytes]:
+        entrada = self._datos.get(llave)
+        if entrada is None:
+            return None
+        valor, expira = entrada
+        if expira is not None and expira <= time.monotonic():
+            del self._datos[llave]
+            return None
+        return valor
+
+    def _ejecutar(self, comando: List[bytes]) -> bytes:
+        nombre = comando[0].upper().decode()
+        args = comando[1:]
+        self.comandos[nombre] += 1
+        try:
+            if nombre == "PING":
+                return _bulk(args[0]) if args else b"+PONG\r\n"
+            if nombre == "ECHO":
+                return _bulk(args[0])
+            if nombre in ("SELECT", "CLIENT"):
+                return b"+OK\r\n"
+            if nombre == "GET":
+                return _bulk(self._vigente(args[0]))
+            if nombre == "MGET":
+                return _arreglo([_bulk(self._vigente(llave)) for llave in args])
+            if nombre == "SET":
+                return self._set(args)
+            if nombre == "DEL":
+                borradas = sum(1 for llave in args if self._vigente(llave) is not None and self._datos.pop(llave))
+                return _entero(borradas)
+            if nombre == "EXISTS":
+                return _entero(sum(1 for llave in args if self._vigente(llave) is not None))
+            if nombre in ("EXPIRE", "PEXPIRE"):
+                valor = self._vigente(args[0])
+                if valor is None:
+                    return _entero(0)
+                segundos = int(args[1]) / (1000 if nombre == "PEXPIRE" else 1)
+                self._datos[args[0]] = (valor, time.monotonic() + segundos)
+                return _entero(1)
+            if nombre in ("TTL", "PTTL"):
+                if self._vigente(args[0]) is None:
+                    return _entero(-2)
+                expira = self._datos[args[0]][1]
+                if expira is None:
+                    return _entero(-1)
+                resto = expira - time.monotonic()
+                return _entero(int(resto * 1000) if nombre == "PTTL" else int(resto))
+            if nombre == "KEYS":
+                patron = args[0].decode()
+                llaves = [l for l in list(self._datos) if self._vigente(l) is not None and fnmatch.fnmatchcase(l.decode(), patron)]
+                return _arreglo([_bulk(l) for l in llaves])
+            if nombre == "DBSIZE":
+                return _entero(sum(1 for l in list(self._datos) if self._vigente(l) is not None))
+            if nombre in ("FLUSHDB", "FLUSHALL"):
+                self._datos.clear()
+                return b"+OK\r\n"
+        except (IndexError, ValueError):
+            return f"-ERR wrong number of arguments or value for '{nombre.lower()}'\r\n".encode()
+        # EVALSHA del rate limit y demás: el cliente lo trata como servidor no disponible
+        return f"-ERR unknown command '{nombre.lower()}'\r\n".encode()
+
+    def _set(self, args: List[bytes]) -> bytes:
+        llave, valor = args[0], args[1]
+        expira = None
+        solo_nueva = solo_existente = False
+        i = 2
+        while i < len(args):
+            opcion = args[i].upper()
+            if opcion in (b"EX", b"PX"):
+                cantidad = int(args[i + 1])
+                expira = time.monotonic() + (cantidad if opcion == b"EX" else cantidad / 1000)
+                i += 2
+                continue
+            solo_nueva = solo_nueva or opcion == b"NX"
+            solo_existente = solo_existente or opcion == b"XX"
+            i += 1
+        existe = self._vigente(llave) is not None
+        if (solo_nueva and existe) or (solo_existente and not existe):
+            return b"$-1\r\n"
+        self._datos[llave] = (valor, expira)
+        return b"+OK\r\n"
+
+async def _leer_comando(lector: asyncio.StreamReader) -> Optional[List[bytes]]:
+    linea = await lector.readline()
+    if not linea:
+        return None
+    if not linea.startswith(b"*"):
+        # Comando inline (ej. desde telnet)
+        return linea.split() or [b"PING"]
+    partes = []
+    for _ in range(int(linea[1:])):
+        encabezado = await lector.readline()
+        largo = int(encabezado[1:])
+        partes.append((await lector.readexactly(largo + 2))[:-2])
+    return partes
+
+def _bulk(valor: Optional[bytes]) -> bytes:
+    if valor is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(valor), valor)
+
+def _entero(n: int) -> bytes:
+    return b":%d\r\n" % n
+
+def _arreglo(elementos: List[bytes]) -> bytes:
+    return b"*%d\r\n%s" % (len(elementos), b"".join(elementos))
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con Redis (en memoria)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=6379)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    servidor = ServidorRedis(args.host, args.puerto, args.latencia_ms)
+    print(f"🧰 Redis local en {servidor.iniciar()}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.detener()
+
+if __name__ == "__main__":
+    main()
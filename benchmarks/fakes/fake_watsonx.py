@@ -0,0 +1,79 @@
+"""
+Sustituto de ibm_watson_machine_learning
+Model con distribuciones configurables de latencia y tokens generados
+"""
+
+import random
+import sys
+import time
+import types
+from dataclasses import dataclass
+
+@dataclass
+class ConfigLLM:
+    """Distribuciones del modelo simulado"""
+    latencia_primer_token_ms: float = 300.0
+    ms_por_token: float = 15.0
+    tokens_media: int = 180
+    tokens_desviacion: int = 60
+    max_tokens: int = 512
+
+CONFIG = ConfigLLM()
+_rnd = random.Random(11)
+
+class GenTextParamsMetaNames:
+    MAX_NEW_TOKENS = "max_new_tokens"
+    TEMPERATURE = "temperature"
+    REPETITION_PENALTY = "repetition_penalty"
+
+class Model:
+    def __init__(self, model_id=None, params=None, credentials=None, project_id=None, **kwargs):
+        self.model_id = model_id
+
+    def _muestrear(self, prompt: str):
+        tokens = int(min(CONFIG.max_tokens, max(1, _rnd.gauss(CONFIG.tokens_media, CONFIG.tokens_desviacion))))
+        primer_token = _rnd.lognormvariate(0, 0.3) * CONFIG.latencia_primer_token_ms / 1000
+        return tokens, primer_token, max(1, len(prompt) // 4)
+
+    def generate(self, prompt=None, params=None, **kwargs):
+        tokens, primer_token, tokens_entrada = self._muestrear(prompt or "")
+        time.sleep(primer_token + tokens * CONFIG.ms_por_token / 1000)
+        return {
+            "model_id": self.model_id,
+            "results": [{
+                "generated_text": " respuesta simulada" * max(1, tokens // 3),
+                "generated_token_count": tokens,
+                "input_token_count": tokens_entrada,
+                "stop_reason": "eos_token" if tokens < CONFIG.max_tokens else "max_tokens"
+            }]
+        }
+
+    def generate_text_stream(self, prompt=None, params=None, raw_response=False, **kwargs):
+        tokens, primer_token, tokens_entrada = self._muestrear(prompt or "")
+        time.sleep(primer_token)
+        for i in range(tokens):
+            if i:
+                time.sleep(CONFIG.ms_por_token / 1000)
+            final = i == tokens - 1
+            if raw_response:
+                yield {"results": [{
+                    "generated_text": " tok",
+                    "generated_token_count": i + 1,
+                    "input_token_count": tokens_entrada,
+                    "stop_reason": ("eos_token" if tokens < CONFIG.max_tokens else "max_tokens") if final else "not_finished"
+                }]}
+            else:
+                yield " tok"
+
+def instalar() -> None:
+    """Registrar el paquete simulado en sys.modules"""
+    paquete = types.ModuleType("ibm_watson_machine_learning")
+    foundation = types.ModuleType("ibm_watson_machine_learning.foundation_models")
+    metanames = types.ModuleType("ibm_watson_machine_learning.metanames")
+    foundation.Model = Model
+    metanames.GenTextParamsMetaNames = GenTextParamsMetaNames
+    paquete.foundation_models = foundation
+    paquete.metanames = metanames
+    sys.modules["ibm_watson_machine_learning"] = paquete
+    sys.modules["ibm_watson_machine_learning.foundation_models"] = foundation
+    sys.modules["ibm_watson_machine_learning.metanames"] = metanames
@@ -0,0 +1,222 @@
+"""
+Harness de benchmarks
+Levanta la app en proceso con sustitutos locales de Db2, watsonx.ai y
+(opcional) Redis, y la invoca directamente por ASGI (sin red ni servidor
+HTTP de por medio)
+"""
+
+import asyncio
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from benchmarks.dataset import ConfigDataset, generar_dataset
+from benchmarks.fakes import fake_ibm_db, fake_redis, fake_watsonx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ESQUEMA = "PTJ13762"
+
+@dataclass
+class ConfigEntorno:
+    """Configuración de los sustitutos locales"""
+    dataset: ConfigDataset = field(default_factory=ConfigDataset)
+    latencia_conexion_ms: float = 30.0
+    latencia_sentencia_ms: float = 15.0
+    llm: fake_watsonx.ConfigLLM = field(default_factory=fake_watsonx.ConfigLLM)
+    variables: Dict[str, str] = field(default_factory=dict)  # Settings extra
+    backend: str = "db2"  # Fuente de datos: "db2" (ibm_db falso), "sqlite" o "parquet"
+    cache_compartido: bool = False  # Nivel compartido de los caches en un Redis local
+
+# Redis local del entorno (con cache_compartido), para inspeccionarlo o vaciarlo
+servidor_redis: Optional[fake_redis.ServidorRedis] = None
+
+def preparar_entorno(config: ConfigEntorno):
+    """
+    Generar el dataset, instalar los sustitutos e importar la app
+
+    Debe llamarse antes de cualquier import de app.*
+
+    Returns:
+        La instancia FastAPI
+    """
+    global servidor_redis
+    ruta_bd = os.path.join(tempfile.mkdtemp(prefix="calzando-bench-"), "datos.sqlite")
+    filas = generar_dataset(ruta_bd, config.dataset)
+    print(f"📦 Dataset: {config.dataset.tiendas} tiendas, {filas:,} filas de inventario ({ruta_bd})")
+
+    fake_ibm_db.configurar(ruta_bd, ESQUEMA, config.latencia_conexion_ms, config.latencia_sentencia_ms)
+    sys.modules["ibm_db"] = fake_ibm_db
+    fake_watsonx.CONFIG = config.llm
+    fake_watsonx.instalar()
+
+    variables = {
+        "DB2_DATABASE": "BENCH", "DB2_HOSTNAME": "localhost", "DB2_PORT": "0",
+        "DB2_UID": "bench", "DB2_PWD": "bench", "DB2_SCHEMA": ESQUEMA,
+        "WATSONX_API_KEY": "bench", "WATSONX_PROJECT_ID": "bench",
+        "APP_ENV": "benchmark",
+        # Todo el tráfico sale de una sola IP; el límite por cliente se prueba aparte
+        "RATE_LIMIT_ENABLED": "false"
+    }
+    if config.backend != "db2":
+        # Fuente local sobre el mismo dataset, sin latencia de red simulada
+        variables["DATA_BACKEND"] = config.backend
+        variables["DATA_LOCAL_PATH"] = ruta_bd
+    if config.backend == "parquet":
+        variables["DATA_LOCAL_PATH"] = os.path.join(os.path.dirname(ruta_bd), "parquet")
+    if config.cache_compartido:
+        servidor_redis = fake_redis.ServidorRedis()
+        variables["CACHE_COMPARTIDO_URL"] = servidor_redis.iniciar()
+    variables.update(config.variables)
+    os.environ.update(variables)
+
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    if config.backend == "parquet":
+        from app.repositories.local import FuenteSQLite, exportar_parquet
+        exportar_parquet(FuenteSQLite(ruta_bd), os.environ["DATA_LOCAL_PATH"])
+    from app.main import app
+    return app
+
+class ClienteASGI:
+    """Cliente mínimo que invoca la app ASGI en el mismo proceso"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def iniciar(self) -> None:
+        await self.app.router.startup()
+
+    async def cerrar(self) -> None:
+        await self.app.router.shutdown()
+
+    async def request(
+        self,
+        metodo: str,
+        ruta: str,
+        params: Optional[Dict[str, Any]] = None,
+        json_body: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Dict[str, str], bytes]:
+        respuesta = await self._invocar(metodo, ruta, params, json_body, headers)
+        return respuesta["status"], respuesta["headers"], b"".join(respuesta["body"])
+
+    async def stream(
+        self,
+        ruta: str,
+        duracion: float,
+        params: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, Dict[str, str], bytes, float]:
+        """
+        GET a una respuesta en stream (ej. SSE): lee `duracion` segundos y se desconecta
+
+        Returns:
+            Tupla (status, headers, cuerpo leído, segundos hasta el inicio de la respuesta)
+        """
+        inicio = time.perf_counter()
+        respuesta = await self._invocar("GET", ruta, params, None, headers, duracion)
+        return (
+            respuesta["status"], respuesta["headers"], b"".join(respuesta["body"]),
+            (respuesta["inicio"] or time.perf_counter()) - inicio
+        )
+
+    async def _invocar(
+        self,
+        metodo: str,
+        ruta: str,
+        params: Optional[Dict[str, Any]],
+        json_body: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]],
+        duracion: Optional[float] = None
+    ) -> Dict[str, Any]:
+        cuerpo = json.dumps(json_body).encode() if json_body is not None else b""
+        cabeceras = [(b"host", b"bench")]
+        if json_body is not None:
+            cabeceras.append((b"content-type", b"application/json"))
+        for nombre, valor in (headers or {}).items():
+            cabeceras.append((nombre.lower().encode(), valor.encode()))
+
+        ruta_sin_query, _, query = ruta.partition("?")
+        if params:
+            query = "&".join(filter(None, [query, urlencode(params)]))
+
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": metodo,
+            "scheme": "http",
+            "path": ruta_sin_query,
+            "raw_path": ruta_sin_query.encode(),
+            "query_string": query.encode(),
+            "headers": cabeceras,
+            "client": ("127.0.0.1", 50000),
+            "server": ("bench", 80)
+        }
+
+        enviado = False
+        respuesta = {"status": 0, "headers": {}, "body": [], "inicio": None}
+
+        async def receive():
+            nonlocal enviado
+            if not enviado:
+                enviado = True
+                return {"type": "http.request", "body": cuerpo, "more_body": False}
+            if duracion is None:
+                # Después del cuerpo, el cliente sigue conectado hasta que termine la respuesta
+                await _esperar_para_siempre()
+            await asyncio.sleep(duracion)
+            return {"type": "http.disconnect"}
+
+        async def send(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["status"] = mensaje["status"]
+                respuesta["headers"] = {k.decode(): v.decode() for k, v in mensaje.get("headers", [])}
+                respuesta["inicio"] = time.perf_counter()
+            elif mensaje["type"] == "http.response.body":
+                respuesta["body"].append(mensaje.get("body", b""))
+
+        await self.app(scope, receive, send)
+        return respuesta
+
+async def _esperar_para_siempre():
+    await asyncio.Event().wait()
+
+def percentiles_ms(latencias: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99 y media en milisegundos"""
+    if not latencias:
+        return {"p50": None, "p95": None, "p99": None, "media": None}
+    ordenadas = sorted(latencias)
+
+    def p(valor):
+        indice = max(1, math.ceil(valor / 100 * len(ordenadas))) - 1
+        return round(ordenadas[indice] * 1000, 2)
+
+    return {"p50": p(50), "p95": p(95), "p99": p(99), "media": round(sum(ordenadas) / len(ordenadas) * 1000, 2)}
+
+def guardar_resultados(resultados: Dict[str, Any], directorio: str, prefijo: str) -> str:
+    """Guardar un JSON con marca de tiempo y commit para comparar corridas"""
+    os.makedirs(directorio, exist_ok=True)
+    resultados.setdefault("fecha", time.strftime("%Y-%m-%dT%H:%M:%S"))
+    resultados.setdefault("commit", _commit_actual())
+    ruta = os.path.join(directorio, f"{prefijo}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return ruta
+
+def _commit_actual() -> Optional[str]:
+    try:
+        import subprocess
+        salida = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=RAIZ, capture_output=True, text=True, timeout=5
+        )
+        return salida.stdout.strip() or None
+    except Exception:
+        return None
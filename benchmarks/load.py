@@ -0,0 +1,315 @@
+"""
+Benchmark de carga end-to-end
+
+Ejecuta cada endpoint a concurrencia fija contra la app en proceso, con
+Db2 y watsonx.ai sustituidos por versiones locales, y guarda p50/p95/p99 y
+throughput en benchmarks/results/ para comparar corridas. Además de las
+vistas del dashboard y el chat cubre la consulta ad-hoc, las alertas (con
+el stream SSE, midiendo hasta el inicio de la respuesta) y la revalidación
+con If-None-Match, que debe responder 304
+
+Uso:
+    python -m benchmarks.load --tiendas 200 --concurrencia 16 --requests 400
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.dataset import ConfigDataset, UNIDADES_DEFAULT
+from benchmarks.fakes.fake_watsonx import ConfigLLM
+from benchmarks.harness import ClienteASGI, ConfigEntorno, guardar_resultados, percentiles_ms, preparar_entorno, RAIZ
+
+MENSAJES_CHAT = [
+    "¿Cómo está la tienda {t} en {mes} {anio}?",
+    "Dame el inventario de la tienda {t}",
+    "Dame un resumen de todas las tiendas de {mes} {anio}",
+    "¿Cuáles tiendas están en estado crítico?",
+    "¿Qué es la cobertura de inventario?",
+    "¿Cómo puedo reducir el sobreinventario?"
+]
+
+MESES = ["enero", "febrero", "marzo", "abril", "mayo", "junio",
+         "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+
+# Segundos que cada cliente del stream de alertas lee antes de desconectarse
+DURACION_STREAM_S = 0.05
+
+# Escenario: (nombre, fábrica de (método, ruta, params, body[, opciones]));
+# opciones: headers y, para respuestas en stream, segundos de lectura (stream_s)
+Escenario = Tuple[str, Callable[[random.Random], Tuple[Any, ...]]]
+
+# Vista del dashboard con ETag: (ruta, params)
+Vista = Tuple[str, Dict[str, Any]]
+
+def _booleano(rnd: random.Random) -> str:
+    return rnd.choice(["true", "false"])
+
+def _periodo(rnd: random.Random) -> Tuple[int, int]:
+    anio = rnd.choice([2023, 2024, 2025])
+    return anio, rnd.randint(1, 5 if anio == 2025 else 12)
+
+def vistas_revalidacion(tiendas: int, semilla: int, total: int = 40) -> List[Vista]:
+    """Vistas que revalida el escenario de GET condicional"""
+    rnd = random.Random(semilla)
+    vistas = []
+    for _ in range(total):
+        anio, mes = _periodo(rnd)
+        vistas.append(rnd.choice([
+            ("/api/dashboard/summary", {"year": anio, "month": mes}),
+            ("/api/dashboard/tiendas", {"year": anio, "month": mes}),
+            (f"/api/dashboard/tiendas/Tienda {rnd.randint(1, tiendas)}", {"year": anio, "month": mes}),
+            ("/api/dashboard/bundle", {"year": anio, "month": mes}),
+            ("/api/dashboard/historico", {"year": anio}),
+            ("/api/dashboard/salud", {"year": anio, "month": mes})
+        ]))
+    return vistas
+
+async def recolectar_etags(cliente: ClienteASGI, vistas: List[Vista]) -> List[Tuple[str, Dict[str, Any], str]]:
+    """ETag actual de cada vista (las que no traen ETag se omiten)"""
+    resultado = []
+    for ruta, params in vistas:
+        _, headers, _ = await cliente.request("GET", ruta, params=params)
+        if headers.get("etag"):
+            resultado.append((ruta, params, headers["etag"]))
+    return resultado
+
+def escenarios(tiendas: int, etags: Optional[List[Tuple[str, Dict[str, Any], str]]] = None) -> List[Escenario]:
+    """
+    Un escenario por endpoint, con parámetros variados dentro del dataset
+
+    Args:
+        etags: (ruta, params, ETag) para el escenario de revalidación; sin
+            ellos ese escenario se omite
+    """
+    def periodo(rnd):
+        return dict(zip(("year", "month"), _periodo(rnd)))
+
+    def tienda(rnd):
+        return f"Tienda {rnd.randint(1, tiendas)}"
+
+    def chat(rnd):
+        anio, mes = _periodo(rnd)
+        mensaje = rnd.choice(MENSAJES_CHAT).format(t=rnd.randint(1, tiendas), mes=MESES[mes - 1], anio=anio)
+        return "POST", "/api/chat", {}, {"message": mensaje, "session_id": f"bench-{rnd.randint(1, 50)}"}
+
+    def resurtido(rnd):
+        params = {**periodo(rnd), "k": rnd.choice([10, 50])}
+        if rnd.random() < 0.5:
+            params["unidad"] = "*"
+        return "GET", "/api/dashboard/resurtido", params, None
+
+    def movimientos(rnd):
+        comparacion = rnd.choice(["mom", "yoy"])
+        anio, mes = _periodo(rnd)
+        # Solo periodos con contra qué comparar (el dataset empieza en enero 2023)
+        if comparacion == "yoy":
+            anio = max(anio, 2024)
+        elif (anio, mes) == (2023, 1):
+            mes = 2
+        return "GET", "/api/dashboard/variaciones/movimientos", {
+            "year": anio,
+            "month": mes,
+            "metrica": rnd.choice(["inventario", "ventas", "cobertura"]),
+            "comparacion": comparacion,
+            "direccion": rnd.choice(["abs", "sube", "baja"]),
+            "por_unidad": _booleano(rnd)
+        }, None
+
+    def pronostico(rnd):
+        return "GET", "/api/dashboard/pronostico", {
+            **periodo(rnd),
+            "metodo": rnd.choice(["ses", "estacional", "combinado"]),
+            "por_unidad": _booleano(rnd),
+            "solo_criticos": _booleano(rnd)
+        }, None
+
+    def consulta(rnd):
+        anio, mes = _periodo(rnd)
+        return "POST", "/api/dashboard/query", {}, rnd.choice([
+            {"dimensiones": ["tienda"], "filtros": {"anio": [anio], "mes": [mes]}, "orden": ["-ventas"], "limite": 50},
+            {"dimensiones": ["tienda", "unidad"], "medidas": ["inventario", "ventas", "cobertura", "status"],
+             "filtros": {"anio": [anio], "mes": [mes]},
+             "condiciones": [{"medida": "cobertura", "operador": "<", "valor": 28}], "orden": ["cobertura"]},
+            {"dimensiones": ["anio", "mes"], "filtros": {"tienda": [tienda(rnd)]}, "limite": 100}
+        ])
+
+    def alertas_stream(rnd):
+        # Un ID que ya no está en el historial: se reenvía todo el historial
+        return "GET", "/api/alertas/stream", {}, None, {
+            "headers": {"Last-Event-ID": "1"}, "stream_s": DURACION_STREAM_S
+        }
+
+    def revalidacion(rnd):
+        ruta, params, valor = rnd.choice(etags)
+        return "GET", ruta, params, None, {"headers": {"If-None-Match": valor}}
+
+    lista = [
+        ("health", lambda rnd: ("GET", "/health", {}, None)),
+        ("summary", lambda rnd: ("GET", "/api/dashboard/summary", periodo(rnd), None)),
+        ("tiendas", lambda rnd: ("GET", "/api/dashboard/tiendas", periodo(rnd), None)),
+        ("tienda_detalle", lambda rnd: ("GET", f"/api/dashboard/tiendas/{tienda(rnd)}", periodo(rnd), None)),
+        ("historico", lambda rnd: ("GET", "/api/dashboard/historico", {"year": _periodo(rnd)[0]}, None)),
+        ("historico_tienda", lambda rnd: ("GET", "/api/dashboard/historico",
+                                          {"year": _periodo(rnd)[0], "tienda": tienda(rnd)}, None)),
+        ("bundle", lambda rnd: ("GET", "/api/dashboard/bundle", periodo(rnd), None)),
+        ("resurtido", resurtido),
+        ("variaciones", lambda rnd: ("GET", "/api/dashboard/variaciones",
+                                     {**periodo(rnd), "por_unidad": _booleano(rnd)}, None)),
+        ("movimientos", movimientos),
+        ("salud", lambda rnd: ("GET", "/api/dashboard/salud", periodo(rnd), None)),
+        ("pronostico", pronostico),
+        ("query", consulta),
+        ("alertas", lambda rnd: ("GET", "/api/alertas", {"desde_id": 0, "limite": 100}, None)),
+        ("alertas_stream", alertas_stream),
+        ("chat", chat)
+    ]
+    if etags:
+        lista.append(("revalidacion", revalidacion))
+    return lista
+
+async def correr_escenario(
+    cliente: ClienteASGI,
+    fabrica,
+    concurrencia: int,
+    total: int,
+    semilla: int
+) -> Dict[str, Any]:
+    """Lanzar `total` requests con `concurrencia` trabajadores"""
+    rnd = random.Random(semilla)
+    pendientes = [fabrica(rnd) for _ in range(total)]
+    latencias: List[float] = []
+    status: Dict[str, int] = {}
+
+    async def trabajador():
+        while pendientes:
+            metodo, ruta, params, body, *extra = pendientes.pop()
+            opciones = extra[0] if extra else {}
+            inicio = time.perf_counter()
+            if opciones.get("stream_s"):
+                # En un stream la latencia es hasta el inicio de la respuesta
+                codigo, _, _, latencia = await cliente.stream(
+                    ruta, opciones["stream_s"], params=params, headers=opciones.get("headers")
+                )
+            else:
+                codigo, _, _ = await cliente.request(
+                    metodo, ruta, params=params, json_body=body, headers=opciones.get("headers")
+                )
+                latencia = time.perf_counter() - inicio
+            latencias.append(latencia)
+            status[str(codigo)] = status.get(str(codigo), 0) + 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    duracion = time.perf_counter() - inicio
+
+    # 304 es la respuesta esperada de la revalidación
+    errores = sum(n for codigo, n in status.items() if not (codigo.startswith("2") or codigo == "304"))
+    return {
+        "requests": len(latencias),
+        "duracion_s": round(duracion, 3),
+        "throughput_rps": round(len(latencias) / duracion, 2) if duracion > 0 else None,
+        "latencia_ms": percentiles_ms(latencias),
+        "status": status,
+        "errores": errores
+    }
+
+async def correr_mixto(cliente: ClienteASGI, args) -> Dict[str, Any]:
+    """
+    Dashboard bajo una ráfaga de chat: summary a la concurrencia normal
+    mientras el chat corre al cuádruple; mide si el dashboard se mantiene
+    plano y cuántos chats se rechazan (429/503)
+    """
+    fabricas = dict(escenarios(args.tiendas))
+    rafaga = asyncio.ensure_future(correr_escenario(
+        cliente, fabricas["chat"], args.concurrencia * 4, args.requests_chat * 4, args.semilla
+    ))
+    await asyncio.sleep(0.1)
+    dashboard = await correr_escenario(cliente, fabricas["summary"], args.concurrencia, args.requests, args.semilla)
+    chat = await rafaga
+    dashboard["chat_status"] = chat["status"]
+    return dashboard
+
+async def main_async(args, app) -> Dict[str, Any]:
+    cliente = ClienteASGI(app)
+    await cliente.iniciar()
+    try:
+        resultados = {}
+        etags = None
+        if not args.solo or "revalidacion" in args.solo:
+            etags = await recolectar_etags(cliente, vistas_revalidacion(args.tiendas, args.semilla))
+        for nombre, fabrica in escenarios(args.tiendas, etags):
+            if args.solo and nombre not in args.solo:
+                continue
+            total = args.requests_chat if nombre == "chat" else args.requests
+            r = await correr_escenario(cliente, fabrica, args.concurrencia, total, args.semilla)
+            resultados[nombre] = r
+            lat = r["latencia_ms"]
+            print(
+                f"  {nombre:<18} {r['throughput_rps']:>8} req/s  p50={lat['p50']}ms  "
+                f"p95={lat['p95']}ms  p99={lat['p99']}ms  errores={r['errores']}"
+            )
+        if not args.solo or "dashboard_bajo_chat" in args.solo:
+            r = await correr_mixto(cliente, args)
+            resultados["dashboard_bajo_chat"] = r
+            lat = r["latencia_ms"]
+            print(
+                f"  {'dashboard_bajo_chat':<18} {r['throughput_rps']:>8} req/s  p50={lat['p50']}ms  "
+                f"p95={lat['p95']}ms  p99={lat['p99']}ms  chat={r['chat_status']}"
+            )
+        return resultados
+    finally:
+        await cliente.cerrar()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de carga con Db2 y watsonx.ai locales")
+    parser.add_argument("--tiendas", type=int, default=17)
+    parser.add_argument("--unidades", type=int, default=3, help=f"Hasta {len(UNIDADES_DEFAULT)}")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests por escenario de dashboard")
+    parser.add_argument("--requests-chat", type=int, default=60)
+    parser.add_argument("--latencia-conexion-ms", type=float, default=30.0)
+    parser.add_argument("--latencia-sentencia-ms", type=float, default=15.0)
+    parser.add_argument("--backend", choices=("db2", "sqlite", "parquet"), default="db2",
+                        help="Fuente de datos: Db2 simulado con latencia de red o réplica local")
+    parser.add_argument("--cache-compartido", action="store_true",
+                        help="Nivel compartido de los caches en un Redis local")
+    parser.add_argument("--llm-primer-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms-por-token", type=float, default=15.0)
+    parser.add_argument("--llm-tokens-media", type=int, default=180)
+    parser.add_argument("--solo", nargs="*", help="Escenarios a correr (default: todos)")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", default=f"{RAIZ}/benchmarks/results")
+    parser.add_argument("--etiqueta", default="load", help="Prefijo del archivo de resultados")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = ConfigEntorno(
+        dataset=ConfigDataset(tiendas=args.tiendas, unidades=UNIDADES_DEFAULT[:args.unidades]),
+        latencia_conexion_ms=args.latencia_conexion_ms,
+        latencia_sentencia_ms=args.latencia_sentencia_ms,
+        backend=args.backend,
+        cache_compartido=args.cache_compartido,
+        llm=ConfigLLM(
+            latencia_primer_token_ms=args.llm_primer_token_ms,
+            ms_por_token=args.llm_ms_por_token,
+            tokens_media=args.llm_tokens_media
+        )
+    )
+    app = preparar_entorno(config)
+
+    print(f"🏁 Concurrencia={args.concurrencia}  Fuente={args.backend}")
+    resultados = asyncio.run(main_async(args, app))
+
+    ruta = guardar_resultados({
+        "tipo": "load",
+        "config": {k: v for k, v in vars(args).items() if k != "salida"},
+        "resultados": resultados
+    }, args.salida, args.etiqueta)
+    print(f"💾 Resultados: {ruta}")
+
+if __name__ == "__main__":
+    main()
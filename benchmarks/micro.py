@@ -0,0 +1,124 @@
+"""
+Micro-benchmarks de app/utils (intent_parser y metrics)
+
+Mide la mediana por llamada de las funciones del hot path con el corpus de
+preguntas y listas de 17 a 10,000 tiendas, y falla (exit 1) si alguna
+supera su umbral en benchmarks/micro_thresholds.json
+
+Uso:
+    python -m benchmarks.micro                 # medir y validar umbrales
+    python -m benchmarks.micro --actualizar    # regenerar umbrales (medición x margen)
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Tuple
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA_UMBRALES = os.path.join(RAIZ, "benchmarks", "micro_thresholds.json")
+TAMANOS_TIENDAS = (17, 100, 1000, 10000)
+
+def _preparar():
+    """Variables mínimas para importar app.config sin credenciales"""
+    for nombre in ("DB2_DATABASE", "DB2_HOSTNAME", "DB2_PORT", "DB2_UID", "DB2_PWD",
+                   "WATSONX_API_KEY", "WATSONX_PROJECT_ID"):
+        os.environ.setdefault(nombre, "bench")
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+def medir(func: Callable[[], None], rondas: int, min_tiempo: float = 0.02) -> float:
+    """
+    Mediana en microsegundos por llamada
+
+    Calibra las iteraciones por ronda para que cada ronda dure al menos
+    min_tiempo, como hace pytest-benchmark
+    """
+    iteraciones = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            func()
+        if time.perf_counter() - inicio >= min_tiempo or iteraciones >= 1_000_000:
+            break
+        iteraciones *= 2
+
+    muestras = []
+    for _ in range(rondas):
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            func()
+        muestras.append((time.perf_counter() - inicio) / iteraciones * 1e6)
+    return statistics.median(muestras)
+
+def casos() -> List[Tuple[str, Callable[[], None]]]:
+    from app.utils.intent_parser import extraer_entidades, requiere_datos_bd, detectar_intent_explicito
+    from app.utils.metrics import (
+        calcular_prioridad_resurtido,
+        clasificar_tiendas_por_performance,
+        calcular_salud_general
+    )
+    from benchmarks.corpus import PREGUNTAS, generar_tiendas
+
+    # Las funciones de texto se miden sobre el corpus completo (µs por corpus)
+    lista = [
+        ("extraer_entidades[corpus]", lambda: [extraer_entidades(p) for p in PREGUNTAS]),
+        ("requiere_datos_bd[corpus]", lambda: [requiere_datos_bd(p) for p in PREGUNTAS]),
+        ("detectar_intent_explicito[corpus]", lambda: [detectar_intent_explicito(p) for p in PREGUNTAS])
+    ]
+    for n in TAMANOS_TIENDAS:
+        tiendas = generar_tiendas(n)
+        lista.extend([
+            (f"calcular_prioridad_resurtido[{n}]", lambda t=tiendas: calcular_prioridad_resurtido(t)),
+            (f"clasificar_tiendas_por_performance[{n}]", lambda t=tiendas: clasificar_tiendas_por_performance(t)),
+            (f"calcular_salud_general[{n}]", lambda t=tiendas: calcular_salud_general(t))
+        ])
+    return lista
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de intent_parser y metrics")
+    parser.add_argument("--rondas", type=int, default=7)
+    parser.add_argument("--filtro", default="", help="Solo casos que contengan este texto")
+    parser.add_argument("--actualizar", action="store_true", help="Reescribir umbrales con la medición actual")
+    parser.add_argument("--margen", type=float, default=2.0, help="Holgura al actualizar umbrales")
+    args = parser.parse_args()
+
+    _preparar()
+    umbrales: Dict[str, float] = {}
+    if os.path.exists(RUTA_UMBRALES):
+        with open(RUTA_UMBRALES, encoding="utf-8") as f:
+            umbrales = json.load(f)
+
+    resultados: Dict[str, float] = {}
+    regresiones = []
+    print(f"{'caso':<45}{'µs/llamada':>14}{'umbral':>14}")
+    for nombre, func in casos():
+        if args.filtro and args.filtro not in nombre:
+            continue
+        valor = medir(func, args.rondas)
+        resultados[nombre] = valor
+        umbral = umbrales.get(nombre)
+        marca = ""
+        if umbral is not None and valor > umbral and not args.actualizar:
+            regresiones.append(nombre)
+            marca = "  ❌ REGRESIÓN"
+        print(f"{nombre:<45}{valor:>14.2f}{(umbral if umbral is not None else float('nan')):>14.2f}{marca}")
+
+    if args.actualizar:
+        umbrales.update({nombre: round(valor * args.margen, 2) for nombre, valor in resultados.items()})
+        with open(RUTA_UMBRALES, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(umbrales.items())), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"💾 Umbrales actualizados en {RUTA_UMBRALES}")
+        return
+
+    if regresiones:
+        print(f"\n{len(regresiones)} caso(s) por encima de su umbral: {', '.join(regresiones)}")
+        sys.exit(1)
+    print("\n✅ Sin regresiones")
+
+if __name__ == "__main__":
+    main()
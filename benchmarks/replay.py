@@ -0,0 +1,150 @@
+"""
+Replay de tráfico capturado
+
+Reproduce un archivo de trazas (TRAFFIC_CAPTURE_PATH) contra la app en
+proceso con Db2 y watsonx.ai locales, respetando los tiempos entre requests
+escalados por --velocidad (1x a 50x)
+
+Uso:
+    python -m benchmarks.replay trazas.jsonl --velocidad 10 --tiendas 17
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from benchmarks.dataset import ConfigDataset, UNIDADES_DEFAULT
+from benchmarks.fakes.fake_watsonx import ConfigLLM
+from benchmarks.harness import ClienteASGI, ConfigEntorno, guardar_resultados, percentiles_ms, preparar_entorno, RAIZ
+
+VELOCIDAD_MIN = 1.0
+VELOCIDAD_MAX = 50.0
+
+def cargar_trazas(ruta: str) -> List[Dict[str, Any]]:
+    """Leer trazas JSONL ordenadas por timestamp"""
+    trazas = []
+    with open(ruta, encoding="utf-8") as f:
+        for linea in f:
+            linea = linea.strip()
+            if linea:
+                trazas.append(json.loads(linea))
+    trazas.sort(key=lambda t: t["ts"])
+    return trazas
+
+async def reproducir(cliente: ClienteASGI, trazas: List[Dict[str, Any]], velocidad: float) -> Dict[str, Any]:
+    """
+    Lanzar cada traza en su instante escalado (carga en lazo abierto)
+
+    Los requests no esperan a que terminen los anteriores, igual que en
+    producción, así que la cola se forma dentro de la app
+    """
+    por_endpoint: Dict[str, List[float]] = {}
+    status: Dict[str, Dict[str, int]] = {}
+    retrasos: List[float] = []
+    t0_trazas = trazas[0]["ts"]
+    t0 = time.perf_counter()
+
+    async def lanzar(traza):
+        objetivo = (traza["ts"] - t0_trazas) / velocidad
+        espera = objetivo - (time.perf_counter() - t0)
+        if espera > 0:
+            await asyncio.sleep(espera)
+        retrasos.append(max(0.0, (time.perf_counter() - t0) - objetivo))
+
+        body = None
+        headers = {}
+        if traza.get("session_id"):
+            headers["x-session-id"] = traza["session_id"]
+        if traza["method"] == "POST" and "message" in traza:
+            body = {"message": traza["message"], "session_id": traza.get("session_id")}
+        ruta = traza["path"] + (f"?{traza['query']}" if traza.get("query") else "")
+
+        inicio = time.perf_counter()
+        codigo, _, _ = await cliente.request(traza["method"], ruta, json_body=body, headers=headers)
+        endpoint = traza.get("endpoint") or traza["path"]
+        por_endpoint.setdefault(endpoint, []).append(time.perf_counter() - inicio)
+        conteo = status.setdefault(endpoint, {})
+        conteo[str(codigo)] = conteo.get(str(codigo), 0) + 1
+
+    await asyncio.gather(*(lanzar(t) for t in trazas))
+    duracion = time.perf_counter() - t0
+
+    todas = [lat for lats in por_endpoint.values() for lat in lats]
+    return {
+        "requests": len(todas),
+        "duracion_s": round(duracion, 3),
+        "throughput_rps": round(len(todas) / duracion, 2) if duracion > 0 else None,
+        "latencia_ms": percentiles_ms(todas),
+        "retraso_lanzamiento_ms": percentiles_ms(retrasos),
+        "endpoints": {
+            endpoint: {
+                "requests": len(lats),
+                "latencia_ms": percentiles_ms(lats),
+                "status": status[endpoint]
+            }
+            for endpoint, lats in por_endpoint.items()
+        }
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay de trazas con Db2 y watsonx.ai locales")
+    parser.add_argument("trazas", help="Archivo JSONL generado con TRAFFIC_CAPTURE_PATH")
+    parser.add_argument("--velocidad", type=float, default=1.0, help="Factor de aceleración (1-50)")
+    parser.add_argument("--limite", type=int, default=0, help="Reproducir solo las primeras N trazas")
+    parser.add_argument("--tiendas", type=int, default=17)
+    parser.add_argument("--unidades", type=int, default=3, help=f"Hasta {len(UNIDADES_DEFAULT)}")
+    parser.add_argument("--latencia-conexion-ms", type=float, default=30.0)
+    parser.add_argument("--latencia-sentencia-ms", type=float, default=15.0)
+    parser.add_argument("--llm-primer-token-ms", type=float, default=300.0)
+    parser.add_argument("--llm-ms-por-token", type=float, default=15.0)
+    parser.add_argument("--salida", default=f"{RAIZ}/benchmarks/results")
+    parser.add_argument("--etiqueta", default="replay", help="Prefijo del archivo de resultados")
+    args = parser.parse_args()
+    if not VELOCIDAD_MIN <= args.velocidad <= VELOCIDAD_MAX:
+        parser.error(f"--velocidad debe estar entre {VELOCIDAD_MIN:g} y {VELOCIDAD_MAX:g}")
+    return args
+
+async def main_async(args, app, trazas):
+    cliente = ClienteASGI(app)
+    await cliente.iniciar()
+    try:
+        return await reproducir(cliente, trazas, args.velocidad)
+    finally:
+        await cliente.cerrar()
+
+def main():
+    args = parse_args()
+    trazas = cargar_trazas(args.trazas)
+    if args.limite:
+        trazas = trazas[:args.limite]
+    if not trazas:
+        raise SystemExit("El archivo no tiene trazas")
+
+    app = preparar_entorno(ConfigEntorno(
+        dataset=ConfigDataset(tiendas=args.tiendas, unidades=UNIDADES_DEFAULT[:args.unidades]),
+        latencia_conexion_ms=args.latencia_conexion_ms,
+        latencia_sentencia_ms=args.latencia_sentencia_ms,
+        llm=ConfigLLM(latencia_primer_token_ms=args.llm_primer_token_ms, ms_por_token=args.llm_ms_por_token)
+    ))
+
+    ventana = trazas[-1]["ts"] - trazas[0]["ts"]
+    print(f"▶️  {len(trazas)} trazas ({ventana:.0f}s capturados) a {args.velocidad:g}x")
+    resultado = asyncio.run(main_async(args, app, trazas))
+
+    lat = resultado["latencia_ms"]
+    print(f"  total {resultado['throughput_rps']} req/s  p50={lat['p50']}ms  p95={lat['p95']}ms  p99={lat['p99']}ms")
+    for endpoint, r in sorted(resultado["endpoints"].items()):
+        lat = r["latencia_ms"]
+        print(f"  {endpoint:<40} n={r['requests']:<6} p50={lat['p50']}ms  p95={lat['p95']}ms  p99={lat['p99']}ms")
+
+    ruta = guardar_resultados({
+        "tipo": "replay",
+        "config": {k: v for k, v in vars(args).items() if k != "salida"},
+        "resultados": {"replay": resultado}
+    }, args.salida, args.etiqueta)
+    print(f"💾 Resultados: {ruta}")
+
+if __name__ == "__main__":
+    main()
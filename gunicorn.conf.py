@@ -0,0 +1,94 @@
+"""
+Configuración de gunicorn: varios workers uvicorn por contenedor
+
+Con más de un worker, el cubo de inventario no se carga en cada proceso:
+un proceso cargador (app.services.cargador_cubo) lo consulta y lo publica
+en CUBO_COMPARTIDO_PATH, y todos los workers mapean ese archivo de solo
+lectura. Así escalar a varios cores no multiplica la memoria del cubo ni
+las consultas a Db2 para construirlo
+
+Sin WEB_CONCURRENCY se lanza un worker por CPU disponible: la cuota de CPU
+del cgroup del contenedor si la hay, no los cores del host. Los límites del
+contenedor (WATSONX_MAX_CONCURRENCY y el rate limit en memoria) se reparten
+entre los workers
+
+Uso:
+    gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+import math
+import os
+import subprocess
+import sys
+import threading
+
+def _leer_cuota_cgroup():
+    """CPUs de la cuota del cgroup (v2 o v1), o None si no hay límite"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            cuota, periodo = f.read().split()
+        return None if cuota == "max" else int(cuota) / int(periodo)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            cuota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            periodo = int(f.read())
+        return None if cuota <= 0 else cuota / periodo
+    except (OSError, ValueError):
+        return None
+
+def _cpus_disponibles() -> int:
+    """Cores que puede usar el proceso, acotados por la cuota del cgroup"""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    cuota = _leer_cuota_cgroup()
+    if cuota is not None:
+        cpus = min(cpus, math.floor(cuota))
+    return max(1, cpus)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+workers = int(os.getenv("WEB_CONCURRENCY") or _cpus_disponibles())
+# La app lee WEB_CONCURRENCY para repartir los límites del contenedor entre los workers
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Los plazos por endpoint los aplica la app; esto solo recicla workers colgados
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+accesslog = "-"
+
+if workers > 1:
+    # Los workers heredan el entorno del master al hacer fork
+    os.environ.setdefault("CUBO_COMPARTIDO_PATH", "/tmp/calzando/cubo.bin")
+
+_cargador = None
+_deteniendo = threading.Event()
+
+def _supervisar_cargador(server):
+    """Mantener vivo el proceso cargador; si termina se vuelve a lanzar"""
+    global _cargador
+    while not _deteniendo.is_set():
+        _cargador = subprocess.Popen([sys.executable, "-m", "app.services.cargador_cubo"])
+        server.log.info(f"Cargador del cubo iniciado (pid {_cargador.pid})")
+        codigo = _cargador.wait()
+        # Sale con 0 solo al recibir SIGTERM/SIGINT (ej. junto con el master)
+        if _deteniendo.is_set() or codigo == 0:
+            return
+        server.log.error(f"El cargador del cubo terminó (código {codigo}); se reinicia en 5s")
+        _deteniendo.wait(5)
+
+def on_starting(server):
+    if os.environ.get("CUBO_COMPARTIDO_PATH"):
+        threading.Thread(target=_supervisar_cargador, args=(server,), daemon=True).start()
+
+def on_exit(server):
+    _deteniendo.set()
+    if _cargador is not None and _cargador.poll() is None:
+        _cargador.terminate()
+        try:
+            _cargador.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _cargador.kill()